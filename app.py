@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
-import time
 import os
 from dotenv import load_dotenv
 from src.recommender import RecommenderEngine
 from src.evaluator import Evaluator
+from src.agent import stream_response, set_engine, set_intent_router
+from src.intent_router import IntentRouter, sentence_encoder
+from langchain_core.messages import HumanMessage
 
 # Load environment variables
 load_dotenv()
@@ -62,9 +64,21 @@ st.caption("Hybrid Recommendation Engine powered by Gemini & Collaborative Filte
 # Initialize Engine (Cached)
 @st.cache_resource
 def get_engine():
-    return RecommenderEngine()
+    engine = RecommenderEngine()
+    # Hybrid (lexical + semantic) search when an indexed vector store is available
+    try:
+        from src.vector_store import MovieVectorStore
+        store = MovieVectorStore()
+        # Local intent routing reuses the store's embedding model instead of loading a second copy
+        set_intent_router(IntentRouter(sentence_encoder(model=store.embedding_model)))
+        if store.collection.count():
+            engine.vector_store = store
+    except Exception as e:
+        print(f"Semantic search disabled: {e}")
+    return engine
 
 engine = get_engine()
+set_engine(engine)
 
 # --- Sidebar ---
 st.sidebar.header("User Profile")
@@ -148,14 +162,12 @@ with col_recs:
             with c2:
                 if st.button("👍 Like", key=f"like_{item['movieId']}"):
                     engine.add_feedback(current_uid, item['movieId'], 5.0)
-                    st.toast(f"Liked {item['title']}! Retraining...", icon="🎉")
-                    time.sleep(1)
+                    st.toast(f"Liked {item['title']}! Updated your picks.", icon="🎉")
                     st.rerun()
                     
                 if st.button("👎 Dislike", key=f"dislike_{item['movieId']}"):
                     engine.add_feedback(current_uid, item['movieId'], 1.0)
-                    st.toast(f"Disliked {item['title']}. Tuning...", icon="🔧")
-                    time.sleep(1)
+                    st.toast(f"Disliked {item['title']}. Updated your picks.", icon="🔧")
                     st.rerun()
 
 with col_stats:
@@ -175,6 +187,8 @@ with col_stats:
     st.write(f"**Users:** {len(engine.ratings['userId'].unique())}")
     st.write(f"**Items:** {len(engine.movies)}")
     st.write(f"**Interactions:** {len(engine.ratings)}")
+    cache = engine.cache_stats()
+    st.write(f"**Rec cache hit rate:** {cache['hit_rate']:.0%} ({cache['hits']}/{cache['hits'] + cache['misses']})")
 
 # --- Agentic Chat Interface ---
 st.markdown("---")
@@ -192,25 +206,21 @@ if prompt := st.chat_input("What are you looking for?"):
     st.chat_message("user").markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
     
-    from src.agent import workflow, AgentState
-    from langchain_core.messages import HumanMessage
-    
-    app_graph = workflow.compile()
-    
-    with st.spinner("Gemini is thinking..."):
-        initial_state = {
-            "messages": [HumanMessage(content=prompt)],
-            "user_id": current_uid,
-            "google_api_key": api_key
-        }
-        
+    initial_state = {
+        "messages": [HumanMessage(content=prompt)],
+        "user_id": current_uid,
+        "google_api_key": api_key
+    }
+
+    # Tokens and tool results are rendered as they arrive
+    with st.chat_message("assistant"):
         try:
-            result = app_graph.invoke(initial_state)
-            response_text = result.get("final_response", "I'm not sure how to help with that.")
+            response_text = st.write_stream(stream_response(initial_state))
+            if not response_text:
+                response_text = "I'm not sure how to help with that."
+                st.markdown(response_text)
         except Exception as e:
             response_text = f"Error calling Gemini: {e}. Please check your API key."
-        
-        with st.chat_message("assistant"):
             st.markdown(response_text)
-        
-        st.session_state.messages.append({"role": "assistant", "content": response_text})
+
+    st.session_state.messages.append({"role": "assistant", "content": response_text})
@@ -0,0 +1,372 @@
+"""
+Benchmark Suite for UniversalRecs
+Times the recommender hot paths on scaled synthetic datasets and writes
+machine-readable JSON so runs can be compared against each other.
+
+Only the JSON report goes to stdout; progress lines and the engine's own
+output go to stderr, so `benchmark.py > bench.json` is machine-readable.
+"""
+
+import sys
+import os
+import gc
+import json
+import time
+import argparse
+import contextlib
+import functools
+import platform
+import resource
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.data_loader import generate_synthetic_data
+from src.recommender import RecommenderEngine
+from src.evaluator import Evaluator
+from src.mips import MIPSIndex, brute_force_topk, recall_at_k
+from src.sharding import ShardedEngine, publish_shards
+
+
+# (users, movies, rating draws)
+SCALES = {
+    "small": (200, 500, 5_000),
+    "medium": (2_000, 2_000, 50_000),
+    "large": (10_000, 3_000, 300_000),
+}
+
+SEARCH_QUERIES = ["action", "Sci-Fi", "comedy", "heroic", "futuristic world", "Movie 1", "nothing matches this"]
+
+
+def process_peak_rss_mb() -> float:
+    """
+    Peak resident set size of the whole benchmark process so far, in MiB.
+    A running maximum: it never goes down between cases, so it shows the
+    heaviest case run so far, not the memory of the current one.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def time_calls(fn, iterations: int) -> dict:
+    """Run fn(i) for i in range(iterations) and summarise per-call latency."""
+    gc.collect()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+
+    lat_ms = np.array(latencies) * 1000.0
+    return {
+        "iterations": iterations,
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 4),
+        "mean_ms": round(float(lat_ms.mean()), 4),
+        "throughput_per_s": round(iterations / total, 2) if total > 0 else None,
+        "process_peak_rss_mb": round(process_peak_rss_mb(), 1),
+    }
+
+
+def lazy(build):
+    """Zero-argument callable that runs build() on its first call and returns that result after."""
+    return functools.lru_cache(maxsize=None)(build)
+
+
+def case(build, call):
+    """Case factory: builds build() (a lazy) before timing, then times call(built, i)."""
+    return lambda: functools.partial(call, build())
+
+
+def engine_cases(movies, ratings, repeat: int, precision: str = "float64"):
+    """
+    Yields (case_name, make, iterations) for the engine and evaluator hot paths.
+
+    make() builds what the case needs and returns its fn(i), or None to
+    skip it; engines are shared between cases and only built for the
+    cases that run.
+    """
+    engine = lazy(lambda: RecommenderEngine(movies=movies, ratings=ratings, precision=precision))
+    rng = np.random.default_rng(0)
+    users = rng.choice(ratings['userId'].unique(), size=200)
+    movie_ids = movies['movieId'].values
+
+    init = lambda i: RecommenderEngine(movies=movies, ratings=ratings, precision=precision)
+    yield "engine_init", lambda: init, max(1, repeat)
+    yield "train_models", case(engine, lambda e, i: e.train_models()), max(1, repeat)
+    # Synthetic ratings span one year; train on the last quarter with a one-month half-life
+    windowed = lazy(lambda: RecommenderEngine(movies=movies, ratings=ratings, half_life_days=30, window_days=90,
+                                              precision=precision))
+    yield "train_models_window90", case(windowed, lambda e, i: e.train_models()), max(1, repeat)
+    # Recommend cases run without the result cache so they time the pipeline, not LRU hits
+    uncached = lazy(lambda: RecommenderEngine(movies=movies, ratings=ratings, cache_size=0, precision=precision))
+    yield "recommend", case(uncached, lambda e, i: e.recommend(int(users[i % len(users)]), n=10)), 50 * repeat
+    yield "recommend_mmr", case(uncached, lambda e, i: e.recommend(int(users[i % len(users)]), n=10,
+                                                                    diversity=0.5)), 20 * repeat
+    heavy_user = int(ratings['userId'].value_counts().idxmax())
+    yield "recommend_heavy_user", case(uncached, lambda e, i: e.recommend(heavy_user, n=10)), 20 * repeat
+    yield "recommend_new_user", case(uncached, lambda e, i: e.recommend(-1, n=10)), 20 * repeat
+    # Ten users cycled through the default result cache: all hits after the first pass
+    yield "recommend_cached", case(engine, lambda e, i: e.recommend(int(users[i % 10]), n=10)), 50 * repeat
+    yield "get_popular_items", case(engine, lambda e, i: e.get_popular_items(n=10)), 50 * repeat
+    yield "search_items", case(engine, lambda e, i: e.search_items(SEARCH_QUERIES[i % len(SEARCH_QUERIES)],
+                                                                    n=5)), 50 * repeat
+
+    # Feedback mutates state, so it gets its own engine; training synchronously times the retrain each call triggers
+    feedback_engine = lazy(lambda: RecommenderEngine(movies=movies, ratings=ratings, background_training=False,
+                                                     precision=precision))
+    yield "add_feedback", case(feedback_engine, lambda e, i: e.add_feedback(
+        int(users[i % len(users)]), int(movie_ids[i % len(movie_ids)]), 5.0)), max(1, repeat)
+
+    def build_evaluator():
+        evaluator = Evaluator(engine())
+        if precision != "float64":
+            agreement = evaluator.verify_precision()
+            print(f"  {precision} vs float64: top-10 overlap {agreement['overlap']:.2%}, "
+                  f"identical {agreement['identical']:.2%}, max score diff {agreement['max_score_diff']:.2e}")
+        return evaluator
+
+    evaluator = lazy(build_evaluator)
+    yield "evaluator_rmse", case(evaluator, lambda ev, i: ev.calculate_rmse()), max(1, repeat)
+    yield "evaluator_coverage", case(evaluator, lambda ev, i: ev.calculate_coverage()), max(1, repeat)
+
+    # Factors are None when the collab model could not be trained; make() then skips the case
+    yield from mips_cases(lambda: (engine().model.collab_user_factors, engine().model.collab_item_factors), repeat)
+
+
+def mips_cases(factors, repeat: int, k: int = 50, prefix: str = "collab"):
+    """
+    Yields brute-force vs MIPSIndex top-k cases over factors() -> (user_factors,
+    item_factors); prints the index's recall per nprobe when it is first built.
+    """
+    @lazy
+    def setup():
+        user_factors, item_factors = factors()
+        if user_factors is None:
+            return None
+        users = user_factors[np.random.default_rng(0).choice(len(user_factors), size=min(200, len(user_factors)))]
+        index = MIPSIndex(item_factors)
+        for nprobe in (1, 4, 8, 16):
+            print(f"  {prefix}_mips nprobe={nprobe:<3} recall@{k} "
+                  f"{recall_at_k(index, users[:50], item_factors, k, nprobe):.3f}   ({index.n_lists} lists)")
+        return users, index, item_factors
+
+    def on_setup(call):
+        def make():
+            built = setup()
+            return functools.partial(call, *built) if built is not None else None
+        return make
+
+    yield f"{prefix}_mips_build", on_setup(lambda users, index, items, i: MIPSIndex(items)), max(1, repeat)
+    yield f"{prefix}_topk_brute", on_setup(
+        lambda users, index, items, i: brute_force_topk(users[i % len(users)], items, k)), 100 * repeat
+    yield f"{prefix}_topk_mips", on_setup(
+        lambda users, index, items, i: index.search(users[i % len(users)], k)), 100 * repeat
+
+
+def synthetic_mips_cases(n_items: int, repeat: int, factors: int = 32):
+    """MIPS cases on clustered random factors, for catalogs larger than the synthetic datasets."""
+    def build():
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(256, factors))
+        item_factors = np.ascontiguousarray(
+            (centers[rng.integers(0, 256, n_items)] + 0.5 * rng.normal(size=(n_items, factors))).T)
+        user_factors = centers[rng.integers(0, 256, 200)] + 0.5 * rng.normal(size=(200, factors))
+        return user_factors, item_factors
+
+    yield from mips_cases(build, repeat, prefix=f"mips{n_items}")
+
+
+def sharded_cases(movies, ratings, n_shards: int, repeat: int, precision: str = "float64"):
+    """Yields recommend through a ShardedEngine with n_shards worker processes."""
+    users = np.random.default_rng(0).choice(ratings['userId'].unique(), size=200)
+
+    @lazy
+    def sharded():
+        engine = RecommenderEngine(movies=movies, ratings=ratings, precision=precision)
+        path = os.path.join(tempfile.mkdtemp(prefix="bench_shards_"), "shards")
+        publish_shards(engine, path, n_shards)
+        return ShardedEngine.open(path, cache_size=0)
+
+    yield f"recommend_sharded{n_shards}", case(
+        sharded, lambda e, i: e.recommend(int(users[i % len(users)]), n=10)), 50 * repeat
+    if sharded.cache_info().currsize:
+        sharded().close()
+
+
+def vector_store_cases(movies, repeat: int):
+    """Yields vector store cases; skipped when chromadb/sentence-transformers are missing."""
+    try:
+        from src.vector_store import MovieVectorStore
+    except ImportError as e:
+        print(f"  ! Skipping vector store cases: {e}")
+        return
+
+    store = lazy(lambda: MovieVectorStore(persist_directory=tempfile.mkdtemp(prefix="bench_chroma_"),
+                                          collection_name="bench"))
+
+    def index(store, i):
+        store.reset_collection()
+        store.index_movies(movies)
+
+    yield "vector_index_movies", case(store, index), max(1, repeat)
+    yield "vector_search", case(store, lambda st, i: st.search_similar_movies(
+        SEARCH_QUERIES[i % len(SEARCH_QUERIES)], n_results=10)), 20 * repeat
+
+    # 32 concurrent single-query encodes; the batching encoder folds them into few forward passes
+    pool = ThreadPoolExecutor(max_workers=32)
+    yield "vector_encode_x32", case(store, lambda st, i: list(pool.map(
+        st.generate_embedding, [f"{SEARCH_QUERIES[j % len(SEARCH_QUERIES)]} {i}" for j in range(32)]))), 5 * repeat
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def run_benchmarks(scales, cases=None, repeat: int = 1, include_vector_store: bool = False, seed: int = 42,
+                   mips_items: int = 0, shards: int = 0, precision: str = "float64") -> dict:
+    """
+    Run every benchmark case on every requested scale.
+
+    Args:
+        scales: Names from SCALES, or "users:movies:ratings" triples
+        cases: Optional set of case names to run (default: all)
+        repeat: Multiplier on the per-case iteration counts
+        include_vector_store: Also benchmark MovieVectorStore (slow, needs the embedding model)
+        seed: Seed for the synthetic datasets
+        mips_items: If > 0, also benchmark MIPSIndex on random factors for this many items
+        shards: If > 0, also benchmark recommend on a ShardedEngine with this many shards
+        precision: Engine precision, 'float64' or 'float32' (float32 also reports ranking agreement)
+
+    Returns:
+        Report dictionary with run metadata and one entry per (scale, case)
+    """
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "seed": seed,
+            "precision": precision,
+        },
+        "results": [],
+    }
+
+    for scale in scales:
+        n_users, n_movies, n_ratings = SCALES[scale] if scale in SCALES else map(int, scale.split(":"))
+        print(f"\n=== Scale '{scale}': {n_users} users, {n_movies} movies, {n_ratings} rating draws ===")
+        movies, ratings = generate_synthetic_data(n_users, n_movies, n_ratings, seed=seed)
+        dataset = {"users": n_users, "movies": n_movies, "ratings": len(ratings)}
+
+        case_iter = engine_cases(movies, ratings, repeat, precision)
+        if include_vector_store:
+            case_iter = chain(case_iter, vector_store_cases(movies, repeat))
+        if mips_items:
+            case_iter = chain(case_iter, synthetic_mips_cases(mips_items, repeat))
+        if shards:
+            case_iter = chain(case_iter, sharded_cases(movies, ratings, shards, repeat, precision))
+
+        for name, make, iterations in case_iter:
+            if cases and name not in cases:
+                continue
+            fn = make()
+            if fn is None:
+                print(f"  ! Skipping {name}: nothing to time")
+                continue
+            stats = time_calls(fn, iterations)
+            print(f"  {name:<22} p50 {stats['p50_ms']:>10.3f} ms   p99 {stats['p99_ms']:>10.3f} ms   "
+                  f"{stats['throughput_per_s']:>10} /s   process peak rss {stats['process_peak_rss_mb']} MiB")
+            report["results"].append({"scale": scale, "case": name, "dataset": dataset, **stats})
+
+    return report
+
+
+def compare_reports(current: dict, baseline: dict):
+    """Print the p50/p99 change of each (scale, case) relative to a baseline report."""
+    base = {(r["scale"], r["case"]): r for r in baseline["results"]}
+    print(f"\n=== Comparison against {baseline['meta'].get('git_commit', '?')} ===")
+    for r in current["results"]:
+        b = base.get((r["scale"], r["case"]))
+        if b is None:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p99_ms"):
+            change = (r[key] - b[key]) / b[key] * 100 if b[key] else 0.0
+            deltas.append(f"{key} {change:+7.1f}%")
+        print(f"  {r['scale']:<8} {r['case']:<22} " + "   ".join(deltas))
+
+
+def main():
+    """Parse arguments and run the benchmark suite."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the UniversalRecs hot paths on synthetic data"
+    )
+    parser.add_argument('--scales', type=str, default='small,medium',
+                        help=f'Comma-separated scales: {", ".join(SCALES)} or users:movies:ratings (default: small,medium)')
+    parser.add_argument('--cases', type=str, default='',
+                        help='Comma-separated case names to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Multiplier on per-case iteration counts (default: 1)')
+    parser.add_argument('--vector-store', action='store_true',
+                        help='Also benchmark MovieVectorStore indexing and search')
+    parser.add_argument('--mips-items', type=int, default=0,
+                        help='Also benchmark the MIPS index against brute force on this many random items (e.g. 200000)')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Also benchmark recommend on a sharded engine with this many worker processes')
+    parser.add_argument('--precision', type=str, default='float64', choices=['float64', 'float32'],
+                        help='Engine precision (default: float64)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Seed for the synthetic datasets (default: 42)')
+    parser.add_argument('--output', type=str, default='',
+                        help='Write the JSON report to this file (default: stdout)')
+    parser.add_argument('--compare', type=str, default='',
+                        help='Baseline JSON report to compare against')
+
+    args = parser.parse_args()
+
+    # Progress lines and engine output (training logs, memory plans) go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmarks(
+            scales=[s for s in args.scales.split(",") if s],
+            cases=set(c for c in args.cases.split(",") if c) or None,
+            repeat=args.repeat,
+            include_vector_store=args.vector_store,
+            seed=args.seed,
+            mips_items=args.mips_items,
+            shards=args.shards,
+            precision=args.precision,
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f, contextlib.redirect_stdout(sys.stderr):
+            compare_reports(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Synthetic Dataset Generator for UniversalRecs
+Writes a MovieLens-schema dataset of arbitrary size for load testing.
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_loader import generate_synthetic_data, save_data
+
+
+def main():
+    """Parse arguments and write the synthetic dataset."""
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic movies/ratings dataset for load testing"
+    )
+    parser.add_argument('--output-dir', type=str, required=True,
+                        help='Directory to write the dataset to')
+    parser.add_argument('--users', type=int, default=100_000,
+                        help='Number of users (default: 100000)')
+    parser.add_argument('--movies', type=int, default=10_000,
+                        help='Number of movies (default: 10000)')
+    parser.add_argument('--ratings', type=int, default=1_000_000,
+                        help='Number of rating draws before de-duplication (default: 1000000)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed (default: 42)')
+    parser.add_argument('--popularity-exponent', type=float, default=1.0,
+                        help='Zipf exponent of item popularity (default: 1.0)')
+    parser.add_argument('--activity-shape', type=float, default=1.5,
+                        help='Pareto shape of user activity (default: 1.5)')
+    parser.add_argument('--genre-affinity', type=float, default=0.7,
+                        help='Share of ratings drawn from the user\'s favourite genre (default: 0.7)')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet',
+                        help='Output format (default: parquet)')
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    movies, ratings = generate_synthetic_data(
+        n_users=args.users,
+        n_movies=args.movies,
+        n_ratings=args.ratings,
+        seed=args.seed,
+        popularity_exponent=args.popularity_exponent,
+        activity_shape=args.activity_shape,
+        genre_affinity=args.genre_affinity,
+    )
+    print(f"Generated {len(movies)} movies and {len(ratings)} ratings in {time.perf_counter() - start:.1f}s")
+    save_data(movies, ratings, args.output_dir, fmt=args.format)
+
+
+if __name__ == "__main__":
+    main()
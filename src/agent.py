@@ -1,10 +1,18 @@
+import asyncio
 import os
-from typing import TypedDict, Annotated, List, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TypedDict, Annotated, Dict, List, Optional, Union
 from dotenv import load_dotenv
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, SystemMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.tools import tool
+from .cache import LRUCache
+from .intent_router import CircuitBreaker, IntentRouter
+from .profiling import SlowCallProfiler
 from .recommender import RecommenderEngine
 
 # Load environment variables
@@ -18,7 +26,36 @@ class AgentState(TypedDict):
     final_response: str
 
 # --- 2. Define Tools ---
-_engine = RecommenderEngine()
+# The engine is injected by the host app (set_engine) so importing this
+# module doesn't train models; get_engine() builds a default one on first use.
+_engine: Optional[RecommenderEngine] = None
+_engine_lock = threading.Lock()
+
+# Shared by all chat sessions. Keys carry the engine's model version, so a
+# retrain retires old entries; recommendations are tagged with the user id and
+# dropped when the engine reports new feedback or session events for them.
+# Concurrent identical calls share one computation.
+tool_cache = LRUCache(maxsize=512, ttl=300.0)
+
+def set_engine(engine: RecommenderEngine):
+    """Use `engine` for all agent tools (e.g. the app's cached engine)."""
+    global _engine
+    engine.on_user_change(tool_cache.invalidate_tag)
+    _engine = engine
+    tool_cache.clear()
+
+def get_engine() -> RecommenderEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = RecommenderEngine()
+                engine.on_user_change(tool_cache.invalidate_tag)
+                _engine = engine
+    return _engine
+
+def _normalize_query(query: str) -> str:
+    return " ".join(str(query).lower().split())
 
 @tool
 def search_movies(query: str):
@@ -26,7 +63,13 @@ def search_movies(query: str):
     Search for movies by title, genre, or description.
     Use this when the user asks for specific types of movies (e.g., 'action movies', 'movies about space').
     """
-    results = _engine.search_items(query, n=5)
+    engine = get_engine()
+    query = _normalize_query(query)
+    return tool_cache.get_or_compute(("search_movies", query, engine.model_version),
+                                     lambda: _search_text(engine, query))
+
+def _search_text(engine: RecommenderEngine, query: str) -> str:
+    results = engine.search_items(query, n=5)
     if not results:
         return "No movies found matching that query."
     
@@ -42,7 +85,16 @@ def recommend_movies(user_id: int):
     Use this when the user asks for general suggestions (e.g., 'what should I watch?', 'recommend something').
     The user_id is required.
     """
-    recs, method = _engine.recommend(user_id, n=5)
+    engine = get_engine()
+    user_id = int(user_id)
+    # Feedback and session events reach recommend() before any retrain bumps the version: the
+    # engine invalidates this user's tag (set_engine registers the hook), and the generation read
+    # here keeps a result that raced with a change from being served under the new state
+    key = ("recommend_movies", user_id, engine.model_version, engine.user_generation(user_id))
+    return tool_cache.get_or_compute(key, lambda: _recommend_text(engine, user_id), tag=user_id)
+
+def _recommend_text(engine: RecommenderEngine, user_id: int) -> str:
+    recs, method = engine.recommend(user_id, n=5)
     response = f"Here are your personalized recommendations ({method}):\n"
     for m in recs:
         response += f"- {m['title']} ({m['score']:.2f}): {m['reason']}\n"
@@ -50,6 +102,45 @@ def recommend_movies(user_id: int):
 
 # --- 3. Define Nodes ---
 
+TOOLS = [search_movies, recommend_movies]
+
+LLM_TIMEOUT = 10.0  # seconds
+
+# After repeated Gemini failures, route locally for a while instead of waiting on timeouts
+llm_breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60.0)
+
+_intent_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+def set_intent_router(router: IntentRouter):
+    """Use `router` for local routing (e.g. one sharing MovieVectorStore's embedding model)."""
+    global _intent_router
+    _intent_router = router
+
+def get_intent_router() -> IntentRouter:
+    global _intent_router
+    if _intent_router is None:
+        with _router_lock:
+            if _intent_router is None:
+                _intent_router = IntentRouter()
+    return _intent_router
+
+# Tool-bound chat clients, one per API key; building one per message is slow
+_llm_clients: Dict[str, object] = {}
+_llm_lock = threading.Lock()
+
+def get_llm(api_key: str):
+    """Gemini client with the agent's tools bound, cached by API key."""
+    client = _llm_clients.get(api_key)
+    if client is None:
+        with _llm_lock:
+            client = _llm_clients.get(api_key)
+            if client is None:
+                llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0, google_api_key=api_key,
+                                             timeout=LLM_TIMEOUT, max_retries=1)
+                client = _llm_clients[api_key] = llm.bind_tools(TOOLS)
+    return client
+
 def router_node(state: AgentState):
     """
     Decides which tool to call based on the user's last message.
@@ -61,56 +152,104 @@ def router_node(state: AgentState):
     # Gemini Router
     api_key = state.get('google_api_key') or os.getenv("GOOGLE_API_KEY")
     
-    if api_key:
-        llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
-        tools = [search_movies, recommend_movies]
-        llm_with_tools = llm.bind_tools(tools)
-        
+    if api_key and llm_breaker.allow():
         try:
+            llm_with_tools = get_llm(api_key)
             response = llm_with_tools.invoke(messages)
-            
+            llm_breaker.record_success()
+
             if response.tool_calls:
                 return {"messages": [response]}
             else:
                 return {"messages": [response], "final_response": response.content}
         except Exception as e:
+            llm_breaker.record_failure()
             print(f"Gemini API Error: {e}")
             # Fallback will handle it
-    
-    # Fallback: Keyword Router
-    print("Warning: Gemini integration issue or missing key. Using keyword router.")
-    lower_msg = last_message.lower()
-    if "recommend" in lower_msg or "watch" in lower_msg or "suggest" in lower_msg:
-         result = recommend_movies.invoke({"user_id": user_id})
-         return {"messages": [AIMessage(content=result)], "final_response": result}
+
+    return local_route(last_message, user_id)
+
+def local_route(message: str, user_id: int):
+    """Answers without the LLM: semantic intent match, then the matching tool."""
+    print("Warning: Gemini integration issue or missing key. Using local intent router.")
+    router = get_intent_router()
+    intent, _ = router.classify(message)
+    if intent == "recommend":
+        result = recommend_movies.invoke({"user_id": user_id})
     else:
-         query = last_message.replace("search", "").strip() or "action"
-         result = search_movies.invoke({"query": query})
-         return {"messages": [AIMessage(content=result)], "final_response": result}
+        result = search_movies.invoke({"query": router.search_query(message)})
+    return {"messages": [AIMessage(content=result)], "final_response": result}
+
+TOOLS_BY_NAME = {t.name: t for t in TOOLS}
+
+# Engine calls are CPU-bound numpy work that releases the GIL for the heavy parts
+_tool_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="agent-tool")
+
+def _tool_invocations(state: AgentState):
+    """(tool, args) for every tool call on the last message, in call order."""
+    last_message = state['messages'][-1]
+    calls = []
+    for tool_call in getattr(last_message, 'tool_calls', None) or []:
+        tool_fn = TOOLS_BY_NAME.get(tool_call['name'])
+        args = dict(tool_call['args'])
+        if tool_fn is recommend_movies and 'user_id' not in args:
+            args['user_id'] = state.get('user_id', 1)
+        calls.append((tool_fn, args))
+    return calls
+
+def _run_tool(tool_fn, args):
+    if tool_fn is None:
+        return "Sorry, I can't do that yet."
+    try:
+        return tool_fn.invoke(args)
+    except Exception as e:
+        return f"Tool error: {e}"
+
+def _stream_writer():
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        # Called outside a graph run
+        return lambda chunk: None
+
+def _tool_result(results: List[str]):
+    result = "\n".join(results)
+    return {"messages": [AIMessage(content=result)], "final_response": result}
 
 def tool_execution_node(state: AgentState):
     """
-    Executes the tool selected by the LLM.
+    Executes every tool call the LLM requested, concurrently.
+
+    Each result is emitted on the "custom" stream as soon as it finishes;
+    the final response lists results in the order the calls were made.
     """
-    messages = state['messages']
-    last_message = messages[-1]
-    
-    if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
+    calls = _tool_invocations(state)
+    if not calls:
         return {}
 
-    tool_call = last_message.tool_calls[0]
-    tool_name = tool_call['name']
-    tool_args = tool_call['args']
-    
-    result = ""
-    if tool_name == "search_movies":
-        result = search_movies.invoke(tool_args)
-    elif tool_name == "recommend_movies":
-        if 'user_id' not in tool_args:
-             tool_args['user_id'] = state.get('user_id', 1)
-        result = recommend_movies.invoke(tool_args)
-    
-    return {"messages": [AIMessage(content=result)], "final_response": result}
+    writer = _stream_writer()
+    futures = {_tool_executor.submit(_run_tool, tool_fn, args): i for i, (tool_fn, args) in enumerate(calls)}
+    results = [""] * len(calls)
+    for future in as_completed(futures):
+        results[futures[future]] = future.result()
+        writer({"tool_result": future.result()})
+    return _tool_result(results)
+
+async def atool_execution_node(state: AgentState):
+    """Async variant of tool_execution_node for ainvoke/astream."""
+    calls = _tool_invocations(state)
+    if not calls:
+        return {}
+
+    writer = _stream_writer()
+    loop = asyncio.get_running_loop()
+
+    async def run(tool_fn, args):
+        result = await loop.run_in_executor(_tool_executor, _run_tool, tool_fn, args)
+        writer({"tool_result": result})
+        return result
+
+    return _tool_result(list(await asyncio.gather(*(run(t, a) for t, a in calls))))
 
 # --- 4. Define Graph ---
 
@@ -125,7 +264,7 @@ def route_condition(state: AgentState):
 workflow = StateGraph(AgentState)
 
 workflow.add_node("router", router_node)
-workflow.add_node("tools", tool_execution_node)
+workflow.add_node("tools", RunnableLambda(tool_execution_node, afunc=atool_execution_node))
 
 workflow.set_entry_point("router")
 
@@ -140,4 +279,44 @@ workflow.add_conditional_edges(
 
 workflow.add_edge("tools", END)
 
+# Compiled once per process; callers share it across chat turns
 app_graph = workflow.compile()
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    # Gemini can return a list of content parts
+    return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content or [])
+
+# Keeps cProfile dumps of slow agent turns when UNIVERSALRECS_PROFILE_DIR is set
+agent_profiler = SlowCallProfiler.from_env()
+
+def stream_response(state: AgentState, graph=None):
+    """
+    Runs the agent and yields response text as it becomes available:
+    LLM tokens as they are generated, then each tool result as its call finishes.
+    """
+    return agent_profiler.iterate("agent_graph", _stream_response(state, graph or app_graph),
+                                  user=state.get("user_id"))
+
+def _stream_response(state: AgentState, graph):
+    streamed = False
+    for mode, chunk in graph.stream(state, stream_mode=["messages", "custom", "updates"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if (metadata.get("langgraph_node") == "router" and isinstance(message, AIMessageChunk)
+                    and not message.tool_call_chunks):
+                text = _text(message.content)
+                if text:
+                    streamed = True
+                    yield text
+        elif mode == "custom" and "tool_result" in chunk:
+            prefix = "\n" if streamed else ""
+            streamed = True
+            yield prefix + chunk["tool_result"]
+        elif mode == "updates" and not streamed:
+            # Keyword fallback answers without an LLM, so nothing was streamed
+            update = chunk.get("router") or {}
+            if update.get("final_response"):
+                streamed = True
+                yield _text(update["final_response"])
@@ -0,0 +1,153 @@
+"""
+Bounded in-memory caches used by the recommender engine and agent tools.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class _InFlight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with optional TTL and tag-based invalidation.
+
+    Entries can carry a tag (e.g. a user id) so every entry for that tag can
+    be dropped at once without scanning the whole cache. get_or_compute
+    coalesces concurrent misses for the same key into one computation.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            maxsize: Maximum number of entries; 0 disables caching
+            ttl: Seconds an entry stays valid (None = until evicted)
+            clock: Time source, injectable for tests
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, expires_at, tag)
+        self._tags: Dict[Hashable, set] = {}
+        self._in_flight: Dict[Hashable, _InFlight] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at, _ = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, tag: Hashable = None):
+        if self.maxsize <= 0:
+            return
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], tag: Hashable = None) -> Any:
+        """
+        Cached value for `key`, computing and storing it on a miss.
+
+        Concurrent callers missing on the same key wait for the first
+        caller's computation instead of repeating it; if it raises, they
+        all see the same exception and nothing is cached.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = compute()
+            self.set(key, call.value, tag=tag)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
+
+    def invalidate_tag(self, tag: Hashable) -> int:
+        """Drop every entry stored under `tag`; returns how many were removed."""
+        with self._lock:
+            keys = self._tags.pop(tag, ())
+            for key in keys:
+                self._data.pop(key, None)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+    def _remove(self, key: Hashable):
+        # Caller holds the lock
+        _, _, tag = self._data.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -0,0 +1,164 @@
+"""
+Compact, array-backed item catalog and lightweight result records.
+
+The catalog replaces per-item DataFrame lookups on the hot path: ids are a
+contiguous array searched with `searchsorted`, genre strings are interned
+to integer codes and titles live in one UTF-8 string table. Every field is
+a plain array, so a catalog can be memory-mapped (see shared_model.py).
+"""
+
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class ItemCatalog:
+    """
+    Read-only item metadata in catalog (row) order.
+
+    Row i of the catalog is row i of the content similarity matrix.
+    """
+
+    __slots__ = ("ids", "_sorted_ids", "_sort_order", "_titles", "_title_offsets",
+                 "genre_codes", "genre_table")
+
+    def __init__(self, ids, titles: Iterable[str], genres: Iterable[str]):
+        """
+        Args:
+            ids: Item ids in catalog order
+            titles: Title per item
+            genres: Pipe-joined genre string per item
+        """
+        # String table: one UTF-8 blob plus byte offsets instead of a Python str per row
+        encoded = [str(t).encode("utf-8") for t in titles]
+        title_bytes = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        title_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in encoded], out=title_offsets[1:])
+
+        # Interned genre combinations
+        codes, table = pd.factorize(pd.Series(list(genres), dtype=object).fillna(""))
+
+        self._init_arrays(np.asarray(ids, dtype=np.int64), title_bytes, title_offsets,
+                          codes.astype(np.int32), [str(g) for g in table])
+
+    def _init_arrays(self, ids, title_bytes, title_offsets, genre_codes, genre_table):
+        self.ids = ids
+        self._sort_order = np.argsort(self.ids, kind="stable")
+        self._sorted_ids = self.ids[self._sort_order]
+        self._titles = title_bytes
+        self._title_offsets = title_offsets
+        self.genre_codes = genre_codes
+        self.genre_table = list(genre_table)
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, genre_table: List[str]) -> "ItemCatalog":
+        """Rebuilds a catalog from to_arrays() output (arrays may be memory-mapped)."""
+        catalog = cls.__new__(cls)
+        catalog._init_arrays(arrays["ids"], arrays["title_bytes"], arrays["title_offsets"],
+                             arrays["genre_codes"], genre_table)
+        return catalog
+
+    def to_arrays(self) -> dict:
+        """The catalog's arrays; genre_table is returned separately by the caller."""
+        return {
+            "ids": self.ids,
+            "title_bytes": self._titles,
+            "title_offsets": self._title_offsets,
+            "genre_codes": self.genre_codes,
+        }
+
+    @classmethod
+    def from_frame(cls, movies: pd.DataFrame) -> "ItemCatalog":
+        """Builds a catalog from a movies frame indexed (or keyed) by movieId."""
+        ids = movies.index if movies.index.name == "movieId" else movies["movieId"]
+        return cls(np.asarray(ids), movies["title"].tolist(), movies["genres"].tolist())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def index_of(self, movie_ids) -> np.ndarray:
+        """Catalog rows for an array of ids; -1 where the id is unknown."""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if len(self._sorted_ids) == 0:
+            return np.full(movie_ids.shape, -1, dtype=np.int64)
+        pos = np.searchsorted(self._sorted_ids, movie_ids)
+        pos = np.minimum(pos, len(self._sorted_ids) - 1)
+        found = self._sorted_ids[pos] == movie_ids
+        return np.where(found, self._sort_order[pos], -1)
+
+    def index(self, movie_id) -> int:
+        """Catalog row of a single id, or -1."""
+        return int(self.index_of([movie_id])[0])
+
+    def title(self, i: int) -> str:
+        return self._titles[self._title_offsets[i]:self._title_offsets[i + 1]].tobytes().decode("utf-8")
+
+    def genres(self, i: int) -> str:
+        return self.genre_table[self.genre_codes[i]]
+
+    @property
+    def nbytes(self) -> int:
+        return (self.ids.nbytes + self._sorted_ids.nbytes + self._sort_order.nbytes
+                + self._titles.nbytes + self._title_offsets.nbytes + self.genre_codes.nbytes
+                + sum(len(g) for g in self.genre_table))
+
+    def record(self, i: int, score: float, reason: str) -> "ScoredItem":
+        return ScoredItem(int(self.ids[i]), self.title(i), self.genres(i), float(score), reason)
+
+
+class ScoredItem:
+    """
+    One recommendation or search result.
+
+    Supports dict-style reads (`item['title']`, `'score' in item`,
+    `dict(item)`) so existing callers keep working. Treat as immutable:
+    cached result lists share these objects.
+    """
+
+    __slots__ = ("movieId", "title", "genres", "score", "reason")
+
+    def __init__(self, movieId: int, title: str, genres: str, score: float, reason: str):
+        self.movieId = movieId
+        self.title = title
+        self.genres = genres
+        self.score = score
+        self.reason = reason
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def keys(self):
+        return self.__slots__
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def _astuple(self):
+        return tuple(getattr(self, k) for k in self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, ScoredItem):
+            return self._astuple() == other._astuple()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ScoredItem(movieId={self.movieId}, title={self.title!r}, score={self.score:.4f}, reason={self.reason!r})"
+
+
+def records(catalog: ItemCatalog, idx: np.ndarray, scores: np.ndarray,
+            reasons: Optional[List[str]] = None, reason: str = "") -> List[ScoredItem]:
+    """Builds ScoredItems for catalog rows `idx` (only the rows being returned)."""
+    # One tolist() per array converts every score to a Python float at once
+    return [catalog.record(i, s, reasons[k] if reasons is not None else reason)
+            for k, (i, s) in enumerate(zip(np.asarray(idx).tolist(), np.asarray(scores).tolist()))]
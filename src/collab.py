@@ -0,0 +1,272 @@
+"""
+Collaborative filtering backends for RecommenderEngine.
+
+Each backend fits a user x item rating matrix (scipy CSR, zeros =
+unobserved) and returns (user_factors, item_factors) with shapes
+(n_users, k) and (k, n_items), so user_factors[u] @ item_factors scores
+every item for user u.
+
+    svd  - TruncatedSVD on the zero-filled matrix (explicit ratings)
+    als  - implicit-feedback weighted ALS (Hu, Koren & Volinsky 2008),
+           conjugate-gradient solves, user/item blocks on a thread pool
+    bpr  - Bayesian Personalized Ranking, mini-batch SGD
+
+ALS and BPR treat ratings as confidence that the user likes the item
+and can warm-start from the previous model's factors, so a retrain after
+a little feedback needs only a couple of iterations.
+
+fit() optionally takes per-rating sample weights (e.g. time decay): a
+weight scales how much a rating pulls the factors, never the rating
+itself, so an old 5-star rating still reads as a 5.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.decomposition import TruncatedSVD
+
+Factors = Tuple[np.ndarray, np.ndarray]
+
+
+class CollabBackend:
+    """Base class; subclasses implement fit()."""
+
+    name = ""
+    # True when user_factors @ item_factors approximates the ratings themselves (RMSE is meaningful)
+    predicts_ratings = False
+    supports_warm_start = False
+
+    def fit(self, R: sp.csr_matrix, warm_start: Optional[Factors] = None,
+            weights: Optional[np.ndarray] = None) -> Factors:
+        """
+        Args:
+            R: users x items ratings, CSR; missing entries are 0
+            warm_start: (user_factors (n_users x k), item_factors (k x n_items)) to start from
+            weights: Sample weight in (0, 1] of each stored entry, aligned with R.data (None: all 1)
+
+        Returns:
+            (user_factors, item_factors)
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class SVDBackend(CollabBackend):
+    """
+    TruncatedSVD of the zero-filled ratings. With sample weights it runs
+    a few EM steps of weighted low-rank approximation (Srebro & Jaakkola
+    2003): each rating is replaced by w * rating + (1 - w) * the current
+    reconstruction and the SVD refit, so low-weight ratings move the
+    factors less while the reconstruction still predicts raw ratings.
+    """
+
+    name = "svd"
+    predicts_ratings = True
+
+    def __init__(self, n_components: int = 10, random_state: int = 42, weighted_iterations: int = 3):
+        self.n_components = n_components
+        self.random_state = random_state
+        self.weighted_iterations = weighted_iterations
+
+    def fit(self, R, warm_start=None, weights=None):
+        n_components = min(self.n_components, min(R.shape) - 1)
+        svd = TruncatedSVD(n_components=n_components, random_state=self.random_state)
+        user_factors = svd.fit_transform(R)  # User Embeddings
+        if weights is not None:
+            R = sp.csr_matrix(R, copy=True)
+            observed = R.data.copy()
+            rows = np.repeat(np.arange(R.shape[0]), np.diff(R.indptr))
+            for _ in range(self.weighted_iterations):
+                predicted = np.einsum("ij,ji->i", user_factors[rows], svd.components_[:, R.indices])
+                R.data = (weights * observed + (1.0 - weights) * predicted).astype(R.dtype, copy=False)
+                user_factors = svd.fit_transform(R)
+        return user_factors, svd.components_  # Item Embeddings
+
+
+class ALSBackend(CollabBackend):
+    """
+    Implicit ALS: minimise sum c_ui (p_ui - x_u.y_i)^2 + reg (|x|^2 + |y|^2)
+    with p_ui = 1 for observed entries and c_ui = 1 + alpha * w_ui * r_ui
+    (w_ui the sample weight, 1 by default).
+
+    Each half-step solves every user's (or item's) normal equations with a
+    few conjugate-gradient steps started from the current factors, which
+    needs only the nonzeros of R (no dense n_users x n_items work). Users
+    are processed in blocks; blocks run on a thread pool and numpy does the
+    per-block work with the GIL released.
+    """
+
+    name = "als"
+    supports_warm_start = True
+
+    def __init__(self, factors: int = 10, regularization: float = 0.1, alpha: float = 10.0,
+                 iterations: int = 15, warm_iterations: int = 2, cg_steps: int = 3,
+                 block_size: int = 512, n_threads: Optional[int] = None, random_state: int = 42):
+        """
+        Args:
+            factors: Latent dimension
+            regularization: L2 penalty
+            alpha: Confidence scale for ratings
+            iterations: Full ALS sweeps from a cold start
+            warm_iterations: Sweeps when warm-started
+            cg_steps: Conjugate-gradient steps per solve
+            block_size: Rows solved together per task
+            n_threads: Thread pool size (default: os.cpu_count())
+            random_state: Seed for cold-start initialisation
+        """
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.warm_iterations = warm_iterations
+        self.cg_steps = cg_steps
+        self.block_size = block_size
+        self.n_threads = n_threads
+        self.random_state = random_state
+        self.last_iterations = 0
+
+    def fit(self, R, warm_start=None, weights=None):
+        Cui = sp.csr_matrix(R, dtype=np.float64) * self.alpha   # c_ui - 1 on observed entries
+        if weights is not None:
+            Cui.data *= weights
+        Cui.eliminate_zeros()
+        Ciu = Cui.T.tocsr()
+        n_users, n_items = Cui.shape
+
+        if warm_start is not None:
+            X = np.array(warm_start[0], dtype=np.float64)
+            Y = np.array(warm_start[1], dtype=np.float64).T.copy()
+            iterations = self.warm_iterations
+        else:
+            rng = np.random.default_rng(self.random_state)
+            X = rng.normal(scale=0.01, size=(n_users, self.factors))
+            Y = rng.normal(scale=0.01, size=(n_items, self.factors))
+            iterations = self.iterations
+
+        with ThreadPoolExecutor(max_workers=self.n_threads) as pool:
+            for _ in range(iterations):
+                self._sweep(pool, Cui, X, Y)
+                self._sweep(pool, Ciu, Y, X)
+        self.last_iterations = iterations
+        return X, Y.T.copy()
+
+    def _sweep(self, pool, C, X, Y):
+        """Updates every row of X in place given fixed Y."""
+        YtY = Y.T @ Y + self.regularization * np.eye(Y.shape[1])
+        blocks = range(0, C.shape[0], self.block_size)
+        list(pool.map(lambda start: self._solve_block(C, X, Y, YtY, start,
+                                                      min(start + self.block_size, C.shape[0])), blocks))
+
+    def _solve_block(self, C, X, Y, YtY, start, end):
+        indptr = C.indptr[start:end + 1] - C.indptr[start]
+        nz = slice(C.indptr[start], C.indptr[end])
+        conf = C.data[nz]
+        Yi = Y[C.indices[nz]]
+        rows = np.repeat(np.arange(end - start), np.diff(indptr))
+        # Sums per-nonzero vectors into their row: S @ v
+        S = sp.csr_matrix((np.ones(len(conf)), np.arange(len(conf)), indptr), shape=(end - start, len(conf)))
+
+        def A(p):
+            # (YtY + reg I + Y^T (C_u - I) Y) p for every row at once
+            return p @ YtY + S @ ((conf * np.einsum("ij,ij->i", Yi, p[rows]))[:, None] * Yi)
+
+        x = X[start:end]
+        b = S @ ((1.0 + conf)[:, None] * Yi)   # Y^T C_u p_u
+        r = b - A(x)
+        p = r.copy()
+        rs_old = np.einsum("ij,ij->i", r, r)
+        for _ in range(self.cg_steps):
+            if rs_old.max() < 1e-20:
+                break
+            Ap = A(p)
+            step = rs_old / np.maximum(np.einsum("ij,ij->i", p, Ap), 1e-20)
+            x += step[:, None] * p
+            r -= step[:, None] * Ap
+            rs_new = np.einsum("ij,ij->i", r, r)
+            p = r + (rs_new / np.maximum(rs_old, 1e-20))[:, None] * p
+            rs_old = rs_new
+        X[start:end] = x
+
+
+class BPRBackend(CollabBackend):
+    """
+    BPR-MF: for sampled (user, observed item i, random item j), push
+    x_u.y_i above x_u.y_j. Updates are vectorised over mini-batches; a
+    sample weight scales the gradient of the triples drawn from its rating.
+    """
+
+    name = "bpr"
+    supports_warm_start = True
+
+    def __init__(self, factors: int = 10, learning_rate: float = 0.05, regularization: float = 0.01,
+                 epochs: int = 30, warm_epochs: int = 3, batch_size: int = 1024, random_state: int = 42):
+        """
+        Args:
+            factors: Latent dimension
+            learning_rate: SGD step size
+            regularization: L2 penalty
+            epochs: Passes over the observed entries from a cold start
+            warm_epochs: Passes when warm-started
+            batch_size: Triples per vectorised update
+            random_state: Seed for initialisation and sampling
+        """
+        self.factors = factors
+        self.learning_rate = learning_rate
+        self.regularization = regularization
+        self.epochs = epochs
+        self.warm_epochs = warm_epochs
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.last_iterations = 0
+
+    def fit(self, R, warm_start=None, weights=None):
+        R = sp.coo_matrix(R)
+        observed = R.data > 0
+        users, items = R.row[observed], R.col[observed]
+        sample_weights = None if weights is None else np.asarray(weights, dtype=np.float64)[observed]
+        n_users, n_items = R.shape
+        rng = np.random.default_rng(self.random_state)
+
+        if warm_start is not None:
+            X = np.array(warm_start[0], dtype=np.float64)
+            Y = np.array(warm_start[1], dtype=np.float64).T.copy()
+            epochs = self.warm_epochs
+        else:
+            X = rng.normal(scale=0.1, size=(n_users, self.factors))
+            Y = rng.normal(scale=0.1, size=(n_items, self.factors))
+            epochs = self.epochs
+
+        lr, reg = self.learning_rate, self.regularization
+        for _ in range(epochs):
+            order = rng.permutation(len(users))
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                u, i = users[batch], items[batch]
+                j = rng.integers(0, n_items, size=len(batch))
+                xu, yi, yj = X[u], Y[i], Y[j]
+                x_uij = np.einsum("ij,ij->i", xu, yi - yj)
+                g = (1.0 / (1.0 + np.exp(np.clip(x_uij, -30, 30))))[:, None]   # sigmoid(-x_uij)
+                if sample_weights is not None:
+                    g = g * sample_weights[batch][:, None]
+                np.add.at(X, u, lr * (g * (yi - yj) - reg * xu))
+                np.add.at(Y, i, lr * (g * xu - reg * yi))
+                np.add.at(Y, j, lr * (-g * xu - reg * yj))
+        self.last_iterations = epochs
+        return X, Y.T.copy()
+
+
+BACKENDS = {cls.name: cls for cls in (SVDBackend, ALSBackend, BPRBackend)}
+
+
+def make_backend(backend) -> CollabBackend:
+    """A backend instance from a name ('svd', 'als', 'bpr') or an instance."""
+    if isinstance(backend, CollabBackend):
+        return backend
+    try:
+        return BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown collab backend {backend!r}; expected one of {sorted(BACKENDS)}")
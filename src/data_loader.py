@@ -1,77 +1,193 @@
 import pandas as pd
 import numpy as np
 import os
-from typing import Tuple
+from typing import Optional, Tuple
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
 MOVIES_FILE = os.path.join(DATA_DIR, 'movies.csv')
 RATINGS_FILE = os.path.join(DATA_DIR, 'ratings.csv')
 
+# Columnar datasets can't be appended to row by row, so feedback for them
+# goes to a small CSV log next to the parquet files and is merged on load.
+FEEDBACK_FILENAME = 'ratings_feedback.csv'
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Fantasy', 'Horror', 'Sci-Fi', 'Thriller']
+
+
+def generate_synthetic_data(
+    n_users: int = 20,
+    n_movies: int = 100,
+    n_ratings: int = 500,
+    seed: Optional[int] = None,
+    popularity_exponent: float = 1.0,
+    activity_shape: float = 1.5,
+    genre_affinity: float = 0.7,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Vectorized generator for MovieLens-schema data at arbitrary scale.
+
+    Args:
+        n_users: Number of users
+        n_movies: Number of movies
+        n_ratings: Number of rating draws (duplicates are dropped afterwards)
+        seed: Seed for reproducible output
+        popularity_exponent: Zipf exponent of item popularity (0 = uniform)
+        activity_shape: Pareto shape of user activity (lower = heavier tail)
+        genre_affinity: Probability that a rating comes from the user's favourite genre
+
+    Returns:
+        Tuple of (movies, ratings) DataFrames
+    """
+    rng = np.random.default_rng(seed)
+    genres = np.array(GENRES)
+    n_genres = len(genres)
+
+    # 1. Movies: 1-3 distinct genres each, taken from a random permutation per row
+    n_movie_genres = rng.integers(1, 4, size=n_movies)
+    genre_order = np.argsort(rng.random((n_movies, n_genres)), axis=1)[:, :3]
+    genre_mask = np.zeros((n_movies, n_genres), dtype=bool)
+    rows = np.arange(n_movies)
+    for j in range(3):
+        has_j = n_movie_genres > j
+        genre_mask[rows[has_j], genre_order[has_j, j]] = True
+
+    genres_str = pd.Series(genres[genre_order[:, 0]])
+    for j in (1, 2):
+        genres_str = genres_str.where(n_movie_genres <= j, genres_str + '|' + genres[genre_order[:, j]])
+
+    movie_ids = rows + 1
+    primary = pd.Series(genres[genre_order[:, 0]]).str.lower()
+    is_action = genre_mask[:, GENRES.index('Action')]
+    is_scifi = genre_mask[:, GENRES.index('Sci-Fi')]
+    movies = pd.DataFrame({
+        'movieId': movie_ids,
+        'title': 'Movie ' + pd.Series(movie_ids).astype(str) + ' (' + pd.Series(2000 + movie_ids % 23).astype(str) + ')',
+        'genres': genres_str,
+        'description': 'A ' + primary + ' movie about ' + np.where(is_action, 'heroic ', 'complex ')
+                       + ' characters in a ' + np.where(is_scifi, 'futuristic', 'modern') + ' world.',
+    })
+
+    # 2. Popularity (Zipf over a random item ranking) and user activity (Pareto)
+    popularity = (rng.permutation(n_movies) + 1.0) ** -popularity_exponent
+    popularity /= popularity.sum()
+
+    activity = rng.pareto(activity_shape, size=n_users) + 1.0
+    if n_ratings >= n_users:
+        counts = 1 + rng.multinomial(n_ratings - n_users, activity / activity.sum())
+    else:
+        counts = rng.multinomial(n_ratings, activity / activity.sum())
+    user_idx = np.repeat(np.arange(n_users), counts)
+    n_draws = len(user_idx)
+
+    # Each user favours one genre, drawn in proportion to how much of the
+    # catalogue's popularity that genre holds.
+    genre_weight = popularity @ genre_mask
+    favourite = rng.choice(n_genres, size=n_users, p=genre_weight / genre_weight.sum())
+
+    # 3. Items: global popularity draws, replaced by in-genre draws with prob genre_affinity
+    item_idx = np.searchsorted(np.cumsum(popularity), rng.random(n_draws), side='right')
+    from_favourite = rng.random(n_draws) < genre_affinity
+    draw_genre = favourite[user_idx]
+    for g in range(n_genres):
+        sel = np.flatnonzero(from_favourite & (draw_genre == g))
+        in_genre = np.flatnonzero(genre_mask[:, g])
+        if len(sel) == 0 or len(in_genre) == 0:
+            continue
+        cum = np.cumsum(popularity[in_genre])
+        item_idx[sel] = in_genre[np.searchsorted(cum, rng.random(len(sel)) * cum[-1], side='right')]
+    item_idx = np.minimum(item_idx, n_movies - 1)
+
+    # 4. Ratings skewed positive, higher for the user's favourite genre
+    match = genre_mask[item_idx, draw_genre]
+    raw = (3.4 + 0.8 * match
+           + rng.normal(0.0, 0.4, size=n_users)[user_idx]
+           + rng.normal(0.0, 0.5, size=n_movies)[item_idx]
+           + rng.normal(0.0, 0.8, size=n_draws))
+    rating = np.clip(np.rint(raw), 1.0, 5.0)
+    timestamp = 1609459200 + rng.integers(0, 31536000, size=n_draws)  # Random time in 2021
+
+    # Remove duplicates (user rating same movie twice), keeping the first draw
+    key = user_idx.astype(np.int64) * n_movies + item_idx
+    _, first = np.unique(key, return_index=True)
+    first.sort()
+
+    ratings = pd.DataFrame({
+        'userId': (user_idx[first] + 1).astype(np.int32),
+        'movieId': (item_idx[first] + 1).astype(np.int32),
+        'rating': rating[first].astype(np.float32),
+        'timestamp': timestamp[first].astype(np.int64),
+    })
+    return movies, ratings
+
+
+def save_data(movies: pd.DataFrame, ratings: pd.DataFrame, data_dir: str = DATA_DIR, fmt: str = 'csv'):
+    """Writes movies and ratings to data_dir as 'csv' or columnar 'parquet'."""
+    if fmt not in ('csv', 'parquet'):
+        raise ValueError(f"Unknown data format: {fmt!r}")
+    os.makedirs(data_dir, exist_ok=True)
+
+    movies_path, ratings_path = _data_paths(data_dir, fmt)
+    if fmt == 'parquet':
+        movies.to_parquet(movies_path, index=False)
+        ratings.to_parquet(ratings_path, index=False)
+    else:
+        movies.to_csv(movies_path, index=False)
+        ratings.to_csv(ratings_path, index=False)
+    print(f"Created {movies_path} with {len(movies)} items.")
+    print(f"Created {ratings_path} with {len(ratings)} interactions.")
+
+
 def create_dummy_data():
     """Generates synthetic data compatible with MovieLens schema."""
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-
-    # 1. Generate Movies (Items)
-    # Schema: movieId, title, genres, description
-    genres_list = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Fantasy', 'Horror', 'Sci-Fi', 'Thriller']
-    
-    n_movies = 100
-    movies_data = []
-    
-    for i in range(1, n_movies + 1):
-        # Pick 1-3 random genres
-        movie_genres = np.random.choice(genres_list, size=np.random.randint(1, 4), replace=False)
-        genres_str = "|".join(movie_genres)
-        
-        # Simple synthetic title
-        title = f"Movie {i} ({2000 + (i % 23)})"
-        
-        # synthetic description for TF-IDF
-        # mixing genres into a sentence
-        description = f"A {movie_genres[0].lower()} movie about {('heroic ' if 'Action' in movie_genres else 'complex ')} characters in a {'futuristic' if 'Sci-Fi' in movie_genres else 'modern'} world."
-        
-        movies_data.append([i, title, genres_str, description])
-        
-    df_movies = pd.DataFrame(movies_data, columns=['movieId', 'title', 'genres', 'description'])
-    df_movies.to_csv(MOVIES_FILE, index=False)
-    print(f"Created {MOVIES_FILE} with {n_movies} items.")
-
-    # 2. Generate Ratings (Interactions)
-    # Schema: userId, movieId, rating, timestamp
-    n_users = 20
-    n_interactions = 500
-    
-    ratings_data = []
-    
-    # Ensure every user rates at least a few movies, and every movie has at least one rating (mostly)
-    users = range(1, n_users + 1)
-    movie_ids = df_movies['movieId'].values
-    
-    for _ in range(n_interactions):
-        u = np.random.choice(users)
-        m = np.random.choice(movie_ids)
-        r = np.random.choice([1.0, 2.0, 3.0, 4.0, 5.0], p=[0.05, 0.1, 0.25, 0.35, 0.25]) # skewed towards positive
-        timestamp = 1609459200 + np.random.randint(0, 31536000) # Random time in 2021
-        
-        ratings_data.append([u, m, r, timestamp])
-        
-    df_ratings = pd.DataFrame(ratings_data, columns=['userId', 'movieId', 'rating', 'timestamp'])
-    # Remove duplicates (user rating same movie twice)
-    df_ratings = df_ratings.drop_duplicates(subset=['userId', 'movieId'])
-    
-    df_ratings.to_csv(RATINGS_FILE, index=False)
-    print(f"Created {RATINGS_FILE} with {len(df_ratings)} interactions.")
-
-def load_data() -> Tuple[pd.DataFrame, pd.DataFrame]:
+    movies, ratings = generate_synthetic_data(n_users=20, n_movies=100, n_ratings=500,
+                                             popularity_exponent=0.5, activity_shape=3.0)
+    save_data(movies, ratings, DATA_DIR, fmt='csv')
+
+
+def _data_paths(data_dir: str, fmt: str) -> Tuple[str, str]:
+    return (os.path.join(data_dir, f'movies.{fmt}'),
+            os.path.join(data_dir, f'ratings.{fmt}'))
+
+
+def _detect_format(data_dir: str) -> Optional[str]:
+    for fmt in ('parquet', 'csv'):
+        if all(os.path.exists(p) for p in _data_paths(data_dir, fmt)):
+            return fmt
+    return None
+
+
+def feedback_file(data_dir: Optional[str] = None) -> str:
+    """Path that new ratings are appended to for the dataset in data_dir."""
+    data_dir = data_dir or DATA_DIR
+    if _detect_format(data_dir) == 'parquet':
+        return os.path.join(data_dir, FEEDBACK_FILENAME)
+    return os.path.join(data_dir, 'ratings.csv')
+
+
+def load_data(data_dir: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Loads movies and ratings data, generating it if necessary."""
-    if not os.path.exists(MOVIES_FILE) or not os.path.exists(RATINGS_FILE):
-        print("Data files not found. Generating dummy data...")
-        create_dummy_data()
-        
-    movies = pd.read_csv(MOVIES_FILE)
-    ratings = pd.read_csv(RATINGS_FILE)
-    
+    if data_dir is None:
+        data_dir = DATA_DIR
+        if _detect_format(data_dir) is None:
+            print("Data files not found. Generating dummy data...")
+            create_dummy_data()
+
+    fmt = _detect_format(data_dir)
+    if fmt is None:
+        raise FileNotFoundError(f"No movies/ratings dataset found in {data_dir}")
+
+    movies_path, ratings_path = _data_paths(data_dir, fmt)
+    if fmt == 'parquet':
+        movies = pd.read_parquet(movies_path)
+        ratings = pd.read_parquet(ratings_path)
+        feedback_path = os.path.join(data_dir, FEEDBACK_FILENAME)
+        if os.path.exists(feedback_path):
+            feedback = pd.read_csv(feedback_path, names=list(ratings.columns))
+            ratings = pd.concat([ratings, feedback.astype(ratings.dtypes.to_dict())], ignore_index=True)
+    else:
+        movies = pd.read_csv(movies_path)
+        ratings = pd.read_csv(ratings_path)
+
     return movies, ratings
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+"""
+Dynamic batching for embedding requests.
+
+A single forward pass over 32 short texts costs little more than a pass
+over one, so encoding each query separately wastes most of the model's
+throughput under concurrent load. BatchingEncoder puts requests on a
+queue. A worker thread collects whatever arrives within a few
+milliseconds (up to max_batch_size), encodes it in one call and resolves
+each caller's future. The heavy model work runs in native code that
+releases the GIL, so callers keep running while a batch is encoded.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+_STOP = object()
+
+
+class BatchingEncoder:
+    """Encodes texts on a worker thread in dynamically sized batches."""
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        name: str = "embedding-encoder",
+    ):
+        """
+        Args:
+            encode_fn: Encodes a list of texts into an (n, d) array (e.g. SentenceTransformer.encode)
+            max_batch_size: Largest batch passed to encode_fn
+            max_wait_ms: How long the first request of a batch waits for others to join
+            name: Worker thread name
+        """
+        self._encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self.batches = 0
+        self.encoded = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue one text; the future resolves to its embedding vector."""
+        if self._closed:
+            raise RuntimeError("BatchingEncoder is closed")
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Embedding of one text (blocks until its batch has run)."""
+        return self.submit(text).result(timeout)
+
+    def encode_many(self, texts: Sequence[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Embeddings of several texts; they may be batched with other callers' requests."""
+        futures = [self.submit(t) for t in texts]
+        return np.stack([f.result(timeout) for f in futures]) if futures else np.empty((0, 0))
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop accepting requests and let the worker finish the queued ones."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "mean_batch_size": self.encoded / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        # Skip requests whose callers gave up (cancelled futures)
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            vectors = np.asarray(self._encode_fn([text for text, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.encoded += len(batch)
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
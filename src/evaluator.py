@@ -1,9 +1,14 @@
+import argparse
 import numpy as np
 from sklearn.metrics import mean_squared_error
 from math import sqrt
+from .memory import Representation
 from .recommender import RecommenderEngine
+from .streaming import DAY
 
 class Evaluator:
+    CHUNK = 65536   # (user, item) pairs predicted per einsum in calculate_rmse
+
     def __init__(self, engine: RecommenderEngine):
         self.engine = engine
         self.ratings = engine.ratings
@@ -13,30 +18,30 @@ class Evaluator:
         # We compare the reconstructed matrix (from SVD) with the actual ratings.
         # Note: This is Training RMSE (simplification). proper way is Train/Test split.
         
-        if self.engine.collab_user_factors is None:
+        # One consistent snapshot, even if a background retrain publishes meanwhile
+        model = self.engine.model
+        if model.collab_user_factors is None or model.user_item_matrix is None:
+            return float('nan')
+        # ALS/BPR factors score preference, not the rating scale
+        backend = getattr(self.engine, 'collab_backend', None)
+        if backend is not None and not backend.predicts_ratings:
             return float('nan')
             
-        # Reconstruct full matrix
-        reconstructed = np.dot(self.engine.collab_user_factors, self.engine.collab_item_factors)
-        
-        # We only care about errors on KNOWN ratings
-        # Get indices of known ratings
-        users = self.engine.user_item_matrix.index
-        items = self.engine.user_item_matrix.columns
-        
-        y_true = []
-        y_pred = []
-        
-        # Efficient way using the interactions dataframe
-        for _, row in self.ratings.iterrows():
-            u, m, r = row['userId'], row['movieId'], row['rating']
-            if m in items and u in users:
-                u_idx = users.get_loc(u)
-                m_idx = items.get_loc(m)
-                pred = reconstructed[u_idx, m_idx]
-                y_true.append(r)
-                y_pred.append(pred)
-                
+        # We only care about errors on KNOWN ratings: predict just those
+        # (user, item) pairs instead of reconstructing the full matrix
+        u_idx = model.user_item_matrix.index.get_indexer(self.ratings['userId'])
+        m_idx = model.user_item_matrix.columns.get_indexer(self.ratings['movieId'])
+        known = (u_idx >= 0) & (m_idx >= 0)
+        u_idx, m_idx = u_idx[known], m_idx[known]
+        y_true = self.ratings['rating'].to_numpy()[known]
+
+        # Chunked so the gathered factor rows stay small
+        y_pred = np.empty(len(u_idx))
+        for start in range(0, len(u_idx), self.CHUNK):
+            stop = start + self.CHUNK
+            y_pred[start:stop] = np.einsum('ij,ji->i', model.collab_user_factors[u_idx[start:stop]],
+                                           model.collab_item_factors[:, m_idx[start:stop]])
+
         rmse = sqrt(mean_squared_error(y_true, y_pred))
         return rmse
 
@@ -58,9 +63,69 @@ class Evaluator:
         coverage = len(recommended_items) / len(all_items)
         return coverage
 
+    def compare_rankings(self, reference: RecommenderEngine, user_ids=None, n=10):
+        """
+        How closely this engine's top-n matches `reference`'s for the same users.
+
+        Returns a dict with 'users', 'overlap' (mean share of the reference's
+        top-n also recommended here), 'identical' (share of users with the
+        same items in the same order) and 'max_score_diff' (largest score
+        difference on items both recommend).
+        """
+        if user_ids is None:
+            user_ids = self.ratings['userId'].unique()
+        overlap, identical, max_diff = [], [], 0.0
+        for user_id in user_ids:
+            recs, _ = self.engine.recommend(user_id, n=n)
+            expected, _ = reference.recommend(user_id, n=n)
+            ids = [r['movieId'] for r in recs]
+            expected_scores = {r['movieId']: r['score'] for r in expected}
+            overlap.append(len(set(ids) & set(expected_scores)) / max(len(expected_scores), 1))
+            identical.append(ids == [r['movieId'] for r in expected])
+            for r in recs:
+                if r['movieId'] in expected_scores:
+                    max_diff = max(max_diff, abs(r['score'] - expected_scores[r['movieId']]))
+        return {
+            "users": len(identical),
+            "overlap": float(np.mean(overlap)) if overlap else float('nan'),
+            "identical": float(np.mean(identical)) if identical else float('nan'),
+            "max_score_diff": max_diff,
+        }
+
+    def verify_precision(self, n=10, n_users=50, seed=0):
+        """
+        Verification mode for precision='float32': retrains the same data
+        and settings at float64 and compares the rankings of a sample of
+        users (see compare_rankings). The reference keeps the engine's
+        representation (sparse ratings, top-K similarities) as planned for
+        its memory_budget, so precision is the only difference.
+        """
+        engine = self.engine
+        stream = engine.stream
+        index_params = engine.collab_index_params
+        planned = engine.representation
+        sim_dtype = np.float64 if planned.sim_dtype == engine.dtype else planned.sim_dtype
+        reference = RecommenderEngine(
+            movies=engine.movies.reset_index(), ratings=self.ratings, background_training=False, cache_size=0,
+            collab_backend=engine.collab_backend, collab_candidates=engine.collab_candidates,
+            collab_index=index_params if index_params else index_params is not None,
+            half_life_days=stream.half_life / DAY if stream is not None and stream.half_life else None,
+            window_days=stream.window / DAY if stream is not None and stream.window else None,
+            precision="float64",
+            representation=Representation(planned.sparse_ratings, sim_dtype, planned.sim_neighbors),
+        )
+        users = self.ratings['userId'].unique()
+        users = np.random.default_rng(seed).choice(users, min(n_users, len(users)), replace=False)
+        return self.compare_rankings(reference, [int(u) for u in users], n=n)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the recommender on the bundled data")
+    parser.add_argument('--precision', type=str, default=None,
+                        help='float64 or float32; float32 also compares rankings against float64')
+    args = parser.parse_args()
+
     print("Initializing Engine for Evaluation...")
-    engine = RecommenderEngine()
+    engine = RecommenderEngine(precision=args.precision)
     evaluator = Evaluator(engine)
     
     print("Calculating RMSE...")
@@ -70,3 +135,9 @@ if __name__ == "__main__":
     print("Calculating Coverage (Top-10)...")
     cov = evaluator.calculate_coverage()
     print(f"Catalog Coverage: {cov:.2%}")
+
+    if engine.dtype != np.float64:
+        print("Comparing rankings against float64...")
+        agreement = evaluator.verify_precision()
+        print(f"Top-10 overlap: {agreement['overlap']:.2%}, identical lists: {agreement['identical']:.2%}, "
+              f"max score difference: {agreement['max_score_diff']:.2e}")
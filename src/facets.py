@@ -0,0 +1,93 @@
+"""
+Precomputed metadata facets for filtered vector search.
+
+Chroma's `where` clauses only test whole metadata values, so a genres
+string like "Action|Sci-Fi" can't answer "contains Action". At index time
+every movie therefore gets one boolean field per genre plus a release
+year parsed from its title. build_where() turns genre/year filters into
+a `where` clause over those fields, so the vector index applies the
+filter itself.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+_YEAR = re.compile(r"\((\d{4})\)\s*$")
+
+
+def genre_field(genre: str) -> str:
+    """Metadata key of a genre's boolean facet, e.g. 'Sci-Fi' -> 'genre_sci_fi'."""
+    return "genre_" + re.sub(r"[^a-z0-9]+", "_", genre.lower()).strip("_")
+
+
+def parse_year(title: str) -> Optional[int]:
+    """Release year from a 'Title (1999)' style title, or None."""
+    match = _YEAR.search(str(title))
+    return int(match.group(1)) if match else None
+
+
+def split_genres(genres: str) -> List[str]:
+    return [g for g in str(genres).split("|") if g and g != "(no genres listed)"]
+
+
+def facet_metadata(genres: str, title: str, all_genres: Iterable[str]) -> Dict:
+    """
+    Facet fields for one movie: genre_* for every genre in `all_genres`
+    (True/False, so none-of filters can match on False) and year (-1 if unknown).
+    """
+    own = set(split_genres(genres))
+    fields = {genre_field(g): g in own for g in all_genres}
+    year = parse_year(title)
+    fields["year"] = year if year is not None else -1
+    return fields
+
+
+def build_where(
+    genres_any: Optional[Iterable[str]] = None,
+    genres_all: Optional[Iterable[str]] = None,
+    genres_none: Optional[Iterable[str]] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    extra: Optional[Dict] = None,
+    facet_fields: Optional[Iterable[str]] = None,
+) -> Optional[Dict]:
+    """
+    Chroma `where` clause for the given filters, or None for no filtering.
+
+    Args:
+        genres_any: Match movies with at least one of these genres
+        genres_all: Match movies with every one of these genres
+        genres_none: Exclude movies with any of these genres
+        year_min: Earliest release year (inclusive)
+        year_max: Latest release year (inclusive)
+        extra: Raw `where` clause ANDed with the rest
+        facet_fields: Metadata keys the index holds (e.g. one movie's
+            metadata). Chroma never matches a missing key, so genres_none
+            genres without a field here are dropped instead of excluding
+            every movie.
+    """
+    clauses = []
+    any_of = [{genre_field(g): True} for g in genres_any or []]
+    if len(any_of) == 1:
+        clauses.append(any_of[0])
+    elif any_of:
+        clauses.append({"$or": any_of})
+    clauses.extend({genre_field(g): True} for g in genres_all or [])
+    none_of = [genre_field(g) for g in genres_none or []]
+    if facet_fields is not None:
+        facet_fields = set(facet_fields)
+        none_of = [field for field in none_of if field in facet_fields]
+    clauses.extend({field: False} for field in none_of)
+    if year_min is not None:
+        clauses.append({"year": {"$gte": int(year_min)}})
+    if year_max is not None:
+        clauses.append({"year": {"$lte": int(year_max)}})
+        if year_min is None:
+            # Unknown years are stored as -1; keep them out of "before X" queries
+            clauses.append({"year": {"$gte": 0}})
+    if extra:
+        clauses.append(extra)
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,203 @@
+"""
+Local intent routing for the agent when the remote LLM is unavailable.
+
+IntentRouter embeds the user's message and picks the intent whose
+prototype phrases are closest in cosine similarity. It uses the same
+sentence-transformers model as MovieVectorStore when that is installed and
+loadable. Otherwise it uses a character n-gram hashing encoder, so routing
+works fully offline. CircuitBreaker stops the agent from paying the
+network timeout on every message while the LLM is failing.
+"""
+
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from .data_loader import GENRES
+
+INTENT_PROTOTYPES: Dict[str, List[str]] = {
+    "recommend": [
+        "recommend a movie",
+        "recommend me something",
+        "what should I watch",
+        "what should I watch tonight",
+        "suggest something for me",
+        "any suggestions for me",
+        "give me personalized picks",
+        "pick a film for me",
+        "what would I like",
+        "I'm bored, what can I watch",
+    ],
+    "search": [
+        "search for action movies",
+        "find sci-fi films",
+        "show me comedies",
+        "movies about space",
+        "I want a funny movie",
+        "looking for a scary horror film",
+        "do you have any documentaries",
+        "films with dragons and magic",
+        "a thriller with a plot twist",
+    ],
+}
+
+# Everyday words mapped onto catalog genres for the search query
+GENRE_SYNONYMS = {
+    "funny": "Comedy", "comedies": "Comedy", "hilarious": "Comedy", "laugh": "Comedy",
+    "scary": "Horror", "spooky": "Horror", "creepy": "Horror",
+    "space": "Sci-Fi", "science fiction": "Sci-Fi", "scifi": "Sci-Fi", "sci fi": "Sci-Fi", "robots": "Sci-Fi",
+    "animated": "Animation", "cartoon": "Animation", "cartoons": "Animation",
+    "documentaries": "Documentary", "true story": "Documentary",
+    "magic": "Fantasy", "dragons": "Fantasy",
+    "suspense": "Thriller", "thrillers": "Thriller",
+    "heist": "Crime", "gangster": "Crime", "detective": "Crime",
+    "dramas": "Drama", "emotional": "Drama",
+    "explosions": "Action", "fight": "Action",
+}
+
+_FILLER = re.compile(
+    r"\b(please|can you|could you|search( for)?|find( me)?|show( me)?|look(ing)? for|i want( to watch)?|"
+    r"i'd like|give me|recommend|suggest|some|any|a|an|the|about|with|do you have)\b",
+    re.IGNORECASE,
+)
+
+Encoder = Callable[[Sequence[str]], np.ndarray]
+
+
+def hashing_encoder(n_features: int = 2 ** 12) -> Encoder:
+    """Offline encoder: L2-normalised character n-gram hashes."""
+    vectorizer = HashingVectorizer(analyzer="char_wb", ngram_range=(2, 4), n_features=n_features,
+                                   alternate_sign=False, norm="l2")
+    return lambda texts: vectorizer.transform([t.lower() for t in texts]).toarray()
+
+
+def sentence_encoder(model_name: str = "all-MiniLM-L6-v2", model=None) -> Encoder:
+    """Encoder over a SentenceTransformer (e.g. MovieVectorStore.embedding_model)."""
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name)
+    return lambda texts: model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+
+def default_encoder() -> Encoder:
+    """Sentence embeddings if the model can be loaded, otherwise the hashing encoder."""
+    try:
+        return sentence_encoder()
+    except Exception as e:
+        print(f"Embedding model unavailable ({e}); using hashing encoder for intent routing.")
+        return hashing_encoder()
+
+
+class IntentRouter:
+    """Nearest-prototype intent classifier over sentence embeddings."""
+
+    def __init__(
+        self,
+        encoder: Optional[Encoder] = None,
+        prototypes: Optional[Dict[str, List[str]]] = None,
+        default_intent: str = "search",
+        min_score: float = 0.2,
+    ):
+        """
+        Args:
+            encoder: texts -> (n, d) array of L2-normalised embeddings (default: default_encoder())
+            prototypes: Example phrases per intent
+            default_intent: Intent returned when no prototype scores at least min_score
+            min_score: Minimum cosine similarity to accept an intent
+        """
+        self.encoder = encoder or default_encoder()
+        self.prototypes = prototypes or INTENT_PROTOTYPES
+        self.default_intent = default_intent
+        self.min_score = min_score
+
+        self._labels = np.array([intent for intent, phrases in self.prototypes.items() for _ in phrases])
+        phrases = [p for ps in self.prototypes.values() for p in ps]
+        self._prototype_vectors = _normalize(np.asarray(self.encoder(phrases), dtype=np.float32))
+
+    def classify(self, message: str) -> Tuple[str, float]:
+        """(intent, cosine similarity of the best matching prototype)."""
+        vector = _normalize(np.asarray(self.encoder([message]), dtype=np.float32))[0]
+        sims = self._prototype_vectors @ vector
+        best = int(np.argmax(sims))
+        score = float(sims[best])
+        if score < self.min_score:
+            return self.default_intent, score
+        return str(self._labels[best]), score
+
+    @staticmethod
+    def search_query(message: str) -> str:
+        """Catalog search query for a message: a genre it mentions, else the message minus filler words."""
+        lower = message.lower()
+        for genre in GENRES:
+            if genre.lower() in lower:
+                return genre
+        for word, genre in GENRE_SYNONYMS.items():
+            if re.search(rf"\b{re.escape(word)}\b", lower):
+                return genre
+        query = re.sub(r"[^\w\s-]", " ", _FILLER.sub(" ", message))
+        return " ".join(query.split()) or "action"
+
+
+class CircuitBreaker:
+    """
+    Skips a failing dependency for a cool-down period.
+
+    Closed: calls allowed. After `failure_threshold` consecutive failures
+    the breaker opens and allow() returns False for `reset_timeout` seconds.
+    Then one trial call is let through (half-open): success closes the
+    breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
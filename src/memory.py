@@ -0,0 +1,213 @@
+"""
+Memory accounting and budgets for the recommender engine.
+
+memory_report() lists the bytes held by each artifact of an engine. For
+memory-mapped arrays this is the mapped size, not resident pages.
+estimate_training_memory() predicts what a train allocates, using only the
+dataset dimensions. plan_representation() picks the first Representation in
+LADDER whose estimate fits a budget. The rungs give up memory in this order:
+  1. a sparse ratings matrix instead of the dense pivot (no change in results)
+  2. float32 content similarities
+  3. each item's top-K content neighbours instead of the full N x N matrix
+     (content scores only see an item's nearest neighbours)
+If even the last rung does not fit, it raises MemoryBudgetError before
+anything is allocated.
+
+    engine = RecommenderEngine(memory_budget="2GB")   # or UNIVERSALRECS_MEMORY_BUDGET=2GB
+    engine.memory_report()
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+SIM_BLOCK_ROWS = 1024   # most similarity rows block_similarity computes at once (at most 1/16 of the catalog)
+FIT_OVERHEAD = 3        # collab backend working memory, in multiples of the factors
+
+_UNITS = {"": 1, "b": 1, "k": 1 << 10, "kb": 1 << 10, "m": 1 << 20, "mb": 1 << 20,
+          "g": 1 << 30, "gb": 1 << 30, "t": 1 << 40, "tb": 1 << 40}
+
+
+class MemoryBudgetError(MemoryError):
+    """The cheapest representation still needs more memory than the budget."""
+
+
+class Representation:
+    """How the engine stores the ratings matrix and content similarities."""
+
+    __slots__ = ("sparse_ratings", "sim_dtype", "sim_neighbors")
+
+    def __init__(self, sparse_ratings: bool = False, sim_dtype=np.float64, sim_neighbors: Optional[int] = None):
+        """
+        Args:
+            sparse_ratings: Keep user_item_matrix as a sparse frame (memory ~ ratings, not users x items);
+                unrated cells read as its NaN fill value instead of 0
+            sim_dtype: dtype of content_sim_matrix
+            sim_neighbors: Keep only each item's top-K similarities (a CSR matrix); None keeps all N x N
+        """
+        self.sparse_ratings = sparse_ratings
+        self.sim_dtype = np.dtype(sim_dtype)
+        self.sim_neighbors = sim_neighbors
+
+    def __repr__(self):
+        sim = f"top-{self.sim_neighbors} " if self.sim_neighbors else ""
+        ratings = "sparse" if self.sparse_ratings else "dense"
+        return f"{ratings} ratings, {sim}{self.sim_dtype.name} similarities"
+
+    def at_precision(self, precision) -> "Representation":
+        """This representation with similarities no wider than the engine's precision."""
+        precision = np.dtype(precision)
+        if self.sim_dtype.itemsize <= precision.itemsize:
+            return self
+        return Representation(self.sparse_ratings, precision, self.sim_neighbors)
+
+
+FULL = Representation()
+LADDER = (
+    FULL,
+    Representation(sparse_ratings=True),
+    Representation(sparse_ratings=True, sim_dtype=np.float32),
+    Representation(sparse_ratings=True, sim_dtype=np.float32, sim_neighbors=50),
+)
+
+
+def parse_bytes(value) -> Optional[int]:
+    """Bytes from an int or a string such as '512MB' or '2g' (binary units); None stays None."""
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-zA-Z]*)\s*", str(value))
+    if not match or match.group(2).lower() not in _UNITS:
+        raise ValueError(f"Can't parse memory size {value!r}; use bytes or e.g. '512MB', '2GB'")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def nbytes(obj) -> int:
+    """Bytes held by an array, sparse matrix, frame or anything with an nbytes property (0 for None)."""
+    if obj is None:
+        return 0
+    if sp.issparse(obj):
+        return obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum()) + obj.columns.memory_usage(deep=True)
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    return int(obj.nbytes)
+
+
+def estimate_training_memory(n_users: int, n_items: int, n_ratings: int, n_catalog: int,
+                             representation: Representation = FULL, n_factors: int = 10,
+                             content: bool = True, precision=np.float64) -> Dict[str, int]:
+    """
+    Estimated bytes a train allocates, per artifact, from the dataset
+    dimensions alone. The peak is the sum: the new model is built while
+    the ratings frame (and any previous model) is still held.
+
+    Args:
+        n_users, n_items: Distinct users and rated items in the training ratings
+        n_ratings: Training ratings (an upper bound on the matrix's non-zeros)
+        n_catalog: Items in the catalog (rows of content_sim_matrix)
+        representation: How the matrices are stored
+        n_factors: Collab factors per user and item
+        content: False for feedback retrains, which reuse the content model
+        precision: dtype the engine trains in (float32 halves matrices and factors)
+    """
+    rep = representation
+    itemsize = np.dtype(precision).itemsize
+    estimate = {}
+    if content:
+        if rep.sim_neighbors:
+            k = min(rep.sim_neighbors, n_catalog)
+            estimate["content_sim_matrix"] = n_catalog * k * (rep.sim_dtype.itemsize + 4) + (n_catalog + 1) * 4
+        else:
+            estimate["content_sim_matrix"] = n_catalog * n_catalog * rep.sim_dtype.itemsize
+        if rep.sim_neighbors or rep.sim_dtype.itemsize != itemsize:
+            # block_similarity: one block of rows at a time (and its argpartition for top-K)
+            estimate["content_build"] = _block_rows(n_catalog) * n_catalog * (itemsize + (8 if rep.sim_neighbors else 0))
+    # The CSR matrix the backend fits on, plus the codes used to build it
+    estimate["ratings_matrix"] = n_ratings * (itemsize + 4) + (n_users + 1) * 4 + n_ratings * 16
+    if rep.sparse_ratings:
+        estimate["user_item_matrix"] = n_ratings * (itemsize + 4)
+    else:
+        estimate["user_item_matrix"] = n_users * n_items * itemsize
+    estimate["collab_factors"] = (n_users + n_items) * n_factors * itemsize * (1 + FIT_OVERHEAD)
+    estimate["history"] = n_ratings * (8 + itemsize) + n_users * 16
+    return estimate
+
+
+def plan_representation(budget: int, n_users: int, n_items: int, n_ratings: int, n_catalog: int,
+                        baseline: int = 0, n_factors: int = 10,
+                        precision=np.float64) -> Tuple[Representation, Dict[str, int]]:
+    """
+    (representation, estimate) for the first LADDER entry (at `precision`)
+    whose estimated peak plus `baseline` (bytes already held) fits `budget`.
+
+    Raises:
+        MemoryBudgetError: Not even the cheapest representation fits
+    """
+    for rep in LADDER:
+        rep = rep.at_precision(precision)
+        estimate = estimate_training_memory(n_users, n_items, n_ratings, n_catalog, rep, n_factors,
+                                            precision=precision)
+        if baseline + sum(estimate.values()) <= budget:
+            return rep, estimate
+    largest = max(estimate, key=estimate.get)
+    raise MemoryBudgetError(
+        f"Training {n_ratings} ratings ({n_users} users x {n_items} items, {n_catalog} catalog items) needs "
+        f"an estimated {format_bytes(baseline + sum(estimate.values()))} even with {rep} "
+        f"({format_bytes(baseline)} already held, largest new artifact {largest} "
+        f"{format_bytes(estimate[largest])}), but the memory budget is {format_bytes(budget)}. "
+        f"Raise the budget, train on a time window (window_days) or shard the catalog (sharding.py)."
+    )
+
+
+def _block_rows(n: int) -> int:
+    return max(1, min(SIM_BLOCK_ROWS, n // 16))
+
+
+def block_similarity(latent: np.ndarray, dtype=np.float32, neighbors: Optional[int] = None):
+    """
+    Cosine similarity of the rows of `latent`, computed one block of rows
+    at a time in latent's dtype, so no N x N matrix wider than `dtype`
+    ever exists. Returns a dense `dtype` matrix or, with `neighbors`, a
+    CSR matrix keeping each row's `neighbors` largest entries (the item
+    itself included).
+    """
+    norms = np.linalg.norm(latent, axis=1, keepdims=True)
+    normed = latent / np.where(norms > 0, norms, 1.0)
+    n = len(normed)
+    block_rows = _block_rows(n)
+    if neighbors is None:
+        out = np.empty((n, n), dtype=dtype)
+    else:
+        k = min(neighbors, n)
+        indices = np.empty((n, k), dtype=np.int32)
+        data = np.empty((n, k), dtype=dtype)
+    for start in range(0, n, block_rows):
+        block = normed[start:start + block_rows] @ normed.T
+        if neighbors is None:
+            out[start:start + len(block)] = block
+        else:
+            top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            indices[start:start + len(block)] = top
+            data[start:start + len(block)] = np.take_along_axis(block, top, axis=1)
+    if neighbors is None:
+        return out
+    matrix = sp.csr_matrix((data.ravel(), indices.ravel(), np.arange(0, n * k + 1, k)), shape=(n, n))
+    matrix.sort_indices()
+    return matrix
+
+
+def dense(block) -> np.ndarray:
+    """A slice of a (possibly top-K sparse) similarity matrix as an ndarray."""
+    return block.toarray() if sp.issparse(block) else np.asarray(block)
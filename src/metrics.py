@@ -0,0 +1,179 @@
+"""
+Lightweight instrumentation for the recommender engine.
+
+Counters and latency histograms with a JSON and Prometheus text dump.
+When disabled every call returns immediately, so the hooks can stay in
+the hot paths permanently.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _NullTimer:
+    """No-op context manager handed out while metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts are derived on export)."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (inf if beyond the last bucket)."""
+        if self.count == 0:
+            return float("nan")
+        target = q * self.count
+        running = 0
+        for bound, c in zip(self.bounds + (float("inf"),), self.counts):
+            running += c
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {str(b): c for b, c in zip(self.bounds + ("+Inf",), self.counts)},
+        }
+
+
+class Metrics:
+    """
+    Registry of counters and stage-latency histograms.
+
+    Usage:
+        metrics = Metrics(enabled=True)
+        with metrics.timer("recommend.collab"):
+            ...
+        metrics.inc("recommend_requests")
+        print(metrics.to_prometheus())
+    """
+
+    def __init__(self, enabled: bool = False, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            enabled: Record anything at all; disabled registries are no-ops
+            buckets: Histogram bucket upper bounds in seconds
+        """
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        """Enabled when UNIVERSALRECS_METRICS is set to 1/true."""
+        return cls(enabled=os.getenv("UNIVERSALRECS_METRICS", "").lower() in ("1", "true", "yes"))
+
+    def timer(self, name: str):
+        """Context manager recording the wall time of the block under `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def inc(self, name: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(self.buckets)
+            hist.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> Dict:
+        """Point-in-time copy of all counters and histograms."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+            }
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "universalrecs") -> str:
+        """Render in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self.counters):
+                metric = f"{prefix}_{_sanitize(name)}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {self.counters[name]}")
+
+            if self.histograms:
+                metric = f"{prefix}_stage_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for name in sorted(self.histograms):
+                    hist = self.histograms[name]
+                    running = 0
+                    for bound, c in zip(hist.bounds + ("+Inf",), hist.counts):
+                        running += c
+                        lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {running}')
+                    lines.append(f'{metric}_sum{{stage="{name}"}} {hist.sum}')
+                    lines.append(f'{metric}_count{{stage="{name}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+
+def _sanitize(name: str) -> str:
+    return "".join(ch if ch.isalnum() else "_" for ch in name)
@@ -0,0 +1,135 @@
+"""
+Approximate maximum-inner-product search over collaborative item factors.
+
+Inner-product top-k is turned into nearest-neighbour search with the norm
+augmentation of Bachrach et al. (2014). Each item vector y gets an extra
+coordinate sqrt(M^2 - |y|^2), where M is the largest item norm. The user
+vector x gets a 0 there. Then |x' - y'|^2 = |x|^2 + M^2 - 2 x.y, so
+the nearest augmented items are exactly the largest inner products.
+
+The augmented items are clustered with k-means into an inverted file
+(IVF). A query ranks the clusters by centroid distance, scans only the
+`nprobe` closest lists and scores those candidates exactly. nprobe is the
+recall/latency knob: nprobe = n_lists is brute force.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+
+class MIPSIndex:
+    """IVF index over item factors (k x n_items, as stored in RecommenderModel)."""
+
+    __slots__ = ("item_vectors", "centroids", "list_offsets", "list_items", "nprobe")
+
+    def __init__(self, item_factors: np.ndarray, n_lists: Optional[int] = None, nprobe: int = 8,
+                 random_state: int = 42):
+        """
+        Args:
+            item_factors: k x n_items factor matrix
+            n_lists: Number of k-means clusters (default: about sqrt(n_items))
+            nprobe: Default number of clusters scanned per query
+            random_state: k-means seed
+        """
+        items = np.ascontiguousarray(np.asarray(item_factors).T)
+        n_items = len(items)
+        n_lists = n_lists or max(1, int(round(np.sqrt(n_items))))
+        n_lists = min(n_lists, n_items)
+
+        # Norm augmentation: MIPS over items == L2 nearest neighbour over augmented items
+        norms_sq = np.einsum("ij,ij->i", items, items)
+        extra = np.sqrt(np.maximum(norms_sq.max() - norms_sq, 0.0))
+        augmented = np.hstack([items, extra[:, None]])
+
+        # Centroids from a sample; assigning every item afterwards is one cheap pass
+        rng = np.random.default_rng(random_state)
+        sample = augmented[rng.choice(n_items, size=min(n_items, 40 * n_lists), replace=False)]
+        kmeans = KMeans(n_clusters=n_lists, n_init=1, max_iter=50, random_state=random_state).fit(sample)
+        labels = kmeans.predict(augmented)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+
+        self._init_arrays(items, kmeans.cluster_centers_, offsets, order.astype(np.int64), nprobe)
+
+    def _init_arrays(self, item_vectors, centroids, list_offsets, list_items, nprobe):
+        self.item_vectors = item_vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_items = list_items
+        self.nprobe = nprobe
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, nprobe: int = 8) -> "MIPSIndex":
+        """Rebuilds an index from to_arrays() output (arrays may be memory-mapped)."""
+        index = cls.__new__(cls)
+        index._init_arrays(arrays["item_vectors"], arrays["centroids"], arrays["list_offsets"],
+                           arrays["list_items"], nprobe)
+        return index
+
+    def to_arrays(self) -> dict:
+        return {
+            "item_vectors": self.item_vectors,
+            "centroids": self.centroids,
+            "list_offsets": self.list_offsets,
+            "list_items": self.list_items,
+        }
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.item_vectors)
+
+    def candidates(self, user_vector: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Item columns in the nprobe lists closest to the user."""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        # argmin |x' - c|^2 = argmax (x.c[:k] - |c|^2 / 2); the query's extra coordinate is 0
+        centroids = self.centroids
+        closeness = centroids[:, :-1] @ user_vector - 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+        if nprobe < self.n_lists:
+            lists = np.argpartition(-closeness, nprobe - 1)[:nprobe]
+        else:
+            lists = np.arange(self.n_lists)
+        return np.concatenate([self.list_items[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists])
+
+    def search(self, user_vector: np.ndarray, k: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k items by inner product with user_vector.
+
+        Returns:
+            (item columns, scores), best first
+        """
+        candidates = self.candidates(user_vector, nprobe)
+        scores = self.item_vectors[candidates] @ user_vector
+        if len(candidates) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[part], scores[part]
+        order = np.argsort(-scores, kind="stable")
+        return candidates[order], scores[order]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.to_arrays().values())
+
+
+def brute_force_topk(user_vector: np.ndarray, item_factors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact top-k by inner product (k x n_items factors); the baseline for MIPSIndex."""
+    scores = user_vector @ item_factors
+    top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return top, scores[top]
+
+
+def recall_at_k(index: MIPSIndex, user_vectors: np.ndarray, item_factors: np.ndarray, k: int,
+                nprobe: Optional[int] = None) -> float:
+    """Mean fraction of the exact top-k that the index returns."""
+    hits = 0
+    for x in user_vectors:
+        exact, _ = brute_force_topk(x, item_factors, k)
+        approx, _ = index.search(x, k, nprobe)
+        hits += len(np.intersect1d(exact, approx))
+    return hits / (k * len(user_vectors)) if len(user_vectors) else 1.0
@@ -0,0 +1,199 @@
+"""
+Immutable trained-model snapshots for the recommender engine.
+
+Training builds a complete RecommenderModel off to the side; the engine
+then publishes it by swapping a single reference, so concurrent readers
+always see a consistent set of matrices.
+"""
+
+import threading
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class UserHistory:
+    """
+    Per-user rating index in CSR layout.
+
+    Row u spans indptr[u]:indptr[u + 1] of movie_ids/ratings for the user
+    user_ids[u]; user_ids is sorted so lookups are a binary search.
+    """
+
+    __slots__ = ("user_ids", "indptr", "movie_ids", "ratings")
+
+    def __init__(self, user_ids, indptr, movie_ids, ratings):
+        self.user_ids = user_ids
+        self.indptr = indptr
+        self.movie_ids = movie_ids
+        self.ratings = ratings
+
+    @classmethod
+    def from_frame(cls, ratings: pd.DataFrame, dtype=np.float64) -> "UserHistory":
+        """Index of a ratings frame; each user's row is oldest first when it has timestamps."""
+        users = ratings['userId'].to_numpy(dtype=np.int64)
+        if 'timestamp' in ratings:
+            order = np.lexsort((ratings['timestamp'].to_numpy(), users))
+        else:
+            order = np.argsort(users, kind="stable")
+        user_ids, counts = np.unique(users[order], return_counts=True)
+        indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(
+            user_ids,
+            indptr,
+            ratings['movieId'].to_numpy(dtype=np.int64)[order],
+            ratings['rating'].to_numpy(dtype=dtype)[order],
+        )
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def row(self, user_id) -> Tuple[np.ndarray, np.ndarray]:
+        """(movie_ids, ratings) for a user; empty arrays if unknown."""
+        pos = np.searchsorted(self.user_ids, user_id)
+        if pos < len(self.user_ids) and self.user_ids[pos] == user_id:
+            start, end = self.indptr[pos], self.indptr[pos + 1]
+            return self.movie_ids[start:end], self.ratings[start:end]
+        return self.movie_ids[:0], self.ratings[:0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.user_ids.nbytes + self.indptr.nbytes + self.movie_ids.nbytes + self.ratings.nbytes
+
+
+class RecommenderModel:
+    """
+    One trained generation of the engine's models.
+
+    Attributes are fixed at construction; callers must treat the arrays
+    as read-only.
+    """
+
+    __slots__ = (
+        "version",
+        "content_sim_matrix",
+        "user_item_matrix",
+        "collab_user_ids",
+        "collab_user_factors",
+        "collab_item_factors",
+        "collab_item_idx",
+        "history",
+        "popular_idx",
+        "popular_scores",
+        "n_ratings",
+        "collab_index",
+    )
+
+    def __init__(self, version, content_sim_matrix, user_item_matrix, collab_user_ids,
+                 collab_user_factors, collab_item_factors, collab_item_idx,
+                 history, popular_idx, popular_scores, n_ratings, collab_index=None):
+        """
+        Args:
+            version: Monotonic model generation
+            content_sim_matrix: Item-item content similarity (catalog order)
+            user_item_matrix: userId x movieId rating pivot the factors were fit on (sparse under a memory budget)
+                (None for attached read-only snapshots)
+            collab_user_ids: Sorted userIds, row i of collab_user_factors
+            collab_user_factors: User embeddings (n_users x k), or None
+            collab_item_factors: Item embeddings (k x n_items), or None
+            collab_item_idx: Catalog row of each user_item_matrix column (-1 if not in the catalog)
+            history: UserHistory over the ratings the model was trained on
+            popular_idx: Catalog rows ordered by popularity score, best first
+            popular_scores: Popularity score of each popular_idx entry
+            n_ratings: Number of rating rows the model was trained on
+            collab_index: Optional MIPSIndex over collab_item_factors for top-k retrieval
+        """
+        set_ = object.__setattr__
+        set_(self, "version", version)
+        set_(self, "content_sim_matrix", content_sim_matrix)
+        set_(self, "user_item_matrix", user_item_matrix)
+        set_(self, "collab_user_ids", collab_user_ids)
+        set_(self, "collab_user_factors", collab_user_factors)
+        set_(self, "collab_item_factors", collab_item_factors)
+        set_(self, "collab_item_idx", collab_item_idx)
+        set_(self, "history", history)
+        set_(self, "popular_idx", popular_idx)
+        set_(self, "popular_scores", popular_scores)
+        set_(self, "n_ratings", n_ratings)
+        set_(self, "collab_index", collab_index)
+
+    def collab_row(self, user_id) -> int:
+        """Row of user_id in collab_user_factors, or -1."""
+        if self.collab_user_factors is None:
+            return -1
+        pos = int(np.searchsorted(self.collab_user_ids, user_id))
+        if pos < len(self.collab_user_ids) and self.collab_user_ids[pos] == user_id:
+            return pos
+        return -1
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Precision the model was trained in: its factors' dtype, else its similarities'."""
+        for arr in (self.collab_item_factors, self.collab_user_factors, self.content_sim_matrix):
+            if arr is not None:
+                return arr.dtype
+        return np.dtype(np.float64)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RecommenderModel is immutable")
+
+    def __repr__(self):
+        return f"RecommenderModel(version={self.version}, n_ratings={self.n_ratings})"
+
+
+class BackgroundRetrainer:
+    """
+    Runs a training callable on a daemon thread.
+
+    Requests arriving while a run is in progress are coalesced into one
+    follow-up run, so a burst of feedback triggers at most two trainings.
+    """
+
+    def __init__(self, train_fn: Callable[[], None], name: str = "recommender-retrain"):
+        self._train_fn = train_fn
+        self._name = name
+        self._cond = threading.Condition()
+        self._pending = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[BaseException] = None
+
+    def request(self):
+        """Schedule a retrain; returns immediately."""
+        with self._cond:
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+
+    @property
+    def busy(self) -> bool:
+        with self._cond:
+            return self._pending or self._running
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until no retrain is pending or running. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not (self._pending or self._running), timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._thread = None
+                    self._cond.notify_all()
+                    return
+                self._pending = False
+                self._running = True
+            try:
+                self._train_fn()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                print(f"Background retrain failed: {e}")
+            finally:
+                with self._cond:
+                    self._running = False
+                    self._cond.notify_all()
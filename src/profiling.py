@@ -0,0 +1,210 @@
+"""
+Opt-in cProfile capture for slow calls.
+
+A SlowCallProfiler wraps hot entry points (RecommenderEngine.recommend,
+recommend_batch and train_models, ShardedEngine's coordinator and shard
+worker calls, the agent graph). A sampled fraction of calls runs
+under cProfile. A call's stats are written to the dump directory only
+if it took longer than the threshold, so fast calls leave nothing
+behind. The directory keeps at most `max_dumps` files, and the oldest are
+deleted first. Like Metrics, a disabled profiler returns a shared no-op
+context manager, so the hooks can stay in the hot paths. Capturing is
+silent: `captured` counts the dumps written and `last_dump` is the newest.
+
+Enable with environment variables:
+    UNIVERSALRECS_PROFILE_DIR=data/profiles        # turns profiling on
+    UNIVERSALRECS_PROFILE_THRESHOLD_MS=50          # default 100
+    UNIVERSALRECS_PROFILE_SAMPLE_RATE=0.1          # default 1.0
+
+Summarise the captured dumps (hottest functions across all of them):
+    python -m src.profiling data/profiles --top 25 --sort tottime --name recommend
+"""
+
+import argparse
+import cProfile
+import glob
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from typing import Iterable, List, Optional
+
+
+class _NullProfile:
+    """No-op context manager handed out while profiling is off or for unsampled calls."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PROFILE = _NullProfile()
+
+
+class _Profile:
+    __slots__ = ("owner", "name", "tags", "profile", "start")
+
+    def __init__(self, owner: "SlowCallProfiler", name: str, tags: dict):
+        self.owner = owner
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.profile = cProfile.Profile()
+        self.start = time.perf_counter()
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiler (a debugger, coverage) owns the hook; run unprofiled
+            self.profile = None
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if self.profile is not None:
+                self.profile.disable()
+                self.owner._finish(self.name, self.tags, self.profile, time.perf_counter() - self.start)
+        finally:
+            self.owner._active.release()
+        return False
+
+
+class SlowCallProfiler:
+    """
+    Usage:
+        profiler = SlowCallProfiler("data/profiles", threshold_ms=50)
+        with profiler.profile("recommend", user=42):
+            ...
+    """
+
+    def __init__(self, directory: Optional[str] = None, threshold_ms: float = 100.0,
+                 sample_rate: float = 1.0, max_dumps: int = 50):
+        """
+        Args:
+            directory: Where dumps are written; None disables profiling
+            threshold_ms: Keep the profile of calls at least this slow
+            sample_rate: Fraction of calls profiled (cProfile slows the profiled call down)
+            max_dumps: Dump files kept in the directory; older ones are deleted
+        """
+        self.directory = directory
+        self.enabled = directory is not None
+        self.threshold = threshold_ms / 1000.0
+        self.sample_rate = sample_rate
+        self.max_dumps = max_dumps
+        self.captured = 0
+        self.last_dump: Optional[str] = None
+        # Only one cProfile can be active per process (Python 3.12+); concurrent calls run unprofiled
+        self._active = threading.Lock()
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "SlowCallProfiler":
+        """Enabled when UNIVERSALRECS_PROFILE_DIR is set."""
+        return cls(
+            directory=os.getenv("UNIVERSALRECS_PROFILE_DIR") or None,
+            threshold_ms=float(os.getenv("UNIVERSALRECS_PROFILE_THRESHOLD_MS", "100")),
+            sample_rate=float(os.getenv("UNIVERSALRECS_PROFILE_SAMPLE_RATE", "1.0")),
+        )
+
+    def profile(self, name: str, **tags):
+        """Context manager profiling the block; the dump file name carries `name` and `tags`."""
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return _NULL_PROFILE
+        if not self._active.acquire(blocking=False):
+            return _NULL_PROFILE
+        return _Profile(self, name, tags)
+
+    def iterate(self, name: str, iterable: Iterable, **tags):
+        """
+        Yields from `iterable` with only the time spent producing items
+        profiled; the consumer's work between items is excluded.
+        """
+        iterator = iter(iterable)
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            yield from iterator
+            return
+        if not self._active.acquire(blocking=False):
+            yield from iterator
+            return
+        profile, elapsed = cProfile.Profile(), 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Another profiler owns the hook; finish unprofiled
+                    yield from iterator
+                    return
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    profile.disable()
+                    elapsed += time.perf_counter() - start
+                yield item
+            self._finish(name, tags, profile, elapsed)
+        finally:
+            self._active.release()
+
+    def _finish(self, name: str, tags: dict, profile: cProfile.Profile, elapsed: float):
+        if elapsed < self.threshold:
+            return
+        label = "".join(f"-{k}_{_safe(v)}" for k, v in tags.items())
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.directory, f"{_safe(name)}-{stamp}-{int(elapsed * 1000)}ms{label}"
+                                            f"-{os.getpid()}-{self.captured}.prof")
+        profile.dump_stats(path)
+        self.captured += 1
+        self.last_dump = path
+        self._prune()
+
+    def _prune(self):
+        dumps = sorted(glob.glob(os.path.join(self.directory, "*.prof")), key=os.path.getmtime)
+        for old in dumps[:max(0, len(dumps) - self.max_dumps)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def _safe(value) -> str:
+    return re.sub(r"[^A-Za-z0-9_.]+", "_", str(value))[:40]
+
+
+def summarize(directory: str, top: int = 25, sort: str = "tottime", name: Optional[str] = None) -> str:
+    """The `top` hottest functions across every dump in `directory` (optionally only dumps of `name`)."""
+    pattern = f"{_safe(name)}-*.prof" if name else "*.prof"
+    dumps: List[str] = sorted(glob.glob(os.path.join(directory, pattern)))
+    if not dumps:
+        return f"No profiles in {directory}\n"
+    out = io.StringIO()
+    stats = pstats.Stats(*dumps, stream=out)
+    durations = [int(m.group(1)) for m in (re.search(r"-(\d+)ms", os.path.basename(d)) for d in dumps) if m]
+    out.write(f"{len(dumps)} dumps, {sum(durations)} ms captured, slowest {max(durations, default=0)} ms\n")
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+    return out.getvalue()
+
+
+def main():
+    """Print the hottest functions across captured profile dumps."""
+    parser = argparse.ArgumentParser(description="Summarise slow-call profile dumps")
+    parser.add_argument('directory', nargs='?', default=os.getenv("UNIVERSALRECS_PROFILE_DIR", "data/profiles"),
+                        help='Dump directory (default: $UNIVERSALRECS_PROFILE_DIR or data/profiles)')
+    parser.add_argument('--top', type=int, default=25, help='Functions to show (default: 25)')
+    parser.add_argument('--sort', type=str, default='tottime',
+                        help='pstats sort key: tottime, cumulative, ncalls, ... (default: tottime)')
+    parser.add_argument('--name', type=str, default=None, help='Only dumps of this call, e.g. recommend')
+    args = parser.parse_args()
+    print(summarize(args.directory, top=args.top, sort=args.sort, name=args.name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Precomputed recommendation tables.
+
+An offline job (build_table, or `python -m src.rec_table`) scores every
+known user and writes their top-N to fixed-width arrays:
+
+    user_ids.npy     (n_users,)       sorted; row i belongs to user_ids[i]
+    item_ids.npy     (n_users, N)     movieIds, -1 padded
+    scores.npy       (n_users, N)     float32
+    reason_codes.npy (n_users, N)     int32 index into manifest "reasons"
+    method_codes.npy (n_users,)       int32 index into manifest "methods"
+    manifest.json                     N, scoring params, n_ratings, version
+
+Reason and method strings are interned into small tables like genres in
+ItemCatalog. RecTable.open memory-maps the arrays, so a lookup is one
+binary search plus a row slice. RecommenderEngine.use_table serves
+recommend() from the table and falls back to live scoring for users
+with feedback newer than the table.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = "manifest.json"
+
+
+def build_table(engine, path: str, n: int = 20, weight_content: float = 0.5, weight_collab: float = 0.5,
+                diversity: float = 0.0, user_ids=None, processes: int = 1, chunk_size: int = 256) -> str:
+    """
+    Score users with `engine` and write their top-n table to `path`.
+
+    Args:
+        engine: Trained RecommenderEngine
+        path: Output directory (replaced atomically if it exists)
+        n: Recommendations stored per user
+        weight_content, weight_collab, diversity: recommend() parameters the table is valid for
+        user_ids: Users to include (default: every user in engine.ratings)
+        processes: > 1 scores chunks in a SharedModelPool of worker processes. The
+            workers see the published model snapshot only: the table is stamped with
+            the snapshot's n_ratings, so use_table scores users with feedback it wasn't
+            trained on live, and session events are not applied
+        chunk_size: Users per chunk
+
+    Returns:
+        path
+    """
+    if user_ids is None:
+        user_ids = engine.ratings['userId'].unique()
+    user_ids = np.unique(np.asarray(user_ids, dtype=np.int64))
+    n_ratings, model_version = engine.n_ratings, engine.model_version
+    params = dict(n=n, weight_content=weight_content, weight_collab=weight_collab, diversity=diversity)
+
+    start = time.time()
+    if processes > 1:
+        from .shared_model import MANIFEST_FILE as MODEL_MANIFEST, SharedModelPool, publish_model
+        publish_dir = tempfile.mkdtemp(prefix="rec_table_model_")
+        try:
+            with open(os.path.join(publish_model(engine, publish_dir), MODEL_MANIFEST)) as f:
+                snapshot = json.load(f)
+            n_ratings, model_version = snapshot["n_ratings"], snapshot["version"]
+            with SharedModelPool(publish_dir, processes=processes) as pool:
+                results = pool.recommend_many([int(u) for u in user_ids], chunk_size=chunk_size, **params)
+        finally:
+            shutil.rmtree(publish_dir, ignore_errors=True)
+    else:
+        results = []
+        for i in range(0, len(user_ids), chunk_size):
+            results.extend(engine.recommend_batch([int(u) for u in user_ids[i:i + chunk_size]], **params))
+
+    item_ids = np.full((len(user_ids), n), -1, dtype=np.int64)
+    scores = np.zeros((len(user_ids), n), dtype=np.float32)
+    reasons = pd.Series([r['reason'] for recs, _ in results for r in recs], dtype=object)
+    reason_codes_flat, reason_table = pd.factorize(reasons)
+    reason_codes = np.full((len(user_ids), n), -1, dtype=np.int32)
+    method_codes, method_table = pd.factorize(pd.Series([method for _, method in results], dtype=object))
+
+    pos = 0
+    for row, (recs, _) in enumerate(results):
+        k = len(recs)
+        item_ids[row, :k] = [r['movieId'] for r in recs]
+        scores[row, :k] = [r['score'] for r in recs]
+        reason_codes[row, :k] = reason_codes_flat[pos:pos + k]
+        pos += k
+
+    tmp = f"{path.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, arr in (("user_ids", user_ids), ("item_ids", item_ids), ("scores", scores),
+                      ("reason_codes", reason_codes), ("method_codes", method_codes.astype(np.int32))):
+        np.save(os.path.join(tmp, f"{name}.npy"), arr, allow_pickle=False)
+    manifest = {
+        **params,
+        "n_users": int(len(user_ids)),
+        "n_ratings": n_ratings,
+        "model_version": model_version,
+        "reasons": [str(r) for r in reason_table],
+        "methods": [str(m) for m in method_table],
+        "built_at": time.time(),
+        "build_seconds": round(time.time() - start, 3),
+    }
+    with open(os.path.join(tmp, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+    if os.path.exists(path):
+        old = f"{path.rstrip(os.sep)}.old-{os.getpid()}"
+        os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.rename(tmp, path)
+    print(f"Wrote recommendation table for {len(user_ids)} users to {path} in {manifest['build_seconds']}s")
+    return path
+
+
+class RecTable:
+    """Read-only, memory-mapped view of a table written by build_table."""
+
+    __slots__ = ("path", "manifest", "n", "n_ratings", "user_ids", "item_ids", "scores",
+                 "reason_codes", "method_codes", "reasons", "methods")
+
+    def __init__(self, path: str, manifest: dict, arrays: dict):
+        self.path = path
+        self.manifest = manifest
+        self.n = manifest["n"]
+        self.n_ratings = manifest["n_ratings"]
+        self.reasons = manifest["reasons"]
+        self.methods = manifest["methods"]
+        self.user_ids = arrays["user_ids"]
+        self.item_ids = arrays["item_ids"]
+        self.scores = arrays["scores"]
+        self.reason_codes = arrays["reason_codes"]
+        self.method_codes = arrays["method_codes"]
+
+    @classmethod
+    def open(cls, path: str) -> "RecTable":
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                  for name in ("user_ids", "item_ids", "scores", "reason_codes", "method_codes")}
+        return cls(path, manifest, arrays)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def serves(self, n, weight_content, weight_collab, diversity) -> bool:
+        """Whether a recommend() call with these parameters can be answered from the table."""
+        m = self.manifest
+        if (weight_content, weight_collab, diversity) != (m["weight_content"], m["weight_collab"], m["diversity"]):
+            return False
+        # Top-k lists are prefixes of longer ones; MMR selections are not
+        return n <= self.n if diversity == 0 else n == self.n
+
+    def lookup(self, user_id, n: int) -> Optional[Tuple[np.ndarray, np.ndarray, List[str], str]]:
+        """(movie_ids, scores, reasons, method) of a user's first n entries, or None if absent."""
+        row = int(np.searchsorted(self.user_ids, user_id))
+        if row >= len(self.user_ids) or self.user_ids[row] != user_id:
+            return None
+        ids = np.asarray(self.item_ids[row, :n])
+        valid = ids >= 0
+        codes = self.reason_codes[row, :n][valid]
+        return (ids[valid], np.asarray(self.scores[row, :n])[valid],
+                [self.reasons[c] for c in codes], self.methods[self.method_codes[row]])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.user_ids, self.item_ids, self.scores, self.reason_codes, self.method_codes))
+
+
+def main():
+    """Build a recommendation table for every user in a dataset."""
+    parser = argparse.ArgumentParser(description="Precompute top-N recommendations for all users")
+    parser.add_argument('--output', type=str, default='data/rec_table', help='Output directory (default: data/rec_table)')
+    parser.add_argument('--data-dir', type=str, default=None, help='Dataset directory (default: data/)')
+    parser.add_argument('--n', type=int, default=20, help='Recommendations per user (default: 20)')
+    parser.add_argument('--weight-content', type=float, default=0.5, help='Content weight (default: 0.5)')
+    parser.add_argument('--diversity', type=float, default=0.0, help='MMR diversity (default: 0)')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=256, help='Users per work chunk (default: 256)')
+    args = parser.parse_args()
+
+    from .recommender import RecommenderEngine
+    engine = RecommenderEngine(data_dir=args.data_dir, background_training=False)
+    build_table(engine, args.output, n=args.n, weight_content=args.weight_content,
+                weight_collab=1.0 - args.weight_content, diversity=args.diversity,
+                processes=args.processes, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
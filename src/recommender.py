@@ -1,272 +1,1006 @@
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.decomposition import TruncatedSVD
-from .data_loader import load_data
+from .data_loader import load_data, feedback_file
+from .metrics import Metrics
+from .profiling import SlowCallProfiler
+from .cache import LRUCache
+from .model import RecommenderModel, UserHistory, BackgroundRetrainer
+from .catalog import ItemCatalog, records
+from .collab import make_backend
+from .mips import MIPSIndex
+from .streaming import DAY, RatingStream
+from .memory import (FULL, block_similarity, dense, estimate_training_memory, format_bytes, nbytes, parse_bytes,
+                     plan_representation)
 
 class RecommenderEngine:
-    def __init__(self):
-        self.movies, self.ratings = load_data()
-        self.movies.set_index('movieId', inplace=True)
-        
-        # Models
-        self.content_sim_matrix = None
-        self.collab_user_factors = None # U (User-Concept)
-        self.collab_item_factors = None # Vt (Item-Concept)
-        self.collab_sigma = None
-        self.user_item_matrix = None
-        
-        # Maps
-        self.movie_id_to_idx = {mid: i for i, mid in enumerate(self.movies.index)}
-        self.idx_to_movie_id = {i: mid for i, mid in enumerate(self.movies.index)}
-        
+    def __init__(self, movies=None, ratings=None, data_dir=None, metrics=None,
+                 cache_size=1024, cache_ttl=300.0, background_training=True, vector_store=None,
+                 collab_backend="svd", collab_index=False, collab_candidates=200,
+                 half_life_days=None, window_days=None, profiler=None, memory_budget=None, precision=None,
+                 representation=None):
+        """
+        Loads data from data_dir (default: the bundled data/ directory), or
+        uses the given movies/ratings frames. Feedback on in-memory frames is
+        not persisted to disk.
+
+        metrics: optional Metrics registry for stage timings and counters;
+        defaults to one enabled by UNIVERSALRECS_METRICS=1.
+
+        profiler: optional SlowCallProfiler that keeps cProfile dumps of
+        slow recommend/train_models calls; defaults to one enabled by
+        UNIVERSALRECS_PROFILE_DIR (see profiling.py).
+
+        cache_size/cache_ttl bound the recommendation result cache
+        (cache_size=0 disables it).
+
+        background_training: retrain on a worker thread after add_feedback
+        instead of blocking the caller; readers keep using the previous
+        model until the new one is published.
+
+        vector_store: optional MovieVectorStore (or anything with its
+        search_similar_movies method); enables semantic and hybrid search.
+
+        collab_backend: 'svd' (default), 'als', 'bpr' or a CollabBackend
+        instance (see collab.py). ALS and BPR warm-start feedback retrains
+        from the current factors.
+
+        collab_index: build a MIPSIndex (mips.py) over the item factors on
+        every train so recommend retrieves collab candidates from it instead
+        of scoring every item; True for defaults or a dict of MIPSIndex
+        arguments (n_lists, nprobe). collab_candidates is how many items it
+        retrieves per user.
+
+        half_life_days / window_days: train collab and popularity on the
+        ratings of the last window_days only, each with sample weight
+        0.5 ** (age / half_life_days) (see collab.py). The engine then
+        holds only the window's ratings, so memory follows the window, not
+        the history. The window and decayed per-item counts are kept up to
+        date by add_feedback, which stamps feedback on the window's clock
+        (see streaming.py). Cold-start popularity ranks the window's items
+        first, then the rest by all-time popularity at load.
+
+        memory_budget: bytes (or a size like '2GB') the engine may hold
+        while training; defaults to UNIVERSALRECS_MEMORY_BUDGET, unlimited
+        if unset. train_models estimates its peak first and falls back to a
+        sparse ratings matrix, float32 and then top-K content similarities
+        to fit, or raises MemoryBudgetError (see memory.py).
+
+        representation: the memory.Representation to train with when there
+        is no memory_budget (default: the full one, at the engine's
+        precision).
+
+        precision: 'float64' (default) or 'float32'; defaults to
+        UNIVERSALRECS_PRECISION. float32 trains and stores every model array
+        (TF-IDF/SVD output, similarities, factors, history ratings) in
+        float32 and scores in float32, halving model memory. Check the
+        rankings against float64 with Evaluator.verify_precision().
+        """
+        if movies is None or ratings is None:
+            movies, ratings = load_data(data_dir)
+            ratings_file = feedback_file(data_dir)
+        else:
+            movies, ratings = movies.copy(), ratings.copy()
+            ratings_file = None
+        movies.set_index('movieId', inplace=True)
+        # Index = each rating's position in the feedback sequence (model.n_ratings counts in it)
+        ratings.reset_index(drop=True, inplace=True)
+
+        self._setup(movies, ratings, ItemCatalog.from_frame(movies), metrics,
+                    cache_size, cache_ttl, background_training)
+        if profiler is not None:
+            self.profiler = profiler
+        self.ratings_file = ratings_file
+        self.vector_store = vector_store
+        self.collab_backend = make_backend(collab_backend)
+        self.collab_index_params = ({} if collab_index is True else dict(collab_index)) if collab_index else None
+        self.collab_candidates = collab_candidates
+        self.dtype = self._precision_dtype(precision or os.getenv("UNIVERSALRECS_PRECISION") or "float64")
+        self.representation = (representation or FULL).at_precision(self.dtype)
+        self.memory_budget = parse_bytes(memory_budget if memory_budget is not None
+                                         else os.getenv("UNIVERSALRECS_MEMORY_BUDGET") or None)
+        if half_life_days or window_days:
+            with self.metrics.timer("train.stream"):
+                self.stream = RatingStream(ratings, half_life=half_life_days and half_life_days * DAY,
+                                           window=window_days and window_days * DAY)
+                # Ranked once over the whole history; the window's own ranking comes first (_build_model)
+                self._popular_fallback = self._train_popularity(ratings)
+                self.ratings = ratings[ratings['timestamp'] >= self.stream.cutoff]
         self.train_models()
 
+    @classmethod
+    def from_snapshot(cls, movies, catalog, model, metrics=None, cache_size=1024, cache_ttl=300.0,
+                      vector_store=None):
+        """
+        Read-only engine serving an already-trained model (e.g. one attached
+        from shared memory by shared_model.attach_engine). It holds no ratings
+        frame; train_models and add_feedback raise.
+        """
+        engine = cls.__new__(cls)
+        empty = pd.DataFrame({'userId': [], 'movieId': [], 'rating': [], 'timestamp': []})
+        engine._setup(movies, empty, catalog, metrics, cache_size, cache_ttl, background_training=False)
+        engine.ratings_file = None
+        engine.vector_store = vector_store
+        engine.collab_backend = None
+        engine.collab_index_params = None
+        engine.collab_candidates = 200
+        engine.read_only = True
+        engine.dtype = model.dtype
+        engine._publish(model)
+        return engine
+
+    PRECISIONS = ("float32", "float64")
+
+    @classmethod
+    def _precision_dtype(cls, precision):
+        if np.dtype(precision).name not in cls.PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}; expected one of {cls.PRECISIONS}")
+        return np.dtype(precision)
+
+    def _setup(self, movies, ratings, catalog, metrics, cache_size, cache_ttl, background_training):
+        self.metrics = metrics if metrics is not None else Metrics.from_env()
+        self.profiler = SlowCallProfiler.from_env()
+        self.movies, self.ratings = movies, ratings
+        self._n_ratings = len(ratings)           # ratings ever added, including any trimmed off by a window
+        self.read_only = False
+
+        # Models: the current RecommenderModel snapshot, replaced wholesale on retrain
+        self._model = None
+        self._train_lock = threading.Lock()      # one build at a time
+        self._ratings_lock = threading.Lock()    # serializes feedback appends
+        self.background_training = background_training
+        self._retrainer = BackgroundRetrainer(self._retrain_collab)
+
+        # Array-backed id/title/genre lookups; row i matches row i of content_sim_matrix
+        self.catalog = catalog
+
+        # Result cache, keyed on request params + model_version
+        self._rec_cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+
+        # In-session events (add_session_event): user_id -> tuple of (movieId, rating), never persisted
+        self._sessions = LRUCache(maxsize=self.SESSION_USERS, ttl=self.SESSION_TTL)
+        # Called with a user id when their feedback or session changes (on_user_change)
+        self._user_listeners = []
+        # user_id -> generation, bumped on every change; part of result cache keys (user_generation)
+        self._user_generations = {}
+        self._generation_counter = itertools.count(1)
+
+        # Optional time window / decay over the ratings used for training (streaming.py)
+        self.stream = None
+        self._popular_fallback = None
+
+        # How matrices are stored; train_models picks a cheaper one under a memory budget (memory.py)
+        self.dtype = np.dtype(np.float64)
+        self.memory_budget = None
+        self.representation = FULL
+
+        # Optional precomputed top-N table (rec_table.py) and the users whose feedback is newer than it
+        self.rec_table = None
+        self._table_stale_users = set()
+
+        # Semantic search: optional vector store, queried on a side thread during hybrid search
+        self.vector_store = None
+        self._search_executor = None
+        self._search_executor_lock = threading.Lock()
+
+    # Read-only views of the current model snapshot
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def n_ratings(self):
+        """Ratings added to the engine so far; self.ratings holds fewer when training on a window."""
+        return self._n_ratings
+
+    @property
+    def model_version(self):
+        return self._model.version if self._model is not None else 0
+
+    @property
+    def content_sim_matrix(self):
+        return self._model.content_sim_matrix
+
+    @property
+    def user_item_matrix(self):
+        return self._model.user_item_matrix
+
+    @property
+    def collab_user_factors(self):
+        return self._model.collab_user_factors # U (User-Concept)
+
+    @property
+    def collab_item_factors(self):
+        return self._model.collab_item_factors # Vt (Item-Concept)
+
     def train_models(self):
         """Trains both Content-Based and Collaborative Filtering models."""
+        self._check_writable()
+        with self.profiler.profile("train_models"), self._train_lock, self.metrics.timer("train.total"):
+            self._plan_memory(self.ratings)
+            content_sim_matrix = self._train_content()
+            self._publish(self._build_model(content_sim_matrix))
+        self.metrics.inc("train_runs")
+
+    def _retrain_collab(self):
+        """Feedback retrain: item descriptions haven't changed, so the content model is reused."""
+        with self.profiler.profile("retrain"), self._train_lock, self.metrics.timer("train.background"):
+            self._publish(self._build_model(self._model.content_sim_matrix))
+        self.metrics.inc("train_runs")
+
+    def _build_model(self, content_sim_matrix):
+        with self._ratings_lock:
+            if self.stream is not None:
+                # Ratings that aged out of the window leave the frame too, so history follows the window
+                self.ratings = self.ratings[self.ratings['timestamp'] >= self.stream.cutoff]
+                train_ratings = self.stream.frame()
+                item_stats = self.stream.item_stats()
+            ratings, n_ratings = self.ratings, self._n_ratings
+        if self.stream is None:
+            train_ratings = ratings
+        user_item_matrix, user_factors, item_factors = self._train_collab(train_ratings)
+        with self.metrics.timer("train.index"):
+            history = UserHistory.from_frame(ratings, dtype=self.dtype)
+            collab_item_idx = self.catalog.index_of(user_item_matrix.columns.to_numpy())
+            if self.stream is not None:
+                popular_idx, popular_scores = self._rank_popular(*item_stats)
+                # An empty or thin window still fills cold-start lists: all-time popularity follows it
+                fallback_idx, fallback_scores = self._popular_fallback
+                rest = ~np.isin(fallback_idx, popular_idx)
+                popular_idx = np.concatenate([popular_idx, fallback_idx[rest]])
+                popular_scores = np.concatenate([popular_scores, fallback_scores[rest]])
+            else:
+                popular_idx, popular_scores = self._train_popularity(ratings)
+        collab_index = None
+        if self.collab_index_params is not None and item_factors is not None:
+            with self.metrics.timer("train.mips"):
+                collab_index = MIPSIndex(item_factors, **self.collab_index_params)
+        return RecommenderModel(
+            version=self.model_version + 1,
+            content_sim_matrix=content_sim_matrix,
+            user_item_matrix=user_item_matrix,
+            collab_user_ids=user_item_matrix.index.to_numpy(dtype=np.int64),
+            collab_user_factors=user_factors,
+            collab_item_factors=item_factors,
+            collab_item_idx=collab_item_idx,
+            history=history,
+            popular_idx=popular_idx,
+            popular_scores=popular_scores,
+            n_ratings=n_ratings,
+            collab_index=collab_index,
+        )
+
+    def memory_report(self):
+        """
+        Bytes held per artifact: the ratings and movies frames, the catalog
+        and each part of the current model. Memory-mapped arrays count at
+        their mapped size.
+        """
+        model = self._model
+        report = {"ratings": nbytes(self.ratings), "movies": nbytes(self.movies), "catalog": nbytes(self.catalog)}
+        if model is not None:
+            report.update({
+                "user_item_matrix": nbytes(model.user_item_matrix),
+                "collab_user_factors": nbytes(model.collab_user_factors),
+                "collab_item_factors": nbytes(model.collab_item_factors),
+                "content_sim_matrix": nbytes(model.content_sim_matrix),
+                "collab_maps": nbytes(model.collab_user_ids) + nbytes(model.collab_item_idx),
+                "history": nbytes(model.history),
+                "popular": nbytes(model.popular_idx) + nbytes(model.popular_scores),
+                "collab_index": nbytes(model.collab_index),
+            })
+        report["stream"] = nbytes(self.stream)
+        report["rec_table"] = nbytes(self.rec_table)
+        return report
+
+    def estimate_training_memory(self, representation=None):
+        """Estimated bytes per artifact train_models would allocate now (see memory.estimate_training_memory)."""
+        return estimate_training_memory(*self._training_dims(self.ratings), representation or self.representation,
+                                        n_factors=self._n_factors(), precision=self.dtype)
+
+    def _training_dims(self, ratings):
+        return ratings['userId'].nunique(), ratings['movieId'].nunique(), len(ratings), len(self.catalog)
+
+    def _n_factors(self):
+        backend = self.collab_backend
+        return getattr(backend, 'n_components', None) or getattr(backend, 'factors', 10)
+
+    def _plan_memory(self, ratings):
+        """Picks self.representation so the train's estimated peak fits memory_budget."""
+        if self.memory_budget is None:
+            return
+        with self.metrics.timer("train.memory_plan"):
+            # The ratings frame and the current model stay alive while the new model is built
+            baseline = sum(self.memory_report().values())
+            self.representation, estimate = plan_representation(
+                self.memory_budget, *self._training_dims(ratings), baseline=baseline, n_factors=self._n_factors(),
+                precision=self.dtype)
+        print(f"Memory plan: {self.representation}, estimated peak "
+              f"{format_bytes(baseline + sum(estimate.values()))} of {format_bytes(self.memory_budget)}")
+
+    def _publish(self, model):
+        # Single reference swap: readers hold either the old or the new snapshot
+        self._model = model
+        # New model: cached results from the old one can never be hit again
+        self._rec_cache.clear()
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("This engine serves a read-only snapshot; train and send feedback in the loader process.")
+
+    def wait_for_training(self, timeout=None):
+        """Blocks until any scheduled background retrain has been published."""
+        return self._retrainer.wait(timeout)
+
+    def _train_content(self):
         print("Training Content-Based Model...")
-        # 1. Content-Based: TF-IDF on Descriptions + SVD
-        tfidf = TfidfVectorizer(stop_words='english')
-        tfidf_matrix = tfidf.fit_transform(self.movies['description'])
-        
-        # SVD for Dimensionality Reduction (Latent Semantic Analysis)
-        n_components_content = min(20, tfidf_matrix.shape[1] - 1)
-        svd_content = TruncatedSVD(n_components=n_components_content, random_state=42)
-        latent_matrix_content = svd_content.fit_transform(tfidf_matrix)
-        
-        # Calculate Cosine Similarity on Latent Features
-        self.content_sim_matrix = cosine_similarity(latent_matrix_content)
-        
+        with self.metrics.timer("train.content"):
+            # 1. Content-Based: TF-IDF on Descriptions + SVD
+            tfidf = TfidfVectorizer(stop_words='english', dtype=self.dtype)
+            tfidf_matrix = tfidf.fit_transform(self.movies['description'])
+
+            # SVD for Dimensionality Reduction (Latent Semantic Analysis)
+            n_components_content = min(20, tfidf_matrix.shape[1] - 1)
+            svd_content = TruncatedSVD(n_components=n_components_content, random_state=42)
+            latent_matrix_content = svd_content.fit_transform(tfidf_matrix)
+
+            # Calculate Cosine Similarity on Latent Features (float32 latents give float32 similarities)
+            representation = self.representation
+            if representation.sim_neighbors or representation.sim_dtype != latent_matrix_content.dtype:
+                return block_similarity(latent_matrix_content, representation.sim_dtype, representation.sim_neighbors)
+            return cosine_similarity(latent_matrix_content)
+
+    def _train_collab(self, ratings):
         print("Training Collaborative Model...")
-        # 2. Collaborative: Matrix Factorization (SVD) on User-Item Matrix
-        # Drop duplicates to avoid pivot error
-        ratings_unique = self.ratings.drop_duplicates(subset=['userId', 'movieId'], keep='last')
-        self.user_item_matrix = ratings_unique.pivot(index='userId', columns='movieId', values='rating').fillna(0)
-        
+        # 2. Collaborative: Matrix Factorization on User-Item Matrix (backend from collab.py)
+        with self.metrics.timer("train.pivot"):
+            # One rating per (user, item): the latest
+            ratings_unique = ratings.drop_duplicates(subset=['userId', 'movieId'], keep='last')
+            values = ratings_unique['rating'].to_numpy(dtype=self.dtype)
+            # Built straight from the codes; the dense users x items pivot only exists if asked for
+            user_ids, user_codes = np.unique(ratings_unique['userId'].to_numpy(), return_inverse=True)
+            item_ids, item_codes = np.unique(ratings_unique['movieId'].to_numpy(), return_inverse=True)
+            rated = np.flatnonzero(values != 0)
+            # Row positions first, so the values and sample weights come out in the CSR's entry order
+            positions = sp.csr_matrix((rated + 1, (user_codes[rated], item_codes[rated])),
+                                      shape=(len(user_ids), len(item_ids)))
+            order = positions.data - 1
+            X = sp.csr_matrix((values[order], positions.indices, positions.indptr), shape=positions.shape)
+            # Time decay: older ratings pull the factors less but keep their value
+            weights = ratings_unique['weight'].to_numpy()[order] if 'weight' in ratings_unique else None
+            index, columns = pd.Index(user_ids, name='userId'), pd.Index(item_ids, name='movieId')
+            if self.representation.sparse_ratings:
+                user_item_matrix = pd.DataFrame.sparse.from_spmatrix(X, index=index, columns=columns)
+            else:
+                user_item_matrix = pd.DataFrame(X.toarray(), index=index, columns=columns)
+
         # Only fit if we have enough data
-        if not self.user_item_matrix.empty:
-            X = self.user_item_matrix.values
-            n_components_collab = min(10, min(X.shape) - 1)
-            
-            svd_collab = TruncatedSVD(n_components=n_components_collab, random_state=42)
-            self.collab_user_factors = svd_collab.fit_transform(X) # User Embeddings
-            self.collab_item_factors = svd_collab.components_      # Item Embeddings
+        user_factors = item_factors = None
+        if min(user_item_matrix.shape) >= 2:
+            with self.metrics.timer("train.collab"):
+                warm_start = self._warm_start_factors(user_item_matrix)
+                user_factors, item_factors = self.collab_backend.fit(X, warm_start=warm_start, weights=weights)
+                # ALS/BPR solve in float64 internally; the model stores the engine's precision
+                user_factors = np.asarray(user_factors, dtype=self.dtype)
+                item_factors = np.asarray(item_factors, dtype=self.dtype)
         else:
             print("Warning: Not enough interaction data for Collaborative Filtering.")
+        return user_item_matrix, user_factors, item_factors
 
-    def get_popular_items(self, n=10):
-        """Cold Start: Returns top rated items weighted by count."""
+    def _warm_start_factors(self, user_item_matrix):
+        """
+        The current model's factors re-indexed to user_item_matrix's users
+        and items (small random vectors for new ones), or None when the
+        backend can't warm-start or there is nothing to start from.
+        """
+        model = self._model
+        if (not self.collab_backend.supports_warm_start or model is None
+                or model.collab_user_factors is None or model.user_item_matrix is None):
+            return None
+        old_user, old_item = model.collab_user_factors, model.collab_item_factors
+        k = old_user.shape[1]
+        rng = np.random.default_rng(0)
+        user_factors = rng.normal(scale=0.01, size=(len(user_item_matrix.index), k))
+        item_factors = rng.normal(scale=0.01, size=(k, len(user_item_matrix.columns)))
+
+        _, new_pos, old_pos = np.intersect1d(user_item_matrix.index.to_numpy(), model.collab_user_ids,
+                                             return_indices=True)
+        user_factors[new_pos] = old_user[old_pos]
+        _, new_pos, old_pos = np.intersect1d(user_item_matrix.columns.to_numpy(),
+                                             model.user_item_matrix.columns.to_numpy(), return_indices=True)
+        item_factors[:, new_pos] = old_item[:, old_pos]
+        return user_factors, item_factors
+
+    def _train_popularity(self, ratings):
+        """Catalog rows ranked by popularity (precomputed per model)."""
         # Calculate weighted rating (IMDB style or just simple mean for now)
         # Using simple mean * log(count) to boost popular items
-        movie_stats = self.ratings.groupby('movieId').agg({'rating': ['mean', 'count']})
+        movie_stats = ratings.groupby('movieId').agg({'rating': ['mean', 'count']})
         movie_stats.columns = ['mean', 'count']
-        
-        # Score = mean_rating * log(count + 1)
-        movie_stats['score'] = movie_stats['mean'] * np.log(movie_stats['count'] + 1)
-        top_ids = movie_stats.sort_values('score', ascending=False).head(n).index.tolist()
-        
-        results = []
-        for mid in top_ids:
-            results.append({
-                'movieId': mid,
-                'title': self.movies.loc[mid, 'title'],
-                'genres': self.movies.loc[mid, 'genres'],
-                'score': movie_stats.loc[mid, 'score'],
-                'reason': 'Popular Outcome'
-            })
-        return results
+        return self._rank_popular(movie_stats.index.to_numpy(), movie_stats['count'].to_numpy(),
+                                  movie_stats['mean'].to_numpy())
+
+    def _rank_popular(self, movie_ids, counts, means):
+        """Catalog rows by mean * log(count + 1), best first; counts may be time-decayed."""
+        scores = (means * np.log(counts + 1)).astype(self.dtype, copy=False)
+
+        # Rated ids that aren't in the catalog can't be shown
+        idx = self.catalog.index_of(movie_ids)
+        known = idx >= 0
+        idx, scores = idx[known], scores[known]
+
+        order = np.argsort(-scores, kind='stable')
+        return idx[order], scores[order]
+
+    def get_popular_items(self, n=10):
+        """Cold Start: Returns top rated items weighted by count."""
+        with self.metrics.timer("popular.total"):
+            model = self._model
+            return records(self.catalog, model.popular_idx[:n], model.popular_scores[:n], reason='Popular Outcome')
 
     def recommend(self, user_id, n=10, weight_content=0.5, weight_collab=0.5, diversity=0.0):
         """Hybrid Recommendation Engine."""
-        
-        # 1. NEW USER CHECK
-        if user_id not in self.ratings['userId'].unique():
-            return self.get_popular_items(n), "Popularity (New User)"
-
-        # 2. Collaborative Scoring
-        # Predict ratings for all items for this user
-        collab_scores = {}
-        if self.collab_user_factors is not None:
-            # Reconstruct (impute) ratings
-            # Find user index in pivot table
-            try:
-                user_idx = self.user_item_matrix.index.get_loc(user_id)
-                user_vector = self.collab_user_factors[user_idx].reshape(1, -1)
-                predicted_ratings = np.dot(user_vector, self.collab_item_factors).flatten()
-                
-                # Map back to movieIds
-                collab_columns = self.user_item_matrix.columns
-                for i, mid in enumerate(collab_columns):
-                    collab_scores[mid] = predicted_ratings[i]
-            except Exception as e:
-                print(f"Collab error: {e}")
-
-        # 3. Content-Based Scoring
-        # Find items user liked highly (>3.5)
-        user_history = self.ratings[(self.ratings['userId'] == user_id) & (self.ratings['rating'] >= 4.0)]
-        liked_movies = user_history['movieId'].tolist()
-        
-        content_scores = {}
-        explanation_sources = {} # Store which movie caused the recommendation
-        
-        if liked_movies:
-            # Track best (highest) similarity per target so explanations
-            # point at the liked movie most similar to the recommendation,
-            # not just whichever was iterated first.
-            best_sim = {}
-            for liked_id in liked_movies:
-                if liked_id in self.movie_id_to_idx:
-                    idx = self.movie_id_to_idx[liked_id]
-                    sim_row = self.content_sim_matrix[idx]
-        
-                    for i, score in enumerate(sim_row):
-                        target_id = self.idx_to_movie_id[i]
-                        # Accumulate similarity for ranking
-                        content_scores[target_id] = content_scores.get(target_id, 0.0) + score
-                        # Remember the strongest single source for explanation
-                        if score > best_sim.get(target_id, -1.0):
-                            best_sim[target_id] = score
-                            explanation_sources[target_id] = liked_id
-
-        # 4. Hybrid Fusion
-        final_scores = []
-        all_movie_ids = set(self.movies.index)
-        
-        # Exclude items user has already seen
-        seen_movies = set(self.ratings[self.ratings['userId'] == user_id]['movieId'])
-        
-        # Normalization helpers (simple min-max or just raw scaling)
-        # SVD ratings are roughly 1-5. Cosine is 0-1 (accumulated could be higher).
-        # We'll normalize roughly to 0-1 range for combination.
-        
-        max_collab = max(collab_scores.values()) if collab_scores else 1.0
-        max_content = max(content_scores.values()) if content_scores else 1.0
-        
-        for mid in all_movie_ids:
-            if mid in seen_movies:
-                continue
-                
-            s_content = content_scores.get(mid, 0.0) / max_content if max_content > 0 else 0
-            s_collab = collab_scores.get(mid, 0.0) / max_collab if max_collab > 0 else 0
-            
-            # Weighted Hybrid Score
-            final_score = (s_content * weight_content) + (s_collab * weight_collab)
-            
-            # Determine Explanation
-            reason = ""
-            if s_content > s_collab:
-                source_id = explanation_sources.get(mid)
-                source_title = self.movies.loc[source_id, 'title'] if source_id else "movies you liked"
-                reason = f"Because you liked {source_title}"
+        metrics = self.metrics
+        metrics.inc("recommend_requests")
+
+        with self.profiler.profile("recommend", user=user_id):
+            served = self._from_table(user_id, n, weight_content, weight_collab, diversity)
+            if served is not None:
+                return served
+
+            # Pin one model snapshot for the whole request
+            model = self._model
+            # Read before scoring: a result computed across a feedback/session change lands under the old key
+            key = (user_id, n, weight_content, weight_collab, diversity, model.version, self.user_generation(user_id))
+            cached = self._rec_cache.get(key)
+            if cached is not None:
+                metrics.inc("recommend_cache_hits")
+                recs, method = cached
+                return list(recs), method
+
+            recs, method = self._recommend_uncached(model, user_id, n, weight_content, weight_collab, diversity)
+            self._rec_cache.set(key, (recs, method), tag=user_id)
+            return list(recs), method
+
+    def recommend_batch(self, user_ids, n=10, weight_content=0.5, weight_collab=0.5, diversity=0.0):
+        """
+        recommend() for many users at once: collaborative scores for all
+        uncached users come from a single matrix product.
+
+        Returns a list of (recs, method) in the order of user_ids.
+        """
+        metrics = self.metrics
+        metrics.inc("recommend_requests", len(user_ids))
+        with self.profiler.profile("recommend_batch", users=len(user_ids)):
+            model = self._model
+            results = [None] * len(user_ids)
+
+            misses, keys = [], {}
+            for pos, user_id in enumerate(user_ids):
+                served = self._from_table(user_id, n, weight_content, weight_collab, diversity)
+                if served is not None:
+                    results[pos] = served
+                    continue
+                keys[pos] = (user_id, n, weight_content, weight_collab, diversity, model.version,
+                             self.user_generation(user_id))
+                cached = self._rec_cache.get(keys[pos])
+                if cached is not None:
+                    metrics.inc("recommend_cache_hits")
+                    results[pos] = (list(cached[0]), cached[1])
+                else:
+                    misses.append(pos)
+
+            scored = self._recommend_many(model, [user_ids[pos] for pos in misses], n, weight_content,
+                                          weight_collab, diversity) if misses else []
+            for pos, (recs, method) in zip(misses, scored):
+                self._rec_cache.set(keys[pos], (recs, method), tag=user_ids[pos])
+                results[pos] = (list(recs), method)
+            return results
+
+    def _recommend_many(self, model, user_ids, n, weight_content, weight_collab, diversity):
+        """_recommend_uncached for several users, with their collaborative scores from one matrix product."""
+        rows = np.array([model.collab_row(user_id) for user_id in user_ids], dtype=np.int64)
+        predicted = None
+        # With a MIPS index each user retrieves their own candidates instead
+        if model.collab_user_factors is not None and model.collab_index is None and (rows >= 0).any():
+            with self.metrics.timer("recommend.batch_collab"):
+                predicted = model.collab_user_factors[np.maximum(rows, 0)] @ model.collab_item_factors
+        return [self._recommend_uncached(model, user_id, n, weight_content, weight_collab, diversity,
+                                         predicted_ratings=predicted[k] if predicted is not None and rows[k] >= 0
+                                         else None)
+                for k, user_id in enumerate(user_ids)]
+
+    def use_table(self, table):
+        """
+        Serve recommend() from a precomputed RecTable (see rec_table.py), or
+        stop with None. Users with feedback newer than the table, users it
+        doesn't contain and calls with other parameters are scored live.
+        """
+        with self._ratings_lock:
+            stale = set() if table is None else set(self._ratings_since(self.ratings, table.n_ratings)['userId'].tolist())
+            self._table_stale_users = stale
+            self.rec_table = table
+
+    def _from_table(self, user_id, n, weight_content, weight_collab, diversity):
+        table = self.rec_table
+        if (table is None or user_id in self._table_stale_users
+                or not table.serves(n, weight_content, weight_collab, diversity)):
+            return None
+        row = table.lookup(user_id, n)
+        if row is None:
+            return None
+        movie_ids, scores, reasons, method = row
+        idx = self.catalog.index_of(movie_ids)
+        known = idx >= 0
+        self.metrics.inc("recommend_table_hits")
+        return records(self.catalog, idx[known], scores[known],
+                       reasons=[r for r, k in zip(reasons, known) if k]), method
+
+    def similar_items(self, movie_id, n=10):
+        """Items most similar in content to movie_id (empty if unknown)."""
+        model = self._model
+        idx = self.catalog.index(movie_id)
+        if idx < 0:
+            return []
+        sims = dense(model.content_sim_matrix[idx]).ravel()
+        candidates = np.flatnonzero(np.arange(len(sims)) != idx)
+        top = self._top_k(candidates, sims[candidates], n)
+        return records(self.catalog, top, sims[top], reason=f"Similar to {self.catalog.title(idx)}")
+
+    def cache_stats(self):
+        """Hit/miss counts and hit rate of the recommendation cache."""
+        return self._rec_cache.stats()
+
+    @staticmethod
+    def _ratings_since(ratings, n_ratings):
+        """Rows of `ratings` added after the first n_ratings (its index is the position in the feedback sequence)."""
+        return ratings.iloc[ratings.index.searchsorted(n_ratings):]
+
+    def _user_history(self, model, ratings, user_id):
+        """
+        (movie_ids, ratings, n_recent) for a user: the model's index, then
+        feedback newer than the model and session events. The last n_recent
+        entries are the ones the model hasn't been trained on.
+        """
+        movie_ids, values = model.history.row(user_id)
+        recent_ids, recent_values = [], []
+        newer = self._ratings_since(ratings, model.n_ratings)
+        if len(newer):
+            newer = newer[newer['userId'] == user_id]
+            if len(newer):
+                recent_ids.append(newer['movieId'].to_numpy(dtype=np.int64))
+                recent_values.append(newer['rating'].to_numpy(dtype=values.dtype))
+        session = self._sessions.get(user_id)
+        if session:
+            recent_ids.append(np.array([m for m, _ in session], dtype=np.int64))
+            recent_values.append(np.array([r for _, r in session], dtype=values.dtype))
+        if not recent_ids:
+            return movie_ids, values, 0
+        n_recent = sum(len(ids) for ids in recent_ids)
+        return (np.concatenate([movie_ids, *recent_ids]), np.concatenate([values, *recent_values]), n_recent)
+
+    def _session_user_vector(self, model, user_idx, movie_ids, ratings):
+        """
+        Folds recent ratings into the user's collab vector without retraining:
+        u + sum (r - SESSION_NEUTRAL) * item_factors[:, i]. Likes pull the user
+        towards the item, dislikes push away. Users without factors start at 0.
+        """
+        item_factors = model.collab_item_factors
+        dtype = item_factors.dtype
+        if user_idx >= 0:
+            user_vector = np.array(model.collab_user_factors[user_idx], dtype=dtype)
+        else:
+            user_vector = np.zeros(item_factors.shape[0], dtype=dtype)
+        rows = self.catalog.index_of(movie_ids)
+        for row, rating in zip(rows, ratings):
+            cols = np.flatnonzero(model.collab_item_idx == row) if row >= 0 else ()
+            if len(cols):
+                user_vector += dtype.type(rating - self.SESSION_NEUTRAL) * item_factors[:, cols[0]]
+        return user_vector
+
+    def _recommend_uncached(self, model, user_id, n, weight_content, weight_collab, diversity,
+                            predicted_ratings=None):
+        metrics = self.metrics
+        catalog = self.catalog
+        n_items = len(catalog)
+        dtype = self.dtype   # every score array stays in the model's precision
+        with metrics.timer("recommend.total"):
+            # 1. NEW USER CHECK
+            with metrics.timer("recommend.user_lookup"):
+                history_ids, history_ratings, n_recent = self._user_history(model, self.ratings, user_id)
+            if len(history_ids) == 0:
+                metrics.inc("recommend_cold_start")
+                return self.get_popular_items(n), "Popularity (New User)"
+
+            # 2. Collaborative Scoring
+            # Predict ratings for all items for this user, in catalog order
+            collab = np.zeros(n_items, dtype=dtype)
+            max_collab = 1.0
+            with metrics.timer("recommend.collab"):
+                # Ratings the model hasn't seen yet (new feedback, session
+                # events) are folded into the user vector, so users whose
+                # first ratings arrived after training get collab scores too.
+                user_idx = model.collab_row(user_id)
+                user_vector = None
+                if model.collab_user_factors is not None:
+                    if n_recent:
+                        with metrics.timer("recommend.session"):
+                            user_vector = self._session_user_vector(
+                                model, user_idx, history_ids[-n_recent:], history_ratings[-n_recent:])
+                        predicted_ratings = None
+                    elif user_idx >= 0:
+                        user_vector = model.collab_user_factors[user_idx]
+                if user_vector is not None:
+                    # Reconstruct (impute) ratings
+                    try:
+                        if predicted_ratings is None and model.collab_index is not None:
+                            # Top candidates only (seen items are dropped later, so fetch extra)
+                            cols, predicted = model.collab_index.search(
+                                user_vector, self.collab_candidates + len(history_ids))
+                            rows = model.collab_item_idx[cols]
+                            collab[rows[rows >= 0]] = predicted[rows >= 0]
+                            max_collab = predicted.max()
+                        else:
+                            if predicted_ratings is None:
+                                predicted_ratings = user_vector @ model.collab_item_factors
+
+                            # Map pivot columns back to catalog rows
+                            in_catalog = model.collab_item_idx >= 0
+                            collab[model.collab_item_idx[in_catalog]] = predicted_ratings[in_catalog]
+                            max_collab = predicted_ratings.max()
+                    except Exception as e:
+                        metrics.inc("recommend_collab_errors")
+                        print(f"Collab error: {e}")
+
+            # 3. Content-Based Scoring
+            content = np.zeros(n_items, dtype=dtype)
+            max_content = 1.0
+            liked_idx, liked_block = None, None
+            with metrics.timer("recommend.content"):
+                liked_idx = self._content_profile_rows(history_ids, history_ratings)
+                if len(liked_idx):
+                    # One gather of the liked rows and one weighted reduce over them
+                    liked_block = dense(model.content_sim_matrix[liked_idx])
+                    content = self._recency_weights(len(liked_idx), liked_block.dtype) @ liked_block
+                    max_content = content.max()
+
+            # 4. Hybrid Fusion
+            with metrics.timer("recommend.fusion"):
+                # Recent dislikes demote similar items until a retrain folds them into the collab model
+                disliked = self._recent_dislikes(history_ids, history_ratings, n_recent)
+                penalty = dense(model.content_sim_matrix[disliked]).max(axis=0) if len(disliked) else None
+                final_scores, s_content, s_collab = self._fuse(
+                    content, collab, max_content, max_collab, weight_content, weight_collab,
+                    penalty, weight_content * self.SESSION_DISLIKE_PENALTY)
+
+                # Exclude items user has already seen
+                candidates = np.ones(n_items, dtype=bool)
+                seen_idx = catalog.index_of(history_ids)
+                candidates[seen_idx[seen_idx >= 0]] = False
+                candidates = np.flatnonzero(candidates)
+
+            # Sort and return — apply MMR reranking when diversity > 0
+            with metrics.timer("recommend.sort"):
+                top = self._top_k(candidates, final_scores[candidates], self._pool_size(n, diversity))
+
+            if diversity > 0.0:
+                with metrics.timer("recommend.mmr"):
+                    top = self._mmr_rerank(top, final_scores[top], n, diversity, model.content_sim_matrix)
+
+            # Determine Explanation (only for the items being returned)
+            with metrics.timer("recommend.build"):
+                # The liked movie most similar to each recommendation (first on ties)
+                sources = (liked_idx[liked_block[:, top].argmax(axis=0)] if liked_block is not None
+                           else np.full(len(top), -1))
+                reasons = self._explain(s_content[top], s_collab[top], sources)
+                return records(catalog, top, final_scores[top], reasons), self._method_name(diversity)
+
+    # Fusion steps shared with ShardedEngine, which runs them over item partitions (sharding.py)
+    @staticmethod
+    def _fuse(content, collab, max_content, max_collab, weight_content, weight_collab,
+              penalty=None, penalty_weight=0.0):
+        """
+        Hybrid scores: content and collab each scaled by their (global)
+        maximum, weighted and summed, less penalty_weight times the
+        similarity to recent dislikes. Returns (final, s_content, s_collab).
+        """
+        # SVD ratings are roughly 1-5, summed cosines 0-1 or more: scale both to about 0-1 before combining
+        s_content = content / max_content if max_content > 0 else np.zeros_like(content)
+        s_collab = collab / max_collab if max_collab > 0 else np.zeros_like(collab)
+        final = (s_content * weight_content) + (s_collab * weight_collab)
+        if penalty is not None:
+            final -= penalty_weight * np.maximum(penalty, 0.0)
+        return final, s_content, s_collab
+
+    def _recent_dislikes(self, history_ids, history_ratings, n_recent):
+        """Catalog rows of the ratings the model hasn't seen yet that are dislikes (2 stars or less)."""
+        if not n_recent:
+            return np.zeros(0, dtype=np.int64)
+        rows = self.catalog.index_of(history_ids[-n_recent:][history_ratings[-n_recent:] <= 2.0])
+        return rows[rows >= 0]
+
+    @staticmethod
+    def _pool_size(n, diversity):
+        """Candidates ranked before MMR picks n of them."""
+        return max(n * 5, 50) if diversity > 0.0 else n
+
+    @staticmethod
+    def _method_name(diversity):
+        return f"Hybrid + MMR (d={diversity:.2f})" if diversity > 0.0 else "Hybrid"
+
+    def _explain(self, s_content, s_collab, sources):
+        """Reason per recommendation: its closest liked movie (catalog row in sources) when content outweighs collab."""
+        reasons = []
+        for content, collab, source in zip(s_content, s_collab, sources):
+            if content > collab:
+                source_title = self.catalog.title(source) if source >= 0 else "movies you liked"
+                reasons.append(f"Because you liked {source_title}")
             else:
-                 reason = "Users like you also enjoyed this"
-
-            final_scores.append({
-                'movieId': mid,
-                'title': self.movies.loc[mid, 'title'],
-                'genres': self.movies.loc[mid, 'genres'],
-                'score': final_score,
-                'reason': reason
-            })
-            
-        # Sort and return — apply MMR reranking when diversity > 0
-        if diversity > 0.0:
-            return self._mmr_rerank(final_scores, n, diversity), f"Hybrid + MMR (d={diversity:.2f})"
+                reasons.append("Users like you also enjoyed this")
+        return reasons
 
-        final_scores.sort(key=lambda x: x['score'], reverse=True)
-        return final_scores[:n], "Hybrid"
+    CONTENT_HISTORY_CAP = 100       # most recent liked movies in the content profile
+    CONTENT_HALF_LIFE = 50          # likes after which an older like counts half; None weighs all equally
 
-    def _mmr_rerank(self, scored, n, diversity):
+    def _content_profile_rows(self, history_ids, history_ratings):
+        """Catalog rows of the user's most recent likes (rating >= 4), oldest first."""
+        liked_ids = history_ids[history_ratings >= 4.0][-self.CONTENT_HISTORY_CAP:]
+        liked_idx = self.catalog.index_of(liked_ids)
+        return liked_idx[liked_idx >= 0]
+
+    def _recency_weights(self, n_liked, dtype=np.float64):
+        """Weight of each like in the content profile; the newest counts 1."""
+        if not self.CONTENT_HALF_LIFE:
+            return np.ones(n_liked, dtype=dtype)
+        age = np.arange(n_liked - 1, -1, -1)
+        return (0.5 ** (age / self.CONTENT_HALF_LIFE)).astype(dtype, copy=False)
+
+    @staticmethod
+    def _top_k(idx, scores, k):
+        """The k highest-scoring entries of idx, best first."""
+        if len(idx) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            idx, scores = idx[part], scores[part]
+        return idx[np.argsort(-scores, kind='stable')]
+
+    def _mmr_rerank(self, pool, scores, n, diversity, sim_matrix=None):
         """
         Maximal Marginal Relevance reranking.
 
+        pool are catalog rows sorted by relevance, scores their hybrid scores.
+        Returns the n selected rows in pick order.
+
         diversity = 0.0 -> pure relevance (same as plain sort by score)
         diversity = 1.0 -> pure diversity (ignore score, spread across catalog)
 
-        Uses self.content_sim_matrix as the item-item similarity for the
-        redundancy penalty.
+        Uses sim_matrix (default: self.content_sim_matrix) as the item-item
+        similarity for the redundancy penalty.
         """
-        if diversity <= 0.0 or len(scored) <= 1:
-            scored.sort(key=lambda x: x['score'], reverse=True)
-            return scored[:n]
+        if sim_matrix is None:
+            sim_matrix = self.content_sim_matrix
+        if diversity <= 0.0 or len(pool) <= 1:
+            return pool[:n]
 
         lam = 1.0 - diversity  # weight on relevance; (1-lam) is diversity weight
 
-        # Cap candidate pool — MMR is O(n*k), no need to scan all movies
-        pool = sorted(scored, key=lambda x: x['score'], reverse=True)[:max(n * 5, 50)]
-
         # Normalize relevance scores into [0, 1] so they're comparable to similarities
-        max_s = max((c['score'] for c in pool), default=1.0) or 1.0
-        for c in pool:
-            c['_rel'] = c['score'] / max_s
-
-        selected, selected_idxs = [], []
-        while pool and len(selected) < n:
-            best_i, best_mmr = 0, -float('inf')
-            for i, cand in enumerate(pool):
-                cand_idx = self.movie_id_to_idx.get(cand['movieId'])
-                if cand_idx is None:
-                    continue
-                if not selected_idxs:
-                    penalty = 0.0
-                else:
-                    penalty = max(self.content_sim_matrix[cand_idx][s] for s in selected_idxs)
-                mmr = lam * cand['_rel'] - (1.0 - lam) * penalty
-                if mmr > best_mmr:
-                    best_mmr, best_i = mmr, i
+        max_s = scores.max() or 1.0
+        rel = scores / max_s
 
-            chosen = pool.pop(best_i)
-            chosen_idx = self.movie_id_to_idx.get(chosen['movieId'])
-            if chosen_idx is not None:
-                selected.append(chosen)
-                selected_idxs.append(chosen_idx)
+        # Top-K similarities (memory.py): gather the pool's block once, missing pairs count as 0
+        block = sim_matrix[pool][:, pool].toarray() if sp.issparse(sim_matrix) else None
 
-        for c in selected:
-            c.pop('_rel', None)
-        return selected
+        # penalty[i] = max similarity of pool[i] to anything selected so far
+        penalty = np.zeros(len(pool), dtype=rel.dtype)
+        available = np.ones(len(pool), dtype=bool)
+        selected = []
+        while len(selected) < min(n, len(pool)):
+            mmr = lam * rel - (1.0 - lam) * penalty
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            available[best] = False
+            selected.append(pool[best])
+            penalty = np.maximum(penalty, block[:, best] if block is not None else sim_matrix[pool, pool[best]])
+        return np.array(selected, dtype=pool.dtype)
 
     def add_feedback(self, user_id, movie_id, rating):
-        """Adds a new interaction and retrains models."""
-        # 1. Update in-memory
-        new_row = {'userId': user_id, 'movieId': movie_id, 'rating': rating, 'timestamp': int(pd.Timestamp.now().timestamp())}
-        self.ratings = pd.concat([self.ratings, pd.DataFrame([new_row])], ignore_index=True)
-        
-        # 2. Update file (append mode would be faster but for safety we rewrite or append)
-        # We'll just append to the csv
-        # Re-importing inside method to be safe or assuming standard path.
-        from .data_loader import RATINGS_FILE
-        pd.DataFrame([new_row]).to_csv(RATINGS_FILE, mode='a', header=False, index=False)
-        
-        print(f"Feedback added: User {user_id} -> Item {movie_id} ({rating}*)")
-        
-        # 3. Retrain
-        self.train_models()
+        """
+        Adds a new interaction and retrains models.
 
-    def search_items(self, query: str, n: int = 5) -> list:
+        With background_training the retrain runs on a worker thread and
+        this returns as soon as the rating is recorded.
         """
-        Simple text search for items based on title and genres.
-        Returns a list of dictionaries with 'movieId', 'title', 'genres'.
+        self._check_writable()
+        self.metrics.inc("feedback_events")
+        with self.metrics.timer("feedback.total"):
+            # 1. Update in-memory
+            with self.metrics.timer("feedback.append"), self._ratings_lock:
+                # A window runs on the dataset's clock, so historical data doesn't jump to today
+                now = self.stream.clock() if self.stream is not None else pd.Timestamp.now().timestamp()
+                new_row = {'userId': user_id, 'movieId': movie_id, 'rating': rating, 'timestamp': int(now)}
+                self.ratings = pd.concat([self.ratings, pd.DataFrame([new_row], index=[self._n_ratings])])
+                self._n_ratings += 1
+                if self.stream is not None:
+                    self.stream.add(user_id, movie_id, rating, new_row['timestamp'])
+                if self.rec_table is not None:
+                    self._table_stale_users.add(user_id)
+
+            # 2. Update file (append mode would be faster but for safety we rewrite or append)
+            # We'll just append to the csv
+            if self.ratings_file is not None:
+                with self.metrics.timer("feedback.persist"):
+                    pd.DataFrame([new_row]).to_csv(self.ratings_file, mode='a', header=False, index=False)
+
+            print(f"Feedback added: User {user_id} -> Item {movie_id} ({rating}*)")
+            self._user_changed(user_id)
+
+            # 3. Retrain
+            if self.background_training:
+                self._retrainer.request()
+            else:
+                with self.metrics.timer("feedback.retrain"):
+                    self._retrain_collab()
+
+    SESSION_USERS = 10000           # sessions kept (least recently active evicted first)
+    SESSION_TTL = 1800.0            # seconds a session survives without new events
+    SESSION_NEUTRAL = 3.0           # ratings above pull the collab vector towards an item, below push away
+    SESSION_DISLIKE_PENALTY = 0.5   # content score removed per unit similarity to a recent dislike
+
+    def add_session_event(self, user_id, movie_id, rating):
         """
-        # Case-insensitive search
-        mask = self.movies['title'].str.contains(query, case=False, na=False) | \
-               self.movies['genres'].str.contains(query, case=False, na=False) | \
-               self.movies['description'].str.contains(query, case=False, na=False)
-        
-        results = self.movies[mask].head(n)
-        
-        # Format output
-        output = []
-        for mid, row in results.iterrows():
-            output.append({
-                'movieId': mid,
-                'title': row['title'],
-                'genres': row['genres'],
-                'score': 1.0, # Dummy score for search match
-                'reason': f"Matched search query: '{query}'"
-            })
-        return output
+        Records an in-session rating that re-ranks the user's next
+        recommendations immediately: the item is filtered out, the collab
+        vector is folded in and dislikes demote similar items. Nothing is
+        persisted or retrained (also works on read-only engines); use
+        add_feedback for that.
+        """
+        self.metrics.inc("session_events")
+        with self._ratings_lock:
+            session = self._sessions.get(user_id) or ()
+            self._sessions.set(user_id, session + ((movie_id, float(rating)),))
+            if self.rec_table is not None:
+                self._table_stale_users.add(user_id)
+        self._user_changed(user_id)
+
+    def clear_session(self, user_id):
+        """Drops a user's session events."""
+        self._sessions.set(user_id, ())
+        self._user_changed(user_id)
+
+    def on_user_change(self, listener):
+        """
+        Calls listener(user_id) after every add_feedback, add_session_event
+        and clear_session, so caches of results derived from recommend()
+        (e.g. the agent's tool cache) can drop that user's entries.
+        """
+        if listener not in self._user_listeners:
+            self._user_listeners.append(listener)
+
+    def user_generation(self, user_id):
+        """
+        Changes on every add_feedback, add_session_event and clear_session
+        for the user. Caches read it before computing and put it in the
+        key, so a result that raced with a change is never served after it.
+        """
+        return self._user_generations.get(user_id, 0)
+
+    def _user_changed(self, user_id):
+        self._user_generations[user_id] = next(self._generation_counter)
+        self._rec_cache.invalidate_tag(user_id)
+        for listener in self._user_listeners:
+            listener(user_id)
+
+    SEARCH_MODES = ("lexical", "semantic", "hybrid")
+    RRF_K = 60              # reciprocal rank fusion damping constant
+    SEMANTIC_TIMEOUT = 5.0  # seconds to wait for the vector store in hybrid mode
+
+    def search_items(self, query: str, n: int = 5, mode: str = None) -> list:
+        """
+        Search items by text. Returns a list of ScoredItem records
+        ('movieId', 'title', 'genres', 'score', 'reason').
+
+        mode:
+            'lexical'  - substring match on title/genres/description, scored
+                         by which fields matched
+            'semantic' - nearest neighbours of the query embedding in the
+                         vector store; score is cosine similarity
+            'hybrid'   - both at once (the vector query runs on a worker
+                         thread while the lexical match runs here), fused by
+                         reciprocal rank fusion; score is the RRF score
+                         scaled so 1.0 means ranked first by both
+        Default: 'hybrid' when a vector store is attached, else 'lexical'.
+        Semantic failures fall back to the lexical results.
+        """
+        mode = mode or ("hybrid" if self.vector_store is not None else "lexical")
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}; expected one of {self.SEARCH_MODES}")
+        if mode != "lexical" and self.vector_store is None:
+            raise ValueError(f"Search mode {mode!r} needs a vector_store")
+
+        self.metrics.inc("search_requests")
+        with self.metrics.timer("search.total"):
+            if mode == "lexical":
+                with self.metrics.timer("search.match"):
+                    idx, scores = self._lexical_search(query, n)
+                return records(self.catalog, idx, scores, reason=f"Matched search query: '{query}'")
+
+            pool = max(n * 3, 20)
+            if mode == "semantic":
+                semantic = self._semantic_or_none(query, pool)
+                if semantic is None:
+                    idx, scores = self._lexical_search(query, n)
+                    return records(self.catalog, idx, scores, reason=f"Matched search query: '{query}'")
+                idx, scores = semantic
+                return records(self.catalog, idx[:n], scores[:n], reason=f"Semantically similar to '{query}'")
+
+            future = self._search_pool().submit(self._semantic_search, query, pool)
+            with self.metrics.timer("search.match"):
+                lex_idx, lex_scores = self._lexical_search(query, pool)
+            semantic = self._semantic_or_none(query, pool, future)
+            if semantic is None:
+                return records(self.catalog, lex_idx[:n], lex_scores[:n], reason=f"Matched search query: '{query}'")
+
+            with self.metrics.timer("search.fuse"):
+                sem_idx = semantic[0]
+                fused = {}
+                for ranking in (lex_idx, sem_idx):
+                    for rank, i in enumerate(ranking):
+                        fused[int(i)] = fused.get(int(i), 0.0) + 1.0 / (self.RRF_K + rank + 1)
+                idx = np.array(sorted(fused, key=fused.get, reverse=True)[:n], dtype=np.int64)
+                scores = np.array([fused[i] for i in idx]) * (self.RRF_K + 1) / 2.0
+                lexical, semantic_set = set(lex_idx.tolist()), set(sem_idx.tolist())
+                reasons = []
+                for i in idx.tolist():
+                    if i in lexical and i in semantic_set:
+                        reasons.append(f"Matched and semantically similar to '{query}'")
+                    elif i in lexical:
+                        reasons.append(f"Matched search query: '{query}'")
+                    else:
+                        reasons.append(f"Semantically similar to '{query}'")
+            return records(self.catalog, idx, scores, reasons=reasons)
+
+    def _lexical_search(self, query, k):
+        """(catalog rows, scores) of items containing the query, best first."""
+        fields = (('title', 0.5), ('genres', 0.3), ('description', 0.2))
+        scores = np.zeros(len(self.movies))
+        for column, weight in fields:
+            if column in self.movies:
+                scores += weight * self.movies[column].str.contains(query, case=False, na=False, regex=False).to_numpy()
+        hits = np.flatnonzero(scores > 0)
+        hits = hits[np.argsort(-scores[hits], kind="stable")][:k]
+        return self.catalog.index_of(self.movies.index.to_numpy()[hits]), scores[hits]
+
+    def _semantic_search(self, query, k):
+        """(catalog rows, cosine similarities) of the vector store's nearest items."""
+        with self.metrics.timer("search.semantic"):
+            ids, distances, _ = self.vector_store.search_similar_movies(query, n_results=k)
+            idx = self.catalog.index_of(ids)
+            keep = idx >= 0
+            return idx[keep], 1.0 - np.asarray(distances, dtype=np.float64)[keep]
+
+    def _semantic_or_none(self, query, k, future=None):
+        try:
+            if future is None:
+                return self._semantic_search(query, k)
+            return future.result(timeout=self.SEMANTIC_TIMEOUT)
+        except Exception as e:
+            self.metrics.inc("search_semantic_errors")
+            print(f"Semantic search failed, using lexical results: {e!r}")
+            return None
 
+    def _search_pool(self):
+        if self._search_executor is None:
+            with self._search_executor_lock:
+                if self._search_executor is None:
+                    self._search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="semantic-search")
+        return self._search_executor
 
 if __name__ == "__main__":
     engine = RecommenderEngine()
@@ -0,0 +1,425 @@
+"""
+Standalone asyncio HTTP service around RecommenderEngine.
+
+Endpoints (JSON in, JSON out):
+    GET  /health
+    GET  /recommend?user_id=1&n=10&weight_content=0.5&weight_collab=0.5&diversity=0
+    POST /recommend/batch      {"user_ids": [1, 2], "n": 10, ...}
+    GET  /popular?n=10
+    GET  /search?q=action&n=5&mode=hybrid
+    GET  /similar?movie_id=1&n=10
+    POST /feedback             {"user_id": 1, "movie_id": 2, "rating": 5.0}
+    GET  /metrics              (Prometheus text)
+
+Scoring runs on a thread pool so the event loop only parses and routes.
+Single-user recommend requests that arrive within `batch_window_ms` of each
+other are grouped and scored with one RecommenderEngine.recommend_batch
+call. At most `max_in_flight` requests are admitted; the rest get 503.
+
+Run with:
+    python -m src.service --host 0.0.0.0 --port 8080
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import traceback
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .recommender import RecommenderEngine
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_USERS = 1000
+MAX_N = 100
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-user recommend calls into recommend_batch calls.
+
+    Requests are bucketed by their scoring parameters; a bucket is flushed
+    when it reaches max_batch_size or window_s after its first request.
+    """
+
+    def __init__(self, engine: RecommenderEngine, executor: Executor,
+                 window_s: float = 0.003, max_batch_size: int = 64):
+        self.engine = engine
+        self.executor = executor
+        self.window_s = window_s
+        self.max_batch_size = max_batch_size
+        self._buckets: Dict[tuple, List[Tuple[object, asyncio.Future]]] = {}
+        self.batches = 0
+        self.batched_requests = 0
+
+    async def recommend(self, user_id, params: tuple):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        bucket = self._buckets.get(params)
+        if bucket is None:
+            bucket = self._buckets[params] = []
+            loop.call_later(self.window_s, self._flush, params, bucket)
+        bucket.append((user_id, fut))
+        if len(bucket) >= self.max_batch_size:
+            self._flush(params, bucket)
+        return await fut
+
+    def _flush(self, params: tuple, bucket: list):
+        # The timer may fire for a bucket that was already flushed by size
+        if self._buckets.get(params) is not bucket:
+            return
+        del self._buckets[params]
+        asyncio.ensure_future(self._run(params, bucket))
+
+    async def _run(self, params: tuple, bucket: list):
+        self.batches += 1
+        self.batched_requests += len(bucket)
+        n, weight_content, weight_collab, diversity = params
+        user_ids = [uid for uid, _ in bucket]
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.executor,
+                lambda: self.engine.recommend_batch(user_ids, n=n, weight_content=weight_content,
+                                                    weight_collab=weight_collab, diversity=diversity))
+        except Exception as e:
+            for _, fut in bucket:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(bucket, results):
+            if not fut.done():
+                fut.set_result(result)
+
+
+class RecommendationService:
+    """Routes HTTP requests to a shared engine; usable over TCP or in-process."""
+
+    def __init__(
+        self,
+        engine: Optional[RecommenderEngine] = None,
+        max_workers: int = 4,
+        batch_window_ms: float = 3.0,
+        max_batch_size: int = 64,
+        max_in_flight: int = 256,
+        executor: Optional[Executor] = None,
+    ):
+        """
+        Args:
+            engine: Engine to serve (default: a new RecommenderEngine())
+            max_workers: Threads for CPU-bound scoring when no executor is given
+            batch_window_ms: How long a recommend request waits for batch partners
+            max_batch_size: Flush a batch early once it has this many users
+            max_in_flight: Requests admitted concurrently before answering 503
+            executor: Custom executor for engine calls
+        """
+        self.engine = engine if engine is not None else RecommenderEngine()
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recs-worker")
+        self.batcher = MicroBatcher(self.engine, self.executor, batch_window_ms / 1000.0, max_batch_size)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.rejected = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._routes = {
+            ("GET", "/health"): self._health,
+            ("GET", "/recommend"): self._recommend,
+            ("POST", "/recommend/batch"): self._recommend_batch,
+            ("GET", "/popular"): self._popular,
+            ("GET", "/search"): self._search,
+            ("GET", "/similar"): self._similar,
+            ("POST", "/feedback"): self._feedback,
+            ("GET", "/metrics"): self._metrics,
+        }
+
+    # --- Dispatch ---
+
+    async def dispatch(self, method: str, target: str, body: bytes = b"") -> Tuple[int, object]:
+        """Handle one request; returns (status, payload). Payload is a dict or a str."""
+        url = urlsplit(target)
+        handler = self._routes.get((method.upper(), url.path))
+        if handler is None:
+            known = any(path == url.path for _, path in self._routes)
+            return (405, {"error": "method not allowed"}) if known else (404, {"error": "not found"})
+
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            return 503, {"error": "server busy, retry later"}
+
+        self.in_flight += 1
+        try:
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "request body must be a JSON object")
+            return 200, await handler(query, payload)
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except json.JSONDecodeError:
+            return 400, {"error": "invalid JSON body"}
+        except Exception as e:
+            # Details stay in the server log; clients only learn that the request failed
+            self.engine.metrics.inc("service_errors")
+            print(f"Error handling {method} {url.path}: {e!r}", file=sys.stderr)
+            traceback.print_exc()
+            return 500, {"error": "internal server error"}
+        finally:
+            self.in_flight -= 1
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    # --- Handlers ---
+
+    async def _health(self, query, payload):
+        return {
+            "status": "ok",
+            "model_version": self.engine.model_version,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "batches": self.batcher.batches,
+            "batched_requests": self.batcher.batched_requests,
+            "cache": self.engine.cache_stats(),
+        }
+
+    async def _recommend(self, query, payload):
+        user_id = _int(query, "user_id", required=True)
+        params = _scoring_params(query)
+        recs, method = await self.batcher.recommend(user_id, params)
+        return {"user_id": user_id, "method": method, "items": _items(recs)}
+
+    async def _recommend_batch(self, query, payload):
+        user_ids = payload.get("user_ids")
+        if not isinstance(user_ids, list) or not user_ids:
+            raise HTTPError(400, "user_ids must be a non-empty list")
+        if len(user_ids) > MAX_BATCH_USERS:
+            raise HTTPError(413, f"at most {MAX_BATCH_USERS} user_ids per batch")
+        user_ids = [_as_int(u, "user_ids") for u in user_ids]
+        n, weight_content, weight_collab, diversity = _scoring_params(payload)
+        results = await self._call(self.engine.recommend_batch, user_ids, n=n, weight_content=weight_content,
+                                   weight_collab=weight_collab, diversity=diversity)
+        return {"results": [{"user_id": uid, "method": method, "items": _items(recs)}
+                            for uid, (recs, method) in zip(user_ids, results)]}
+
+    async def _popular(self, query, payload):
+        n = _int(query, "n", default=10, low=1, high=MAX_N)
+        return {"items": _items(await self._call(self.engine.get_popular_items, n))}
+
+    async def _search(self, query, payload):
+        q = query.get("q", "").strip()
+        if not q:
+            raise HTTPError(400, "missing query parameter 'q'")
+        n = _int(query, "n", default=5, low=1, high=MAX_N)
+        mode = query.get("mode")
+        try:
+            items = await self._call(self.engine.search_items, q, n=n, mode=mode)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return {"query": q, "items": _items(items)}
+
+    async def _similar(self, query, payload):
+        movie_id = _int(query, "movie_id", required=True)
+        n = _int(query, "n", default=10, low=1, high=MAX_N)
+        items = await self._call(self.engine.similar_items, movie_id, n=n)
+        if not items and self.engine.catalog.index(movie_id) < 0:
+            raise HTTPError(404, f"unknown movie_id {movie_id}")
+        return {"movie_id": movie_id, "items": _items(items)}
+
+    async def _feedback(self, query, payload):
+        user_id = _as_int(payload.get("user_id"), "user_id")
+        movie_id = _as_int(payload.get("movie_id"), "movie_id")
+        try:
+            rating = float(payload.get("rating"))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "rating must be a number")
+        if not 0.5 <= rating <= 5.0:
+            raise HTTPError(400, "rating must be between 0.5 and 5")
+        await self._call(self.engine.add_feedback, user_id, movie_id, rating)
+        return {"status": "accepted", "model_version": self.engine.model_version}
+
+    async def _metrics(self, query, payload):
+        return self.engine.metrics.to_prometheus()
+
+    # --- TCP server ---
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8080):
+        server = await self.start(host, port)
+        print(f"UniversalRecs service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await _write_response(writer, 400, {"error": "bad request line"}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await _write_response(writer, 400, {"error": "bad content-length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await _write_response(writer, 413, {"error": "body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+                await _write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class InProcessClient:
+    """Test client that calls RecommendationService.dispatch without sockets."""
+
+    def __init__(self, service: RecommendationService):
+        self.service = service
+
+    async def get(self, target: str) -> Tuple[int, object]:
+        return await self.service.dispatch("GET", target)
+
+    async def post(self, target: str, payload: dict) -> Tuple[int, object]:
+        return await self.service.dispatch("POST", target, json.dumps(payload).encode())
+
+
+# --- Helpers ---
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+async def _write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), "text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload).encode(), "application/json"
+    head = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == 503:
+        head.append("Retry-After: 1")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+def _items(recs) -> List[dict]:
+    return [r.to_dict() for r in recs]
+
+
+def _as_int(value, name: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be an integer")
+
+
+def _int(params: dict, name: str, default: Optional[int] = None, required: bool = False,
+         low: Optional[int] = None, high: Optional[int] = None) -> int:
+    """Integer parameter `name`; outside [low, high] (either bound optional) is a 400."""
+    if name not in params:
+        if required:
+            raise HTTPError(400, f"missing parameter '{name}'")
+        return default
+    value = _as_int(params[name], name)
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise HTTPError(400, f"{name} must be between {low} and {high}")
+    return value
+
+
+def _float(params: dict, name: str, default: float, low: Optional[float] = None,
+           high: Optional[float] = None) -> float:
+    """Finite float parameter `name`; outside [low, high] (either bound optional) is a 400."""
+    try:
+        value = float(params.get(name, default))
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{name} must be a number")
+    if not math.isfinite(value):
+        raise HTTPError(400, f"{name} must be a finite number")
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise HTTPError(400, f"{name} must be between {low} and {high}")
+    return value
+
+
+def _scoring_params(params: dict) -> tuple:
+    weight_content = _float(params, "weight_content", 0.5)
+    return (
+        _int(params, "n", default=10, low=1, high=MAX_N),
+        weight_content,
+        _float(params, "weight_collab", 1.0 - weight_content),
+        _float(params, "diversity", 0.0, low=0.0, high=1.0),
+    )
+
+
+def main():
+    """Parse arguments and serve."""
+    parser = argparse.ArgumentParser(description="UniversalRecs HTTP recommendation service")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port (default: 8080)')
+    parser.add_argument('--workers', type=int, default=4, help='Scoring threads (default: 4)')
+    parser.add_argument('--batch-window-ms', type=float, default=3.0,
+                        help='Micro-batching window for /recommend (default: 3)')
+    parser.add_argument('--max-in-flight', type=int, default=256,
+                        help='Concurrent requests before answering 503 (default: 256)')
+    parser.add_argument('--data-dir', type=str, default=None, help='Dataset directory (default: data/)')
+    args = parser.parse_args()
+
+    service = RecommendationService(
+        engine=RecommenderEngine(data_dir=args.data_dir),
+        max_workers=args.workers,
+        batch_window_ms=args.batch_window_ms,
+        max_in_flight=args.max_in_flight,
+    )
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+
+
+if __name__ == "__main__":
+    main()
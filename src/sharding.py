@@ -0,0 +1,429 @@
+"""
+Sharded serving: the catalog split into item partitions, one process each.
+
+publish_shards() splits a trained engine's model by movieId (contiguous
+ranges or movieId % n_shards). Each shard directory holds, for its own
+items only, their content-similarity columns (items x catalog; kept
+sparse when the engine stores top-K similarities) and collab factor
+columns. The coordinator directory keeps the user side: catalog, rating
+history, user factors and popularity.
+
+Only the item side is partitioned. The coordinator still loads the whole
+catalog, every user's history and factors and movies.csv, and
+publish_shards needs the full trained model in one process. Sharding
+therefore spreads similarity and item-factor memory and the scoring
+work across processes; it does not let the dataset outgrow one machine's
+training or the coordinator's user-side memory.
+
+ShardedEngine is a read-only RecommenderEngine over the coordinator
+data that runs one worker process per shard. recommend() is a
+scatter-gather in two rounds:
+
+    1. every shard scores its items for the user and returns its max
+       content and collab score (the fusion normalises by global maxima)
+    2. every shard fuses with the global maxima and returns its top-k,
+       which the coordinator merges
+
+Both rounds run on all shards concurrently, and each shard caches its
+round-1 scores for round 2. recommend_batch sends each round for all of
+its users to every shard in one call. Results match an unsharded engine. The one
+exception is that MIPS collab indexes are not used; each shard scores its
+items exhaustively.
+
+Usage:
+    publish_shards(engine, "/dev/shm/universalrecs_shards", n_shards=4)
+    with ShardedEngine.open("/dev/shm/universalrecs_shards") as sharded:
+        recs, method = sharded.recommend(42, n=10)
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .catalog import ItemCatalog, records
+from .model import RecommenderModel, UserHistory
+from .memory import dense
+from .profiling import SlowCallProfiler
+from .recommender import RecommenderEngine
+
+MANIFEST_FILE = "manifest.json"
+MOVIES_FILE = "movies.csv"
+PARTITIONS = ("range", "hash")
+
+
+def partition_rows(movie_ids: np.ndarray, n_shards: int, partition: str = "range") -> List[np.ndarray]:
+    """Catalog rows of each shard, ascending."""
+    if partition == "hash":
+        return [np.flatnonzero(movie_ids % n_shards == s) for s in range(n_shards)]
+    if partition == "range":
+        order = np.argsort(movie_ids, kind="stable")
+        return [np.sort(chunk) for chunk in np.array_split(order, n_shards)]
+    raise ValueError(f"Unknown partition {partition!r}; expected one of {PARTITIONS}")
+
+
+def publish_shards(engine: RecommenderEngine, path: str, n_shards: int, partition: str = "range") -> str:
+    """
+    Write the engine's current model to `path` as a coordinator directory
+    plus one directory per shard (replaced atomically if it exists).
+
+    Returns:
+        path
+    """
+    model, catalog = engine.model, engine.catalog
+    shard_rows = partition_rows(catalog.ids, n_shards, partition)
+
+    # Catalog row -> collab factor column (-1 for items nobody rated)
+    col_of_row = np.full(len(catalog), -1, dtype=np.int64)
+    valid = model.collab_item_idx >= 0
+    col_of_row[model.collab_item_idx[valid]] = np.flatnonzero(valid)
+
+    tmp = f"{path.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    coordinator = os.path.join(tmp, "coordinator")
+    os.makedirs(coordinator)
+    arrays = {f"catalog_{k}": v for k, v in catalog.to_arrays().items()}
+    arrays.update({
+        "collab_user_ids": model.collab_user_ids,
+        "history_user_ids": model.history.user_ids,
+        "history_indptr": model.history.indptr,
+        "history_movie_ids": model.history.movie_ids,
+        "history_ratings": model.history.ratings,
+        "popular_idx": model.popular_idx,
+        "popular_scores": model.popular_scores,
+    })
+    if model.collab_user_factors is not None:
+        arrays["collab_user_factors"] = model.collab_user_factors
+    for key, arr in arrays.items():
+        np.save(os.path.join(coordinator, f"{key}.npy"), np.ascontiguousarray(arr), allow_pickle=False)
+    engine.movies.reset_index().to_csv(os.path.join(coordinator, MOVIES_FILE), index=False)
+
+    for s, rows in enumerate(shard_rows):
+        shard_dir = os.path.join(tmp, f"shard_{s}")
+        os.makedirs(shard_dir)
+        # Column t of the similarity matrix is stored as row t: scores of a shard's items are row gathers
+        shard_arrays = {"rows": rows}
+        sim = model.content_sim_matrix
+        if sp.issparse(sim):
+            # Top-K similarities stay sparse; column-major, so gathering liked items' columns is cheap
+            block = sp.csc_matrix(sim[:, rows].T)
+            shard_arrays.update({"sim_data": block.data, "sim_indices": block.indices,
+                                 "sim_indptr": block.indptr, "sim_shape": np.array(block.shape)})
+        else:
+            shard_arrays["sim"] = np.asarray(sim[:, rows]).T
+        if model.collab_item_factors is not None:
+            cols = col_of_row[rows]
+            factors = np.zeros((model.collab_item_factors.shape[0], len(rows)), dtype=model.collab_item_factors.dtype)
+            factors[:, cols >= 0] = model.collab_item_factors[:, cols[cols >= 0]]
+            shard_arrays.update({"item_factors": factors, "has_factors": cols >= 0})
+        for key, arr in shard_arrays.items():
+            np.save(os.path.join(shard_dir, f"{key}.npy"), np.ascontiguousarray(arr), allow_pickle=False)
+
+    manifest = {
+        "version": model.version,
+        "n_ratings": model.n_ratings,
+        "n_shards": n_shards,
+        "partition": partition,
+        "genre_table": catalog.genre_table,
+        "coordinator_arrays": sorted(arrays),
+    }
+    with open(os.path.join(tmp, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+    if os.path.exists(path):
+        old = f"{path.rstrip(os.sep)}.old-{os.getpid()}"
+        os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.rename(tmp, path)
+    return path
+
+
+class Shard:
+    """One partition's arrays and the scoring steps the coordinator calls."""
+
+    MAX_PENDING = 256   # round-1 results kept waiting for their round 2
+
+    def __init__(self, shard_dir: str):
+        load = lambda name: np.load(os.path.join(shard_dir, f"{name}.npy"), mmap_mode="r")
+        self.rows = load("rows")
+        if os.path.exists(os.path.join(shard_dir, "sim.npy")):
+            self.sim = load("sim")
+        else:
+            self.sim = sp.csc_matrix((load("sim_data"), load("sim_indices"), load("sim_indptr")),
+                                     shape=tuple(load("sim_shape")))
+        has_collab = os.path.exists(os.path.join(shard_dir, "item_factors.npy"))
+        self.item_factors = load("item_factors") if has_collab else None
+        self.has_factors = load("has_factors") if has_collab else None
+        self._pending = OrderedDict()
+
+    def _local(self, rows: np.ndarray):
+        """(positions in this shard, mask over rows) of the given catalog rows owned here."""
+        pos = np.searchsorted(self.rows, rows)
+        pos = np.minimum(pos, len(self.rows) - 1)
+        mine = self.rows[pos] == rows if len(self.rows) else np.zeros(len(rows), dtype=bool)
+        return pos[mine], mine
+
+    def fold(self, rows, ratings, neutral):
+        """This shard's part of the session fold-in: sum (r - neutral) * factor of owned items."""
+        pos, mine = self._local(np.asarray(rows, dtype=np.int64))
+        dtype = self.item_factors.dtype
+        delta = np.zeros(self.item_factors.shape[0], dtype=dtype)
+        for p, rating in zip(pos, np.asarray(ratings)[mine]):
+            if self.has_factors[p]:
+                delta += dtype.type(rating - neutral) * self.item_factors[:, p]
+        return delta
+
+    def score(self, token, liked, weights, disliked, user_vector, seen):
+        """Round 1: raw content/collab scores of every owned item; returns (max content, max collab)."""
+        n = len(self.rows)
+        content = np.asarray(self.sim[:, liked] @ weights) if len(liked) else np.zeros(n, dtype=self.sim.dtype)
+        collab = np.zeros(n, dtype=self.sim.dtype if self.item_factors is None else self.item_factors.dtype)
+        if user_vector is not None and self.item_factors is not None:
+            collab[self.has_factors] = (user_vector @ self.item_factors)[self.has_factors]
+        penalty = dense(self.sim[:, disliked]).max(axis=1) if len(disliked) else None
+        candidates = np.ones(n, dtype=bool)
+        candidates[self._local(np.asarray(seen, dtype=np.int64))[0]] = False
+        self._pending[token] = (content, collab, penalty, candidates)
+        while len(self._pending) > self.MAX_PENDING:
+            self._pending.popitem(last=False)
+        max_content = content.max() if n else 0.0
+        max_collab = collab[self.has_factors].max() if n and user_vector is not None and self.has_factors.any() else 0.0
+        return float(max_content), float(max_collab)
+
+    def top(self, token, max_content, max_collab, weight_content, weight_collab, penalty_weight, k, liked):
+        """
+        Round 2: fuse with the global maxima and return this shard's top k as
+        (rows, scores, s_content, s_collab, explanation source rows).
+        """
+        content, collab, penalty, candidates = self._pending.pop(token)
+        final, s_content, s_collab = RecommenderEngine._fuse(content, collab, max_content, max_collab,
+                                                             weight_content, weight_collab, penalty, penalty_weight)
+        local = RecommenderEngine._top_k(np.flatnonzero(candidates), final[candidates], k)
+        sources = (np.asarray(liked)[dense(self.sim[local][:, liked]).argmax(axis=1)] if len(liked)
+                   else np.full(len(local), -1))
+        return self.rows[local], final[local], s_content[local], s_collab[local], sources
+
+    def sim_columns(self, pool):
+        """(owned rows of pool, sim[pool, owned]) for building an MMR similarity block."""
+        pool = np.asarray(pool, dtype=np.int64)
+        pos, mine = self._local(pool)
+        return np.flatnonzero(mine), dense(self.sim[pos][:, pool])
+
+    def similar(self, row, n):
+        """This shard's n items most similar to a catalog row (excluding it)."""
+        sims = dense(self.sim[:, [row]]).ravel()
+        candidates = np.flatnonzero(self.rows != row)
+        local = RecommenderEngine._top_k(candidates, sims[candidates], n)
+        return self.rows[local], sims[local]
+
+
+# --- Shard worker processes ---
+
+_shard: Optional[Shard] = None
+_shard_name = ""
+# Each worker profiles its own calls (UNIVERSALRECS_PROFILE_DIR); dump names carry the shard and pid
+_shard_profiler = SlowCallProfiler()
+
+
+def _shard_init(shard_dir: str):
+    global _shard, _shard_name, _shard_profiler
+    _shard = Shard(shard_dir)
+    _shard_name = os.path.basename(shard_dir.rstrip(os.sep))
+    _shard_profiler = SlowCallProfiler.from_env()
+
+
+def _shard_call(method: str, calls: list):
+    with _shard_profiler.profile(f"shard_{method}", shard=_shard_name, calls=len(calls)):
+        return [getattr(_shard, method)(*args) for args in calls]
+
+
+class ShardedEngine(RecommenderEngine):
+    """
+    Read-only coordinator over shards written by publish_shards, each
+    served by its own worker process.
+    """
+
+    @classmethod
+    def open(cls, path: str, start_method: Optional[str] = None, **engine_kwargs) -> "ShardedEngine":
+        """
+        Args:
+            path: Directory written by publish_shards
+            start_method: multiprocessing start method (default: platform default)
+            engine_kwargs: from_snapshot arguments (metrics, cache_size, cache_ttl, vector_store)
+        """
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        coordinator = os.path.join(path, "coordinator")
+        arrays = {key: np.load(os.path.join(coordinator, f"{key}.npy"), mmap_mode="r")
+                  for key in manifest["coordinator_arrays"]}
+        catalog = ItemCatalog.from_arrays(
+            {k[len("catalog_"):]: v for k, v in arrays.items() if k.startswith("catalog_")},
+            manifest["genre_table"],
+        )
+        # The item side (similarities, item factors) lives in the shards
+        model = RecommenderModel(
+            version=manifest["version"],
+            content_sim_matrix=None,
+            user_item_matrix=None,
+            collab_user_ids=arrays["collab_user_ids"],
+            collab_user_factors=arrays.get("collab_user_factors"),
+            collab_item_factors=None,
+            collab_item_idx=None,
+            history=UserHistory(arrays["history_user_ids"], arrays["history_indptr"],
+                                arrays["history_movie_ids"], arrays["history_ratings"]),
+            popular_idx=arrays["popular_idx"],
+            popular_scores=arrays["popular_scores"],
+            n_ratings=manifest["n_ratings"],
+        )
+        movies = pd.read_csv(os.path.join(coordinator, MOVIES_FILE)).set_index("movieId")
+        engine = cls.from_snapshot(movies, catalog, model, **engine_kwargs)
+        engine.manifest = manifest
+        ctx = multiprocessing.get_context(start_method)
+        engine._shards = [ctx.Pool(1, initializer=_shard_init, initargs=(os.path.join(path, f"shard_{s}"),))
+                          for s in range(manifest["n_shards"])]
+        engine._tokens = itertools.count()
+        return engine
+
+    @property
+    def n_shards(self) -> int:
+        return len(self._shards)
+
+    def _scatter(self, method: str, *args) -> List:
+        """Calls method on every shard concurrently; results in shard order."""
+        return [results[0] for results in self._scatter_many(method, [args])]
+
+    def _scatter_many(self, method: str, calls: List[tuple]) -> List[List]:
+        """
+        Calls method once per argument tuple on every shard, sending each
+        shard all of its calls in one message. Returns results[shard][call].
+        """
+        futures = [pool.apply_async(_shard_call, (method, calls)) for pool in self._shards]
+        return [f.get() for f in futures]
+
+    def similar_items(self, movie_id, n=10):
+        idx = self.catalog.index(movie_id)
+        if idx < 0:
+            return []
+        with self.profiler.profile("similar_items", movie=movie_id):
+            parts = self._scatter("similar", idx, n)
+            rows = np.concatenate([p[0] for p in parts])
+            sims = np.concatenate([p[1] for p in parts])
+            order = self._top_k(np.arange(len(rows)), sims, n)
+            return records(self.catalog, rows[order], sims[order], reason=f"Similar to {self.catalog.title(idx)}")
+
+    def _recommend_uncached(self, model, user_id, n, weight_content, weight_collab, diversity,
+                            predicted_ratings=None):
+        return self._recommend_many(model, [user_id], n, weight_content, weight_collab, diversity)[0]
+
+    def _recommend_many(self, model, user_ids, n, weight_content, weight_collab, diversity):
+        """
+        Scores users through the shards, at most Shard.MAX_PENDING at a time
+        so no round-1 result is evicted before its round 2 runs.
+        """
+        results = []
+        for start in range(0, len(user_ids), Shard.MAX_PENDING):
+            results.extend(self._recommend_chunk(model, user_ids[start:start + Shard.MAX_PENDING], n,
+                                                 weight_content, weight_collab, diversity))
+        return results
+
+    def _recommend_chunk(self, model, user_ids, n, weight_content, weight_collab, diversity):
+        """
+        Scores up to Shard.MAX_PENDING users. Each step (session fold-in,
+        round 1, round 2, MMR similarities) is one scatter for all of them.
+        """
+        metrics = self.metrics
+        catalog = self.catalog
+        results = [None] * len(user_ids)
+        with metrics.timer("recommend.total"):
+            users = []   # (position, history_ids, history_ratings, n_recent) of users with a history
+            for pos, user_id in enumerate(user_ids):
+                with metrics.timer("recommend.user_lookup"):
+                    history_ids, history_ratings, n_recent = self._user_history(model, self.ratings, user_id)
+                if len(history_ids) == 0:
+                    metrics.inc("recommend_cold_start")
+                    results[pos] = (self.get_popular_items(n), "Popularity (New User)")
+                else:
+                    users.append((pos, history_ids, history_ratings, n_recent))
+            if not users:
+                return results
+
+            user_vectors = [None] * len(users)
+            if model.collab_user_factors is not None:
+                folding = [i for i, (_, _, _, n_recent) in enumerate(users) if n_recent]
+                if folding:
+                    with metrics.timer("recommend.session"):
+                        deltas = self._scatter_many("fold", [
+                            (catalog.index_of(users[i][1][-users[i][3]:]), users[i][2][-users[i][3]:],
+                             self.SESSION_NEUTRAL) for i in folding])
+                        for j, i in enumerate(folding):
+                            user_vectors[i] = sum(shard[j] for shard in deltas)
+                for i, (pos, _, _, _) in enumerate(users):
+                    user_idx = model.collab_row(user_ids[pos])
+                    if user_idx >= 0:
+                        base = np.asarray(model.collab_user_factors[user_idx])
+                        user_vectors[i] = base if user_vectors[i] is None else base + user_vectors[i]
+
+            round1, likes = [], []
+            for i, (pos, history_ids, history_ratings, n_recent) in enumerate(users):
+                liked = self._content_profile_rows(history_ids, history_ratings)
+                seen = catalog.index_of(history_ids)
+                token = (os.getpid(), next(self._tokens))
+                likes.append(liked)
+                round1.append((token, liked, self._recency_weights(len(liked), self.dtype),
+                               self._recent_dislikes(history_ids, history_ratings, n_recent), user_vectors[i],
+                               seen[seen >= 0]))
+            with metrics.timer("recommend.shard_score"):
+                maxima = self._scatter_many("score", round1)
+
+            k = self._pool_size(n, diversity)
+            round2 = [(round1[i][0], max(shard[i][0] for shard in maxima), max(shard[i][1] for shard in maxima),
+                       weight_content, weight_collab, weight_content * self.SESSION_DISLIKE_PENALTY, k, likes[i])
+                      for i in range(len(users))]
+            with metrics.timer("recommend.shard_top"):
+                parts = self._scatter_many("top", round2)
+
+            merged = []
+            for i in range(len(users)):
+                rows, scores, s_content, s_collab, sources = (
+                    np.concatenate([shard[i][field] for shard in parts]) for field in range(5))
+                merged.append((rows, scores, s_content, s_collab, sources,
+                               self._top_k(np.arange(len(rows)), scores, k)))
+
+            if diversity > 0.0:
+                with metrics.timer("recommend.mmr"):
+                    blocks = self._scatter_many("sim_columns", [(rows[top],) for rows, *_, top in merged])
+                    for i, (rows, scores, s_content, s_collab, sources, top) in enumerate(merged):
+                        block = np.zeros((len(top), len(top)), dtype=scores.dtype)
+                        for shard in blocks:
+                            owned, sims = shard[i]
+                            block[:, owned] = sims.T
+                        picked = self._mmr_rerank(np.arange(len(top)), scores[top], n, diversity, block)
+                        merged[i] = (rows, scores, s_content, s_collab, sources, top[picked])
+
+            with metrics.timer("recommend.build"):
+                for (pos, *_), (rows, scores, s_content, s_collab, sources, top) in zip(users, merged):
+                    reasons = self._explain(s_content[top], s_collab[top], sources[top])
+                    results[pos] = (records(catalog, rows[top], scores[top], reasons), self._method_name(diversity))
+        return results
+
+    def close(self):
+        for pool in self._shards:
+            pool.terminate()
+            pool.join()
+        self._shards = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
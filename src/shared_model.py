@@ -0,0 +1,282 @@
+"""
+Multi-process serving: share one trained model between worker processes.
+
+The loader process (the one that trains and takes feedback) publishes its
+current model as .npy files plus a manifest into a directory. Worker
+processes attach with numpy memory-mapping, so the arrays are backed by the
+OS page cache and every worker on the machine shares the same physical
+pages. Publishing writes a fresh versioned sub-directory and then swaps the
+CURRENT pointer file atomically; workers pick up the new version on their
+next request.
+
+Usage:
+    # loader
+    engine = RecommenderEngine()
+    publish_model(engine, "/dev/shm/universalrecs")
+
+    # workers, one per core
+    with SharedModelPool("/dev/shm/universalrecs", processes=os.cpu_count()) as pool:
+        recs, method = pool.recommend(42, n=10)
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .catalog import ItemCatalog
+from .mips import MIPSIndex
+from .model import RecommenderModel, UserHistory
+from .recommender import RecommenderEngine
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+MOVIES_FILE = "movies.csv"
+
+
+def publish_model(engine: RecommenderEngine, path: str, keep: int = 2) -> str:
+    """
+    Write the engine's current model under `path` and make it CURRENT.
+
+    Args:
+        engine: Trained engine to publish
+        path: Publish root, ideally on tmpfs (e.g. /dev/shm/...)
+        keep: Number of published versions to retain; older ones are removed
+
+    Returns:
+        The directory the model was written to
+    """
+    model = engine.model
+    catalog = engine.catalog
+    os.makedirs(path, exist_ok=True)
+
+    name = f"v{model.version:06d}-{uuid.uuid4().hex[:8]}"
+    target = os.path.join(path, name)
+    tmp = target + ".tmp"
+    os.makedirs(tmp)
+
+    arrays: Dict[str, np.ndarray] = {f"catalog_{k}": v for k, v in catalog.to_arrays().items()}
+    if sp.issparse(model.content_sim_matrix):
+        # Top-K similarities (memory.py): the CSR parts, reassembled over the mapped arrays on attach
+        sim = model.content_sim_matrix
+        arrays.update({"content_sim_data": sim.data, "content_sim_indices": sim.indices, "content_sim_indptr": sim.indptr})
+    else:
+        arrays["content_sim_matrix"] = model.content_sim_matrix
+    arrays.update({
+        "collab_user_ids": model.collab_user_ids,
+        "collab_item_idx": model.collab_item_idx,
+        "history_user_ids": model.history.user_ids,
+        "history_indptr": model.history.indptr,
+        "history_movie_ids": model.history.movie_ids,
+        "history_ratings": model.history.ratings,
+        "popular_idx": model.popular_idx,
+        "popular_scores": model.popular_scores,
+    })
+    if model.collab_user_factors is not None:
+        arrays["collab_user_factors"] = model.collab_user_factors
+        arrays["collab_item_factors"] = model.collab_item_factors
+    if model.collab_index is not None:
+        arrays.update({f"mips_{k}": v for k, v in model.collab_index.to_arrays().items()})
+
+    for key, arr in arrays.items():
+        np.save(os.path.join(tmp, f"{key}.npy"), np.ascontiguousarray(arr), allow_pickle=False)
+
+    # Search still runs over the movies frame; it is small next to the model arrays
+    engine.movies.reset_index().to_csv(os.path.join(tmp, MOVIES_FILE), index=False)
+
+    manifest = {
+        "version": model.version,
+        "n_ratings": model.n_ratings,
+        "arrays": sorted(arrays),
+        "genre_table": catalog.genre_table,
+        "mips_nprobe": model.collab_index.nprobe if model.collab_index is not None else None,
+        "collab_candidates": engine.collab_candidates,
+        "published_at": time.time(),
+    }
+    with open(os.path.join(tmp, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+    os.rename(tmp, target)
+    _write_atomic(os.path.join(path, CURRENT_FILE), name)
+    _prune(path, keep, current=name)
+    return target
+
+
+def current_version_dir(path: str) -> str:
+    """Directory of the currently published model."""
+    with open(os.path.join(path, CURRENT_FILE)) as f:
+        return os.path.join(path, f.read().strip())
+
+
+def attach_engine(path: str, **engine_kwargs) -> RecommenderEngine:
+    """
+    Build a read-only RecommenderEngine over the CURRENT model in `path`.
+
+    Arrays are opened with mmap_mode='r': nothing is copied into the
+    process, and writes raise.
+    """
+    model_dir = current_version_dir(path)
+    with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    arrays = {key: np.load(os.path.join(model_dir, f"{key}.npy"), mmap_mode="r")
+              for key in manifest["arrays"]}
+
+    catalog = ItemCatalog.from_arrays(
+        {k[len("catalog_"):]: v for k, v in arrays.items() if k.startswith("catalog_")},
+        manifest["genre_table"],
+    )
+    content_sim_matrix = arrays.get("content_sim_matrix")
+    if content_sim_matrix is None:
+        content_sim_matrix = sp.csr_matrix(
+            (arrays["content_sim_data"], arrays["content_sim_indices"], arrays["content_sim_indptr"]),
+            shape=(len(catalog), len(catalog)))
+    model = RecommenderModel(
+        version=manifest["version"],
+        content_sim_matrix=content_sim_matrix,
+        user_item_matrix=None,
+        collab_user_ids=arrays["collab_user_ids"],
+        collab_user_factors=arrays.get("collab_user_factors"),
+        collab_item_factors=arrays.get("collab_item_factors"),
+        collab_item_idx=arrays["collab_item_idx"],
+        history=UserHistory(arrays["history_user_ids"], arrays["history_indptr"],
+                            arrays["history_movie_ids"], arrays["history_ratings"]),
+        popular_idx=arrays["popular_idx"],
+        popular_scores=arrays["popular_scores"],
+        n_ratings=manifest["n_ratings"],
+        collab_index=MIPSIndex.from_arrays(
+            {k[len("mips_"):]: v for k, v in arrays.items() if k.startswith("mips_")}, manifest["mips_nprobe"]
+        ) if manifest.get("mips_nprobe") is not None else None,
+    )
+    movies = pd.read_csv(os.path.join(model_dir, MOVIES_FILE)).set_index("movieId")
+    engine = RecommenderEngine.from_snapshot(movies, catalog, model, **engine_kwargs)
+    engine.snapshot_dir = model_dir
+    engine.collab_candidates = manifest.get("collab_candidates", engine.collab_candidates)
+    return engine
+
+
+# --- Worker pool ---
+
+_worker_engine: Optional[RecommenderEngine] = None
+_worker_path: Optional[str] = None
+_worker_checked_at = 0.0
+_RELOAD_CHECK_INTERVAL = 1.0  # seconds between CURRENT checks in a worker
+
+
+def _worker_init(path: str):
+    global _worker_engine, _worker_path, _worker_checked_at
+    _worker_path = path
+    _worker_engine = attach_engine(path)
+    _worker_checked_at = time.monotonic()
+
+
+def _worker_engine_current() -> RecommenderEngine:
+    """The worker's engine, re-attached if a newer model has been published."""
+    global _worker_engine, _worker_checked_at
+    now = time.monotonic()
+    if now - _worker_checked_at >= _RELOAD_CHECK_INTERVAL:
+        _worker_checked_at = now
+        if current_version_dir(_worker_path) != _worker_engine.snapshot_dir:
+            _worker_engine = attach_engine(_worker_path)
+    return _worker_engine
+
+
+def _worker_call(method: str, args: tuple, kwargs: dict):
+    return getattr(_worker_engine_current(), method)(*args, **kwargs)
+
+
+def _worker_recommend_many(user_ids: List, kwargs: dict):
+    engine = _worker_engine_current()
+    return [engine.recommend(uid, **kwargs) for uid in user_ids]
+
+
+class SharedModelPool:
+    """
+    Process pool whose workers each attach to the published model read-only.
+
+    Any read method of RecommenderEngine can be called through `call`;
+    recommend/search/popular have shortcuts.
+    """
+
+    def __init__(self, path: str, processes: Optional[int] = None, start_method: Optional[str] = None):
+        """
+        Args:
+            path: Publish root passed to publish_model
+            processes: Worker count (default: os.cpu_count())
+            start_method: multiprocessing start method (default: platform default)
+        """
+        ctx = multiprocessing.get_context(start_method)
+        self.processes = processes or os.cpu_count() or 1
+        self._pool = ctx.Pool(self.processes, initializer=_worker_init, initargs=(path,))
+
+    def call(self, method: str, *args, **kwargs):
+        return self._pool.apply(_worker_call, (method, args, kwargs))
+
+    def call_async(self, method: str, *args, **kwargs):
+        return self._pool.apply_async(_worker_call, (method, args, kwargs))
+
+    def recommend(self, user_id, **kwargs):
+        return self.call("recommend", user_id, **kwargs)
+
+    def recommend_many(self, user_ids: List, chunk_size: int = 64, **kwargs) -> List:
+        """Recommendations for many users, spread across the workers in chunks."""
+        chunks = [list(user_ids[i:i + chunk_size]) for i in range(0, len(user_ids), chunk_size)]
+        results = self._pool.starmap(_worker_recommend_many, [(c, kwargs) for c in chunks])
+        return [r for chunk in results for r in chunk]
+
+    def search_items(self, query: str, n: int = 5):
+        return self.call("search_items", query, n=n)
+
+    def get_popular_items(self, n: int = 10):
+        return self.call("get_popular_items", n)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.terminate()
+        return False
+
+
+def _write_atomic(path: str, content: str):
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _published_at(version_dir: str) -> float:
+    # Versions restart from 1 in every engine, so names don't order publishes
+    try:
+        with open(os.path.join(version_dir, MANIFEST_FILE)) as f:
+            return json.load(f)["published_at"]
+    except (OSError, ValueError, KeyError):
+        return os.path.getmtime(version_dir)
+
+
+def _prune(path: str, keep: int, current: str):
+    # Workers that still have an older version mapped keep their pages
+    # alive after unlink, so removing directories here is safe.
+    versions = sorted((d for d in os.listdir(path)
+                       if d.startswith("v") and not d.endswith(".tmp") and os.path.isdir(os.path.join(path, d))),
+                      key=lambda d: _published_at(os.path.join(path, d)))
+    for old in versions[:-keep] if keep > 0 else []:
+        if old != current:
+            shutil.rmtree(os.path.join(path, old), ignore_errors=True)
@@ -0,0 +1,228 @@
+"""
+Time-decayed, windowed rating aggregates maintained as ratings stream in.
+
+RatingStream keeps the ratings that fall inside a sliding time window plus
+exponentially decayed per-user and per-item sums over them. The
+RecommenderEngine trains collab and popularity on the window, so the
+training cost follows the window size rather than the total history.
+
+Decay uses forward decay (Cormode et al. 2009). An event at time t is
+stored with weight exp(lam * (t - t_ref)) for a fixed reference time t_ref.
+Adding an event therefore updates one user and one item and never rescales
+the others. Reading a sum at time T multiplies it by exp(-lam * (T - t_ref)).
+When the exponent gets large, t_ref moves forward and every sum is rescaled
+once. Events that leave the window are subtracted in the same units.
+
+Times are seconds, matching the ratings' `timestamp` column. The window
+is measured back from the newest rating seen, not from the wall clock.
+New events are stamped on the stream's own clock (clock()): the newest
+rating at build time plus the wall-clock time elapsed since, so feedback
+on a historical dataset lands just after its newest rating instead of
+jumping to today and pushing every older rating out of the window.
+"""
+
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DAY = 86400.0
+_MAX_EXPONENT = 30.0   # rebase t_ref before exp() gets near overflow
+_MAX_PENDING = 1024    # appended ratings buffered before they are merged into the window arrays
+
+
+class DecayedSums:
+    """Per-key weight and weighted-rating sums, in forward-decay units."""
+
+    __slots__ = ("slots", "ids", "weight", "total", "size")
+
+    def __init__(self):
+        self.slots = {}
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.weight = np.zeros(0)
+        self.total = np.zeros(0)
+        self.size = 0
+
+    def add(self, keys: np.ndarray, weights: np.ndarray, values: np.ndarray):
+        """Adds weight and weight * value per key; negative weights remove events."""
+        unique, inverse = np.unique(keys, return_inverse=True)
+        slots = np.array([self._slot(k) for k in unique.tolist()], dtype=np.int64)[inverse]
+        np.add.at(self.weight, slots, weights)
+        np.add.at(self.total, slots, weights * values)
+
+    def _slot(self, key) -> int:
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self.slots[key] = self.size
+            if self.size == len(self.ids):
+                grow = max(16, 2 * self.size)
+                self.ids = np.concatenate([self.ids, np.zeros(grow, dtype=np.int64)])
+                self.weight = np.concatenate([self.weight, np.zeros(grow)])
+                self.total = np.concatenate([self.total, np.zeros(grow)])
+            self.ids[slot] = key
+            self.size += 1
+        return slot
+
+    def compact(self, min_weight: float):
+        """Forgets keys whose weight fell to min_weight or below, once they are at least half of all keys."""
+        keep = np.flatnonzero(self.weight[:self.size] > min_weight)
+        if 2 * len(keep) > self.size:
+            return
+        self.ids, self.weight, self.total = self.ids[keep], self.weight[keep], self.total[keep]
+        self.size = len(keep)
+        self.slots = dict(zip(self.ids.tolist(), range(self.size)))
+
+    def scale(self, factor: float):
+        self.weight[:self.size] *= factor
+        self.total[:self.size] *= factor
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.weight.nbytes + self.total.nbytes
+
+
+class RatingStream:
+    """
+    Ratings inside a time window with decayed per-user/per-item aggregates.
+
+    Built in one pass over the ratings sorted by timestamp; add() then
+    updates it incrementally as feedback arrives.
+    """
+
+    def __init__(self, ratings: pd.DataFrame, half_life: Optional[float] = None, window: Optional[float] = None):
+        """
+        Args:
+            ratings: Frame with userId, movieId, rating, timestamp
+            half_life: Seconds after which a rating counts half (None: no decay)
+            window: Keep only ratings this many seconds older than the newest (None: keep all)
+        """
+        self.half_life = half_life
+        self.window = window
+        self._lam = np.log(2) / half_life if half_life else 0.0
+
+        ordered = ratings.sort_values('timestamp', kind='stable')
+        times = ordered['timestamp'].to_numpy(dtype=np.float64)
+        self.now = float(times[-1]) if len(times) else 0.0
+        self._t_ref = self.now
+        self._clock_start = (self.now, time.time())
+        self.users = DecayedSums()
+        self.items = DecayedSums()
+
+        if window is not None:
+            keep = times >= self.now - window
+            ordered, times = ordered[keep], times[keep]
+        self._user_col = ordered['userId'].to_numpy(dtype=np.int64)
+        self._item_col = ordered['movieId'].to_numpy(dtype=np.int64)
+        self._rating_col = ordered['rating'].to_numpy(dtype=np.float64)
+        self._time_col = times
+        self._pending = []
+        self._accumulate(self._user_col, self._item_col, self._rating_col, times, sign=1.0)
+
+    def __len__(self):
+        return len(self._time_col) + len(self._pending)
+
+    def clock(self) -> float:
+        """Current time on the stream's clock (dataset seconds), for stamping new events."""
+        start, wall_start = self._clock_start
+        return max(self.now, start + (time.time() - wall_start))
+
+    @property
+    def cutoff(self) -> float:
+        """Oldest timestamp inside the window (-inf without a window)."""
+        return self.now - self.window if self.window is not None else -np.inf
+
+    def add(self, user_id, movie_id, rating, timestamp):
+        """Appends one rating and updates its user's and item's sums."""
+        timestamp = float(timestamp)
+        self._pending.append((user_id, movie_id, float(rating), timestamp))
+        if timestamp > self.now:
+            self.now = timestamp
+        self._accumulate(np.array([user_id]), np.array([movie_id]), np.array([float(rating)]),
+                         np.array([timestamp]), sign=1.0)
+        if len(self._pending) >= _MAX_PENDING:
+            self._sync()
+
+    def _accumulate(self, users, items, ratings, times, sign):
+        if self._lam and times.size and self._lam * (times.max() - self._t_ref) > _MAX_EXPONENT:
+            self._rebase(float(times.max()))
+        weights = sign * self._forward(times)
+        self.users.add(users, weights, ratings)
+        self.items.add(items, weights, ratings)
+
+    def _forward(self, times: np.ndarray) -> np.ndarray:
+        return np.exp(self._lam * (times - self._t_ref)) if self._lam else np.ones(len(times))
+
+    def _rebase(self, t_ref: float):
+        factor = np.exp(-self._lam * (t_ref - self._t_ref))
+        self.users.scale(factor)
+        self.items.scale(factor)
+        self._t_ref = t_ref
+
+    def _consolidate(self):
+        if not self._pending:
+            return
+        users, items, ratings, times = (np.array(col) for col in zip(*self._pending))
+        self._pending = []
+        self._user_col = np.concatenate([self._user_col, users.astype(np.int64)])
+        self._item_col = np.concatenate([self._item_col, items.astype(np.int64)])
+        self._rating_col = np.concatenate([self._rating_col, ratings])
+        self._time_col = np.concatenate([self._time_col, times])
+        if np.any(np.diff(self._time_col) < 0):
+            order = np.argsort(self._time_col, kind="stable")
+            for name in ("_user_col", "_item_col", "_rating_col", "_time_col"):
+                setattr(self, name, getattr(self, name)[order])
+
+    def _sync(self):
+        """Merges appended ratings, then drops those older than the window and subtracts them from the sums."""
+        self._consolidate()
+        if self.window is None:
+            return
+        n_old = int(np.searchsorted(self._time_col, self.now - self.window, side="left"))
+        if n_old:
+            self._accumulate(self._user_col[:n_old], self._item_col[:n_old], self._rating_col[:n_old],
+                             self._time_col[:n_old], sign=-1.0)
+            self._user_col, self._item_col = self._user_col[n_old:], self._item_col[n_old:]
+            self._rating_col, self._time_col = self._rating_col[n_old:], self._time_col[n_old:]
+            # Keys with nothing left in the window
+            min_weight = 1e-9 * float(self._forward(np.array([self.now]))[0])
+            self.users.compact(min_weight)
+            self.items.compact(min_weight)
+
+    def frame(self) -> pd.DataFrame:
+        """The window's ratings, oldest first, with each one's decay weight at `now`."""
+        self._sync()
+        return pd.DataFrame({
+            'userId': self._user_col,
+            'movieId': self._item_col,
+            'rating': self._rating_col,
+            'timestamp': self._time_col.astype(np.int64),
+            'weight': np.exp(-self._lam * (self.now - self._time_col)),
+        })
+
+    def _stats(self, sums: DecayedSums) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self._sync()
+        n = sums.size
+        count = sums.weight[:n] * np.exp(-self._lam * (self.now - self._t_ref))
+        # Keys whose every rating expired are left with rounding noise
+        live = count > 1e-9
+        mean = sums.total[:n][live] / sums.weight[:n][live]
+        return sums.ids[:n][live], count[live], mean
+
+    def item_stats(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(movie_ids, decayed rating counts, decayed mean ratings) at `now`."""
+        return self._stats(self.items)
+
+    def user_stats(self, user_id) -> Tuple[float, float]:
+        """(decayed rating count, decayed mean rating) of a user; (0, nan) if none in the window."""
+        self._sync()
+        slot = self.users.slots.get(user_id)
+        count = 0.0 if slot is None else self.users.weight[slot] * np.exp(-self._lam * (self.now - self._t_ref))
+        if count <= 1e-9:
+            return 0.0, float("nan")
+        return float(count), float(self.users.total[slot] / self.users.weight[slot])
+
+    @property
+    def nbytes(self) -> int:
+        columns = self._user_col.nbytes + self._item_col.nbytes + self._rating_col.nbytes + self._time_col.nbytes
+        return columns + self.users.nbytes + self.items.nbytes
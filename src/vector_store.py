@@ -12,6 +12,10 @@ from typing import List, Dict, Tuple, Optional
 import os
 import json
 
+from .data_loader import GENRES
+from .embedding_worker import BatchingEncoder
+from .facets import build_where, facet_metadata, split_genres
+
 
 class MovieVectorStore:
     """
@@ -27,7 +31,9 @@ class MovieVectorStore:
         self,
         persist_directory: str = "./chroma_db",
         collection_name: str = "movies",
-        model_name: str = "all-MiniLM-L6-v2"
+        model_name: str = "all-MiniLM-L6-v2",
+        batch_queries: bool = True,
+        max_batch_wait_ms: float = 5.0
     ):
         """
         Initialize the vector store.
@@ -36,6 +42,9 @@ class MovieVectorStore:
             persist_directory: Path to persist ChromaDB data
             collection_name: Name of the ChromaDB collection
             model_name: SentenceTransformer model to use for embeddings
+            batch_queries: Encode single-query embeddings on a batching worker
+                thread, so concurrent callers share forward passes
+            max_batch_wait_ms: How long a query waits for others to join its batch
         """
         self.persist_directory = persist_directory
         self.collection_name = collection_name
@@ -44,6 +53,13 @@ class MovieVectorStore:
         # Initialize sentence transformer model
         print(f"Loading embedding model: {model_name}...")
         self.embedding_model = SentenceTransformer(model_name)
+        self.query_encoder = None
+        self._facet_fields = None
+        if batch_queries:
+            self.query_encoder = BatchingEncoder(
+                lambda texts: self.embedding_model.encode(texts, convert_to_numpy=True, show_progress_bar=False),
+                max_wait_ms=max_batch_wait_ms,
+            )
 
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -91,6 +107,8 @@ class MovieVectorStore:
         Returns:
             384-dimensional embedding vector
         """
+        if self.query_encoder is not None:
+            return self.query_encoder.encode(text).tolist()
         embedding = self.embedding_model.encode(text, convert_to_numpy=True)
         return embedding.tolist()
 
@@ -115,6 +133,10 @@ class MovieVectorStore:
         """
         Index all movies from DataFrame into ChromaDB.
 
+        Besides title/genres/description, each movie gets a boolean
+        genre_* field per genre and a release year (see facets.py) so
+        search filters can be evaluated inside the index.
+
         Args:
             movies_df: DataFrame with columns [movieId, title, genres, description]
             batch_size: Number of movies to process at once
@@ -125,6 +147,7 @@ class MovieVectorStore:
         movie_ids = []
         movie_texts = []
         metadatas = []
+        all_genres = sorted(set(GENRES).union(*(split_genres(g) for g in movies_df['genres'])))
 
         for idx, row in movies_df.iterrows():
             movie_id = str(row['movieId'])
@@ -141,7 +164,8 @@ class MovieVectorStore:
                 "movieId": int(row['movieId']),
                 "title": title,
                 "genres": genres,
-                "description": description
+                "description": description,
+                **facet_metadata(genres, title, all_genres)
             })
 
         # Generate embeddings in batches
@@ -169,6 +193,7 @@ class MovieVectorStore:
                 documents=batch_documents
             )
 
+        self._facet_fields = None
         print(f"✓ Successfully indexed {len(movie_ids)} movies!")
         print(f"  Collection size: {self.collection.count()}")
 
@@ -176,15 +201,28 @@ class MovieVectorStore:
         self,
         query: str,
         n_results: int = 10,
-        filter_dict: Optional[Dict] = None
+        filter_dict: Optional[Dict] = None,
+        genres_any: Optional[List[str]] = None,
+        genres_all: Optional[List[str]] = None,
+        genres_none: Optional[List[str]] = None,
+        year_min: Optional[int] = None,
+        year_max: Optional[int] = None
     ) -> Tuple[List[int], List[float], List[Dict]]:
         """
         Search for movies similar to the query text.
 
+        Genre and year filters are applied by ChromaDB during the query,
+        so n_results matching movies come back without over-fetching.
+
         Args:
             query: Search query (can be a description, genre, or natural language)
             n_results: Number of results to return
-            filter_dict: Optional metadata filters (e.g., {"genres": "Action"})
+            filter_dict: Optional raw metadata filter, ANDed with the others
+            genres_any: Only movies with at least one of these genres
+            genres_all: Only movies with all of these genres
+            genres_none: Exclude movies with any of these genres
+            year_min: Earliest release year (inclusive)
+            year_max: Latest release year (inclusive)
 
         Returns:
             Tuple of (movie_ids, distances, metadatas)
@@ -196,7 +234,8 @@ class MovieVectorStore:
         results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results,
-            where=filter_dict
+            where=build_where(genres_any, genres_all, genres_none, year_min, year_max, extra=filter_dict,
+                              facet_fields=self._indexed_facet_fields())
         )
 
         # Extract results
@@ -230,7 +269,12 @@ class MovieVectorStore:
     def get_similar_to_movie(
         self,
         movie_id: int,
-        n_results: int = 10
+        n_results: int = 10,
+        genres_any: Optional[List[str]] = None,
+        genres_all: Optional[List[str]] = None,
+        genres_none: Optional[List[str]] = None,
+        year_min: Optional[int] = None,
+        year_max: Optional[int] = None
     ) -> Tuple[List[int], List[float], List[Dict]]:
         """
         Find movies similar to a given movie.
@@ -238,6 +282,8 @@ class MovieVectorStore:
         Args:
             movie_id: Reference movie ID
             n_results: Number of similar movies to return
+            genres_any, genres_all, genres_none, year_min, year_max:
+                Filters, as in search_similar_movies
 
         Returns:
             Tuple of (movie_ids, distances, metadatas)
@@ -248,7 +294,9 @@ class MovieVectorStore:
 
         results = self.collection.query(
             query_embeddings=[embedding],
-            n_results=n_results + 1  # +1 because the movie itself will be included
+            n_results=n_results + 1,  # +1 because the movie itself will be included
+            where=build_where(genres_any, genres_all, genres_none, year_min, year_max,
+                              facet_fields=self._indexed_facet_fields())
         )
 
         # Filter out the query movie itself
@@ -276,8 +324,18 @@ class MovieVectorStore:
             name=self.collection_name,
             metadata={"hnsw:space": "cosine"}
         )
+        self._facet_fields = None
         print(f"Created new collection '{self.collection_name}'")
 
+    def _indexed_facet_fields(self) -> set:
+        """Metadata keys of the indexed movies; every movie carries the same genre_* fields."""
+        if self._facet_fields is None:
+            sample = self.collection.get(limit=1, include=['metadatas'])['metadatas']
+            if not sample:
+                return set()
+            self._facet_fields = set(sample[0])
+        return self._facet_fields
+
     def get_stats(self) -> Dict:
         """Get statistics about the vector store."""
         return {
@@ -24,3 +24,110 @@ def test_router_node_fallback():
     result = router_node(state)
     assert "messages" in result
     assert "final_response" in result
+
+def test_agent_reuses_engine_and_llm_clients():
+    import src.agent as agent
+    from src.data_loader import generate_synthetic_data
+    from src.recommender import RecommenderEngine
+
+    previous = agent._engine
+    movies, ratings = generate_synthetic_data(n_users=20, n_movies=40, n_ratings=300, seed=3)
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+    try:
+        agent.set_engine(engine)
+        assert agent.get_engine() is engine
+        title = movies['title'].iloc[0]
+        assert title in agent.search_movies.invoke({"query": title.split(" (")[0]})
+    finally:
+        agent.set_engine(previous)
+
+    assert agent.get_llm("key-a") is agent.get_llm("key-a")
+    assert agent.get_llm("key-a") is not agent.get_llm("key-b")
+
+def test_tool_node_runs_every_tool_call():
+    import asyncio
+    from src.agent import tool_execution_node, atool_execution_node
+    state = {
+        "messages": [AIMessage(content="", tool_calls=[
+            {"name": "search_movies", "args": {"query": "Action"}, "id": "a"},
+            {"name": "recommend_movies", "args": {}, "id": "b"},
+        ])],
+        "user_id": 1,
+    }
+    for result in (tool_execution_node(state), asyncio.run(atool_execution_node(state))):
+        response = result["final_response"]
+        assert response.index("movies I found") < response.index("personalized recommendations") \
+            or "No movies found" in response
+
+def test_stream_response_fallback(monkeypatch):
+    from src.agent import stream_response
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    state = {"messages": [HumanMessage(content="what should I watch")], "user_id": 1, "google_api_key": ""}
+    chunks = list(stream_response(state))
+    assert "personalized recommendations" in "".join(chunks)
+
+def test_stream_response_emits_each_tool_result(monkeypatch):
+    import src.agent as agent
+    from langchain_core.runnables import RunnableLambda
+    calls = [{"name": "recommend_movies", "args": {"user_id": 1}, "id": "a"},
+             {"name": "search_movies", "args": {"query": "Comedy"}, "id": "b"}]
+    monkeypatch.setattr(agent, "get_llm", lambda key: RunnableLambda(lambda msgs: AIMessage(content="", tool_calls=calls)))
+    state = {"messages": [HumanMessage(content="recommend something and find comedies")], "user_id": 1,
+             "google_api_key": "fake"}
+    chunks = list(agent.stream_response(state))
+    assert len(chunks) == 2
+    assert any("personalized recommendations" in c for c in chunks)
+
+def test_open_breaker_skips_llm(monkeypatch):
+    import src.agent as agent
+    from src.intent_router import CircuitBreaker, IntentRouter, hashing_encoder
+
+    def failing_llm(key):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(agent, "get_llm", failing_llm)
+    monkeypatch.setattr(agent, "llm_breaker", CircuitBreaker(failure_threshold=1, reset_timeout=60.0))
+    monkeypatch.setattr(agent, "_intent_router", IntentRouter(encoder=hashing_encoder()))
+    state = {"messages": [HumanMessage(content="what should I watch?")], "user_id": 1, "google_api_key": "k"}
+
+    assert "personalized recommendations" in router_node(state)["final_response"]
+    assert agent.llm_breaker.state == "open"
+    monkeypatch.setattr(agent, "get_llm", lambda key: pytest.fail("LLM called while breaker is open"))
+    assert "personalized recommendations" in router_node(state)["final_response"]
+
+def test_tool_results_are_cached_per_model_version():
+    import src.agent as agent
+    agent.tool_cache.clear()
+    engine = agent.get_engine()
+    before = agent.tool_cache.stats()
+    first = search_movies.invoke({"query": "  ACTION "})
+    assert search_movies.invoke({"query": "action"}) == first
+    after = agent.tool_cache.stats()
+    assert after["hits"] == before["hits"] + 1 and after["size"] == 1
+
+    # Session events reach recommend() without a retrain, so they drop the user's cached answer
+    recommend_movies.invoke({"user_id": 1})
+    hits = agent.tool_cache.stats()["hits"]
+    recommend_movies.invoke({"user_id": 1})
+    assert agent.tool_cache.stats()["hits"] == hits + 1
+    engine.add_session_event(1, int(engine.catalog.ids[0]), 1.0)
+    misses = agent.tool_cache.stats()["misses"]
+    recommend_movies.invoke({"user_id": 1})
+    assert agent.tool_cache.stats()["misses"] == misses + 1
+    engine.clear_session(1)
+
+    # An event that lands while the answer is computed leaves it under a stale key
+    compute = agent._recommend_text
+    def racing(engine, user_id):
+        text = compute(engine, user_id)
+        engine.add_session_event(user_id, int(engine.catalog.ids[0]), 1.0)
+        return text
+    agent._recommend_text = racing
+    try:
+        recommend_movies.invoke({"user_id": 1})
+    finally:
+        agent._recommend_text = compute
+    misses = agent.tool_cache.stats()["misses"]
+    recommend_movies.invoke({"user_id": 1})
+    assert agent.tool_cache.stats()["misses"] == misses + 1
+    engine.clear_session(1)
@@ -0,0 +1,62 @@
+from src.cache import LRUCache
+
+def test_lru_eviction_and_stats():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recent
+    cache.set("c", 3)           # evicts "b"
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["evictions"] == 1
+    assert stats["hit_rate"] == 2 / 3
+
+def test_ttl_expiry():
+    now = [0.0]
+    cache = LRUCache(maxsize=10, ttl=5.0, clock=lambda: now[0])
+    cache.set("k", "v")
+    now[0] = 4.9
+    assert cache.get("k") == "v"
+    now[0] = 5.1
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+def test_tag_invalidation():
+    cache = LRUCache(maxsize=10)
+    cache.set(("u1", 5), "x", tag="u1")
+    cache.set(("u1", 10), "y", tag="u1")
+    cache.set(("u2", 5), "z", tag="u2")
+    assert cache.invalidate_tag("u1") == 2
+    assert cache.get(("u1", 5)) is None
+    assert cache.get(("u2", 5)) == "z"
+
+def test_get_or_compute_coalesces_concurrent_misses():
+    import threading
+    import time
+    cache = LRUCache(maxsize=10)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    assert cache.get_or_compute("k", compute) == "value" and len(calls) == 1
+
+    def failing():
+        raise ValueError("boom")
+
+    try:
+        cache.get_or_compute("bad", failing)
+    except ValueError:
+        pass
+    assert cache.get("bad") is None
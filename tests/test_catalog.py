@@ -0,0 +1,19 @@
+from src.catalog import ItemCatalog, ScoredItem
+
+def test_catalog_lookups():
+    catalog = ItemCatalog([30, 10, 20], ["Thirty", "Ten", "Twenty"], ["Action|Drama", "Comedy", "Action|Drama"])
+    assert list(catalog.index_of([10, 20, 30, 99])) == [1, 2, 0, -1]
+    assert catalog.index(99) == -1
+    assert catalog.title(0) == "Thirty"
+    assert catalog.genres(2) == "Action|Drama"
+    # Identical genre strings share one interned code
+    assert catalog.genre_codes[0] == catalog.genre_codes[2]
+    assert len(catalog.genre_table) == 2
+
+def test_scored_item_behaves_like_a_dict():
+    item = ScoredItem(1, "Movie 1", "Comedy", 0.5, "Popular Outcome")
+    assert item["title"] == "Movie 1"
+    assert "score" in item and "missing" not in item
+    assert item.get("missing", 7) == 7
+    assert dict(item) == {"movieId": 1, "title": "Movie 1", "genres": "Comedy", "score": 0.5, "reason": "Popular Outcome"}
+    assert not hasattr(item, "__dict__")
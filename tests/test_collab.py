@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from src.collab import ALSBackend, BPRBackend, SVDBackend, make_backend
+from src.data_loader import generate_synthetic_data
+from src.evaluator import Evaluator
+from src.recommender import RecommenderEngine
+
+@pytest.fixture(scope="module")
+def data():
+    return generate_synthetic_data(n_users=80, n_movies=120, n_ratings=2500, seed=4)
+
+def rating_matrix(ratings):
+    ratings = ratings.drop_duplicates(['userId', 'movieId'])
+    users, u = np.unique(ratings['userId'], return_inverse=True)
+    items, i = np.unique(ratings['movieId'], return_inverse=True)
+    return sp.csr_matrix((ratings['rating'].astype(float), (u, i)), shape=(len(users), len(items)))
+
+@pytest.mark.parametrize("backend", [SVDBackend(), ALSBackend(), BPRBackend()], ids=lambda b: b.name)
+def test_backends_rank_observed_items_higher(data, backend):
+    R = rating_matrix(data[1])
+    user_factors, item_factors = backend.fit(R)
+    assert user_factors.shape[0] == R.shape[0] and item_factors.shape[1] == R.shape[1]
+    scores = user_factors @ item_factors
+    observed = R.toarray() > 0
+    assert scores[observed].mean() > scores[~observed].mean()
+
+@pytest.mark.parametrize("backend", [ALSBackend(), BPRBackend()], ids=lambda b: b.name)
+def test_warm_start_runs_short_refit(data, backend):
+    R = rating_matrix(data[1])
+    cold = backend.fit(R)
+    cold_iterations = backend.last_iterations
+    warm = backend.fit(R, warm_start=cold)
+    assert backend.last_iterations < cold_iterations
+    assert np.corrcoef((cold[0] @ cold[1]).ravel(), (warm[0] @ warm[1]).ravel())[0, 1] > 0.9
+
+@pytest.mark.parametrize("backend", [SVDBackend(), ALSBackend(), BPRBackend()], ids=lambda b: b.name)
+def test_unit_sample_weights_match_unweighted_fit(data, backend):
+    R = rating_matrix(data[1])
+    plain, weighted = backend.fit(R), backend.fit(R, weights=np.ones(R.nnz))
+    assert np.allclose(plain[0] @ plain[1], weighted[0] @ weighted[1])
+
+def test_svd_sample_weights_are_not_rating_scales(data):
+    # Scaling the ratings by 0.2 shrinks predictions fivefold; weighting them by 0.2 only loosens the fit
+    R = rating_matrix(data[1])
+    rows = np.repeat(np.arange(R.shape[0]), np.diff(R.indptr))
+
+    def predicted(factors):
+        return np.einsum("ij,ji->i", factors[0][rows], factors[1][:, R.indices])
+
+    weighted = predicted(SVDBackend().fit(R, weights=np.full(R.nnz, 0.2)))
+    scaled = predicted(SVDBackend().fit(R * 0.2))
+    assert weighted.mean() > 3 * scaled.mean()
+
+def test_engine_with_als_backend(data):
+    movies, ratings = data
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False, collab_backend="als")
+    recs, method = engine.recommend(int(ratings['userId'].iloc[0]), n=5)
+    assert method == "Hybrid" and len(recs) == 5
+    assert np.isnan(Evaluator(engine).calculate_rmse())
+
+    version = engine.model_version
+    engine.add_feedback(int(ratings['userId'].iloc[0]), int(movies['movieId'].iloc[-1]), 5.0)
+    assert engine.model_version == version + 1
+    assert engine.collab_backend.last_iterations == engine.collab_backend.warm_iterations
+
+    with pytest.raises(ValueError):
+        make_backend("nmf")
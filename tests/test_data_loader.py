@@ -0,0 +1,39 @@
+import pytest
+from src.data_loader import generate_synthetic_data, save_data, load_data, GENRES
+from src.recommender import RecommenderEngine
+
+def test_synthetic_data_is_seeded():
+    m1, r1 = generate_synthetic_data(n_users=50, n_movies=200, n_ratings=2000, seed=7)
+    m2, r2 = generate_synthetic_data(n_users=50, n_movies=200, n_ratings=2000, seed=7)
+    assert m1.equals(m2)
+    assert r1.equals(r2)
+
+def test_synthetic_data_schema_and_uniqueness():
+    movies, ratings = generate_synthetic_data(n_users=100, n_movies=300, n_ratings=5000, seed=1)
+    assert list(movies.columns) == ['movieId', 'title', 'genres', 'description']
+    assert list(ratings.columns) == ['userId', 'movieId', 'rating', 'timestamp']
+    assert len(movies) == 300
+    assert not ratings.duplicated(subset=['userId', 'movieId']).any()
+    assert ratings['rating'].between(1.0, 5.0).all()
+    assert ratings['movieId'].isin(movies['movieId']).all()
+    for g in movies['genres']:
+        assert set(g.split('|')) <= set(GENRES)
+
+def test_synthetic_popularity_is_skewed():
+    _, ratings = generate_synthetic_data(n_users=2000, n_movies=1000, n_ratings=50000, seed=3)
+    counts = ratings['movieId'].value_counts()
+    # Top 10% of items should hold far more than 10% of interactions
+    assert counts.iloc[:100].sum() / counts.sum() > 0.3
+
+def test_parquet_round_trip_and_engine(tmp_path):
+    pytest.importorskip("pyarrow")
+    movies, ratings = generate_synthetic_data(n_users=30, n_movies=80, n_ratings=600, seed=5)
+    save_data(movies, ratings, str(tmp_path), fmt='parquet')
+    m, r = load_data(str(tmp_path))
+    assert len(m) == len(movies) and len(r) == len(ratings)
+
+    engine = RecommenderEngine(data_dir=str(tmp_path))
+    user_id = int(r['userId'].iloc[0])
+    engine.add_feedback(user_id, int(m['movieId'].iloc[-1]), 5.0)
+    _, r_after = load_data(str(tmp_path))
+    assert len(r_after) == len(ratings) + 1
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from src.embedding_worker import BatchingEncoder
+
+def fake_encode(calls):
+    def encode(texts):
+        calls.append(len(texts))
+        time.sleep(0.01)
+        return np.array([[len(t), i] for i, t in enumerate(texts)], dtype=np.float32)
+    return encode
+
+def test_concurrent_requests_share_batches():
+    calls = []
+    encoder = BatchingEncoder(fake_encode(calls), max_batch_size=16, max_wait_ms=20)
+    texts = ["x" * (i + 1) for i in range(32)]
+    results = {}
+
+    def worker(t):
+        results[t] = encoder.encode(t)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in texts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    encoder.close()
+
+    assert all(results[t][0] == len(t) for t in texts)
+    assert sum(calls) == 32 and max(calls) <= 16
+    assert len(calls) < 32
+    assert encoder.stats()["batches"] == len(calls)
+
+def test_errors_reach_every_caller():
+    def broken(texts):
+        raise RuntimeError("model crashed")
+
+    encoder = BatchingEncoder(broken, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        encoder.encode_many(["a", "b"])
+    encoder.close()
+    with pytest.raises(RuntimeError):
+        encoder.submit("c")
@@ -0,0 +1,32 @@
+from src.facets import build_where, facet_metadata, genre_field, parse_year
+
+def test_facet_metadata():
+    fields = facet_metadata("Action|Sci-Fi", "Movie 7 (1999)", ["Action", "Comedy", "Sci-Fi"])
+    assert fields == {"genre_action": True, "genre_comedy": False, "genre_sci_fi": True, "year": 1999}
+    assert parse_year("No Year") is None
+    assert facet_metadata("Drama", "No Year", ["Drama"])["year"] == -1
+
+def test_build_where():
+    assert build_where() is None
+    assert build_where(genres_any=["Action"]) == {"genre_action": True}
+    assert build_where(genres_any=["Action", "Comedy"], genres_none=["Horror"], year_min=1990, year_max=2000) == {
+        "$and": [
+            {"$or": [{"genre_action": True}, {"genre_comedy": True}]},
+            {"genre_horror": False},
+            {"year": {"$gte": 1990}},
+            {"year": {"$lte": 2000}},
+        ]
+    }
+    assert build_where(genres_all=["Sci-Fi"], extra={"movieId": 3}) == {
+        "$and": [{genre_field("Sci-Fi"): True}, {"movieId": 3}]
+    }
+    assert build_where(year_max=1980) == {"$and": [{"year": {"$lte": 1980}}, {"year": {"$gte": 0}}]}
+
+def test_unknown_excluded_genre_is_ignored():
+    fields = facet_metadata("Action", "Movie 1 (2001)", ["Action", "Horror"])
+    assert build_where(genres_none=["Western"], facet_fields=fields) is None
+    assert build_where(genres_none=["Western", "Horror"], year_min=2000, facet_fields=fields) == {
+        "$and": [{"genre_horror": False}, {"year": {"$gte": 2000}}]
+    }
+    # Unknown genres still match nothing when required
+    assert build_where(genres_any=["Western"], facet_fields=fields) == {"genre_western": True}
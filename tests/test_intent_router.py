@@ -0,0 +1,30 @@
+from src.intent_router import CircuitBreaker, IntentRouter, hashing_encoder
+
+def test_intent_classification_offline():
+    router = IntentRouter(encoder=hashing_encoder())
+    assert router.classify("what should I watch tonight?")[0] == "recommend"
+    assert router.classify("Recommend me a movie")[0] == "recommend"
+    assert router.classify("show me some funny comedies")[0] == "search"
+
+    assert router.search_query("I want a funny movie") == "Comedy"
+    assert router.search_query("find sci-fi films") == "Sci-Fi"
+    assert router.search_query("search for Movie 12") == "Movie 12"
+
+def test_circuit_breaker_opens_and_recovers():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow()          # single half-open trial
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
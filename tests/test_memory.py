@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+from src.data_loader import generate_synthetic_data
+from src.evaluator import Evaluator
+from src.memory import (FULL, LADDER, MemoryBudgetError, block_similarity, estimate_training_memory, parse_bytes,
+                        plan_representation)
+from src.recommender import RecommenderEngine
+
+@pytest.fixture(scope="module")
+def data():
+    return generate_synthetic_data(n_users=100, n_movies=400, n_ratings=3000, seed=4)
+
+def test_planning_falls_back_to_cheaper_representations():
+    assert parse_bytes("512MB") == 512 << 20 and parse_bytes(" 1.5 gb ") == 3 << 29 and parse_bytes(10) == 10
+    with pytest.raises(ValueError):
+        parse_bytes("lots")
+
+    dims = dict(n_users=50_000, n_items=20_000, n_ratings=2_000_000, n_catalog=20_000)
+    peaks = [sum(estimate_training_memory(**dims, representation=rep).values()) for rep in LADDER]
+    assert peaks == sorted(peaks, reverse=True)
+
+    assert plan_representation(1 << 40, **dims)[0] is FULL
+    rep, estimate = plan_representation(1 << 30, **dims)
+    assert rep.sparse_ratings and rep.sim_neighbors and sum(estimate.values()) <= 1 << 30
+    with pytest.raises(MemoryBudgetError, match="memory budget"):
+        plan_representation(1 << 20, **dims)
+
+def test_block_similarity():
+    latent = np.random.default_rng(0).normal(size=(50, 8))
+    expected = cosine_similarity(latent)
+    assert np.allclose(block_similarity(latent, np.float32), expected, atol=1e-6)
+
+    top = block_similarity(latent, np.float32, neighbors=5)
+    assert sp.issparse(top) and top.nnz == 50 * 5
+    for row in (0, 17):
+        kept = np.sort(top[row].toarray().ravel())[-5:]
+        assert np.allclose(kept, np.sort(expected[row])[-5:], atol=1e-6)
+
+def test_engine_memory_budget(data):
+    movies, ratings = data
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+    report = engine.memory_report()
+    assert report["content_sim_matrix"] == engine.content_sim_matrix.nbytes
+    assert report["ratings"] > 0 and report["user_item_matrix"] > 0 and report["collab_maps"] > 0
+
+    # Vectorised RMSE matches the dense reconstruction
+    dense = engine.collab_user_factors @ engine.collab_item_factors
+    matrix = engine.user_item_matrix
+    known = ratings[ratings['userId'].isin(matrix.index) & ratings['movieId'].isin(matrix.columns)]
+    pred = dense[matrix.index.get_indexer(known['userId']), matrix.columns.get_indexer(known['movieId'])]
+    assert Evaluator(engine).calculate_rmse() == pytest.approx(np.sqrt(np.mean((known['rating'] - pred) ** 2)))
+
+    # A fresh engine holds only the frames and catalog when it plans its first train
+    held = report["ratings"] + report["movies"] + report["catalog"]
+    tight = held + sum(engine.estimate_training_memory(LADDER[-1]).values())
+    small = RecommenderEngine(movies=movies, ratings=ratings, background_training=False, memory_budget=tight)
+    assert small.representation.sim_neighbors and sp.issparse(small.content_sim_matrix)
+    assert small.memory_report()["content_sim_matrix"] < report["content_sim_matrix"] / 2
+    assert np.array_equal(small.user_item_matrix.sparse.to_coo().toarray(), matrix.to_numpy())
+    uid = int(ratings['userId'].iloc[0])
+    assert len(small.recommend(uid, n=5, diversity=0.5)[0]) == 5
+    assert len(small.similar_items(int(engine.catalog.ids[0]), n=5)) == 5
+
+    with pytest.raises(MemoryError):
+        RecommenderEngine(movies=movies, ratings=ratings, background_training=False, memory_budget="10KB")
+
+def test_precision_reference_keeps_planned_representation(data, monkeypatch):
+    movies, ratings = data
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False, precision="float32")
+    report = engine.memory_report()
+    held = report["ratings"] + report["movies"] + report["catalog"]
+    tight = held + sum(engine.estimate_training_memory(LADDER[-1]).values())
+    small = RecommenderEngine(movies=movies, ratings=ratings, background_training=False, memory_budget=tight,
+                              precision="float32")
+    assert small.representation.sim_neighbors
+
+    references = []
+    monkeypatch.setattr(Evaluator, "compare_rankings", lambda self, reference, users, n: references.append(reference))
+    Evaluator(small).verify_precision(n_users=5)
+    reference = references[0].representation
+    assert reference.sparse_ratings and reference.sim_neighbors == small.representation.sim_neighbors
+    assert reference.sim_dtype == np.float64 and references[0].dtype == np.float64
+    assert sp.issparse(references[0].content_sim_matrix)
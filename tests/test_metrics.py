@@ -0,0 +1,25 @@
+import json
+from src.metrics import Metrics
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    with metrics.timer("stage"):
+        pass
+    metrics.inc("requests")
+    assert metrics.snapshot() == {"counters": {}, "histograms": {}}
+
+def test_enabled_metrics_json_and_prometheus():
+    metrics = Metrics(enabled=True)
+    for _ in range(3):
+        with metrics.timer("recommend.collab"):
+            pass
+    metrics.inc("recommend_requests", 3)
+
+    snap = json.loads(metrics.to_json())
+    assert snap["counters"]["recommend_requests"] == 3
+    assert snap["histograms"]["recommend.collab"]["count"] == 3
+
+    text = metrics.to_prometheus()
+    assert "universalrecs_recommend_requests_total 3" in text
+    assert 'universalrecs_stage_seconds_count{stage="recommend.collab"} 3' in text
+    assert 'le="+Inf"} 3' in text
@@ -0,0 +1,39 @@
+import numpy as np
+from src.data_loader import generate_synthetic_data
+from src.mips import MIPSIndex, brute_force_topk, recall_at_k
+from src.recommender import RecommenderEngine
+from src.shared_model import attach_engine, publish_model
+
+def test_index_recall_and_exact_mode():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 8))
+    item_factors = (centers[rng.integers(0, 20, 3000)] + 0.3 * rng.normal(size=(3000, 8))).T
+    users = centers[rng.integers(0, 20, 30)] + 0.3 * rng.normal(size=(30, 8))
+    index = MIPSIndex(item_factors, nprobe=8)
+
+    assert recall_at_k(index, users, item_factors, 10) > 0.9
+    assert recall_at_k(index, users, item_factors, 10, nprobe=index.n_lists) == 1.0
+    cols, scores = index.search(users[0], 5, nprobe=index.n_lists)
+    exact_cols, exact_scores = brute_force_topk(users[0], item_factors, 5)
+    assert list(cols) == list(exact_cols) and np.allclose(scores, exact_scores)
+
+def test_engine_rebuilds_index_on_train(tmp_path):
+    movies, ratings = generate_synthetic_data(n_users=60, n_movies=150, n_ratings=2000, seed=8)
+    exact = RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False,
+                               collab_index={"nprobe": 1000})
+    first = engine.model.collab_index
+    assert first is not None
+    engine.train_models()
+    assert engine.model.collab_index is not first
+
+    # Scanning every list is exact, so rankings match brute-force scoring
+    for uid in ratings['userId'].unique()[:10]:
+        assert [r['movieId'] for r in engine.recommend(int(uid), n=5)[0]] == \
+               [r['movieId'] for r in exact.recommend(int(uid), n=5)[0]]
+
+    publish_model(engine, str(tmp_path))
+    attached = attach_engine(str(tmp_path))
+    assert attached.model.collab_index is not None
+    uid = int(ratings['userId'].iloc[0])
+    assert [r['movieId'] for r in attached.recommend(uid, n=5)[0]] == [r['movieId'] for r in engine.recommend(uid, n=5)[0]]
@@ -0,0 +1,63 @@
+import os
+import time
+from src.data_loader import generate_synthetic_data
+from src.profiling import SlowCallProfiler, summarize
+from src.recommender import RecommenderEngine
+
+def slow_step():
+    time.sleep(0.02)
+
+def test_only_slow_calls_are_kept_and_storage_is_bounded(tmp_path):
+    profiler = SlowCallProfiler(str(tmp_path), threshold_ms=10, max_dumps=3)
+    with profiler.profile("fast"):
+        pass
+    assert os.listdir(tmp_path) == []
+
+    for i in range(5):
+        with profiler.profile("recommend", user=i):
+            slow_step()
+    dumps = sorted(os.listdir(tmp_path))
+    assert len(dumps) == 3
+    assert all(d.startswith("recommend-") and d.endswith(".prof") for d in dumps)
+
+    # Generators are profiled only while producing items
+    assert list(profiler.iterate("agent_graph", iter([1, 2]))) == [1, 2]
+    assert len(os.listdir(tmp_path)) == 3
+    def slow_items():
+        slow_step()
+        yield 1
+    assert list(profiler.iterate("agent_graph", slow_items())) == [1]
+    assert any(d.startswith("agent_graph-") for d in os.listdir(tmp_path))
+
+    report = summarize(str(tmp_path), top=5, name="recommend")
+    assert report.startswith("2 dumps")
+    assert "slow_step" in report
+
+def test_engine_hooks(tmp_path):
+    movies, ratings = generate_synthetic_data(n_users=40, n_movies=80, n_ratings=800, seed=2)
+    profiler = SlowCallProfiler(str(tmp_path), threshold_ms=0)
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False, profiler=profiler)
+    engine.train_models()
+    engine.recommend(int(ratings['userId'].iloc[0]))
+    engine.recommend_batch([int(u) for u in ratings['userId'].unique()[:3]])
+    names = {d.split("-")[0] for d in os.listdir(tmp_path)}
+    assert {"train_models", "recommend", "recommend_batch"} <= names
+    assert profiler.captured == len(os.listdir(tmp_path)) and os.path.exists(profiler.last_dump)
+
+    assert not SlowCallProfiler().enabled
+    with SlowCallProfiler().profile("recommend"):
+        pass
+
+def test_shard_workers_profile_their_calls(tmp_path, monkeypatch):
+    from src.sharding import ShardedEngine, publish_shards
+    movies, ratings = generate_synthetic_data(n_users=30, n_movies=60, n_ratings=500, seed=3)
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+    publish_shards(engine, str(tmp_path / "shards"), n_shards=2)
+    dumps = tmp_path / "profiles"
+    monkeypatch.setenv("UNIVERSALRECS_PROFILE_DIR", str(dumps))
+    monkeypatch.setenv("UNIVERSALRECS_PROFILE_THRESHOLD_MS", "0")
+    with ShardedEngine.open(str(tmp_path / "shards"), cache_size=0) as sharded:
+        sharded.recommend_batch([int(u) for u in ratings['userId'].unique()[:3]])
+        sharded.similar_items(int(engine.catalog.ids[0]))
+    names = {d.split("-")[0] for d in os.listdir(dumps)}
+    assert {"recommend_batch", "similar_items", "shard_score", "shard_top"} <= names
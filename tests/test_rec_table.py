@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from src.data_loader import generate_synthetic_data
+from src.metrics import Metrics
+from src.rec_table import RecTable, build_table
+from src.recommender import RecommenderEngine
+
+def summary(recs):
+    return [(r['movieId'], r['reason'], round(r['score'], 4)) for r in recs]
+
+@pytest.fixture(scope="module")
+def engine():
+    movies, ratings = generate_synthetic_data(n_users=50, n_movies=100, n_ratings=1200, seed=13)
+    return RecommenderEngine(movies=movies, ratings=ratings, background_training=False,
+                             metrics=Metrics(enabled=True))
+
+def test_table_serves_until_user_gives_feedback(engine, tmp_path):
+    users = [int(u) for u in engine.ratings['userId'].unique()[:8]]
+    expected = {u: engine.recommend(u, n=10) for u in users}
+    build_table(engine, str(tmp_path / "table"), n=10, user_ids=users)
+    table = RecTable.open(str(tmp_path / "table"))
+    assert len(table) == len(users) and isinstance(table.item_ids, np.memmap)
+
+    engine.use_table(table)
+    try:
+        before = engine.metrics.snapshot()["counters"].get("recommend_table_hits", 0)
+        for u in users:
+            recs, method = engine.recommend(u, n=5)
+            assert method == expected[u][1]
+            assert summary(recs) == summary(expected[u][0][:5])
+        assert engine.metrics.snapshot()["counters"]["recommend_table_hits"] == before + len(users)
+        assert engine.recommend(users[0], n=5, diversity=0.3)[1].startswith("Hybrid + MMR")
+
+        # Feedback makes the stored list stale; the user is scored live from now on
+        liked = int(expected[users[0]][0][0]['movieId'])
+        engine.add_feedback(users[0], liked, 5.0)
+        assert liked not in [r['movieId'] for r in engine.recommend(users[0], n=5)[0]]
+    finally:
+        engine.use_table(None)
+
+def test_parallel_build_matches_in_process(engine, tmp_path):
+    users = [int(u) for u in engine.ratings['userId'].unique()[:12]]
+    build_table(engine, str(tmp_path / "serial"), n=5, user_ids=users)
+    build_table(engine, str(tmp_path / "parallel"), n=5, user_ids=users, processes=2, chunk_size=4)
+    serial, parallel = RecTable.open(str(tmp_path / "serial")), RecTable.open(str(tmp_path / "parallel"))
+    assert np.array_equal(serial.item_ids, parallel.item_ids)
+    assert np.allclose(serial.scores, parallel.scores, atol=1e-5)
+
+def test_parallel_build_is_stamped_with_the_published_snapshot(tmp_path):
+    movies, ratings = generate_synthetic_data(n_users=20, n_movies=40, n_ratings=300, seed=5)
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+    user = int(engine.ratings['userId'].iloc[0])
+    engine._retrain_collab = lambda: None  # feedback lands after the snapshot the workers score
+    engine.add_feedback(user, int(movies['movieId'].iloc[0]), 5.0)
+    assert engine.model.n_ratings < engine.n_ratings
+
+    build_table(engine, str(tmp_path / "table"), n=5, processes=2)
+    table = RecTable.open(str(tmp_path / "table"))
+    assert table.n_ratings == engine.model.n_ratings
+    assert table.manifest["model_version"] == engine.model_version
+    engine.use_table(table)
+    assert engine._table_stale_users == {user}
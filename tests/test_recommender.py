@@ -1,13 +1,20 @@
 import pytest
 import pandas as pd
 import numpy as np
+from src.data_loader import generate_synthetic_data
 from src.recommender import RecommenderEngine
+from src.metrics import Metrics
 
 @pytest.fixture
 def engine():
     # Force retraining for tests if needed, but the constructor loads data
     return RecommenderEngine()
 
+@pytest.fixture
+def feedback_data():
+    # Feedback tests use in-memory frames so they never append to data/ratings.csv
+    return generate_synthetic_data(n_users=30, n_movies=60, n_ratings=500, seed=7)
+
 def test_engine_initialization(engine):
     assert engine.movies is not None
     assert engine.ratings is not None
@@ -45,10 +52,188 @@ def test_mmr_diversity_changes_order(engine):
     assert "MMR" in diverse_method
     assert [r['movieId'] for r in base] != [r['movieId'] for r in diverse]
 
-def test_add_feedback(engine):
+def test_add_feedback(feedback_data):
+    movies, ratings = feedback_data
+    engine = RecommenderEngine(movies=movies, ratings=ratings)
     initial_count = len(engine.ratings)
     # Use a likely unique item for this user to test addition
-    engine.add_feedback(user_id=1, movie_id=999, rating=5.0)
+    engine.add_feedback(user_id=1, movie_id=int(movies['movieId'].iloc[-1]), rating=5.0)
     assert len(engine.ratings) == initial_count + 1
     # Check if it retrains (or at least doesn't crash)
+    assert engine.wait_for_training(timeout=30)
     assert engine.user_item_matrix is not None
+
+def test_metrics_instrumentation():
+    metrics = Metrics(enabled=True)
+    engine = RecommenderEngine(metrics=metrics)
+    engine.recommend(user_id=1, n=5)
+    engine.recommend(user_id=9999, n=5)
+    engine.search_items("Action")
+
+    snap = metrics.snapshot()
+    assert snap["counters"]["recommend_requests"] == 2
+    assert snap["counters"]["recommend_cold_start"] == 1
+    for stage in ["train.content", "train.collab", "recommend.collab", "recommend.content", "recommend.fusion", "search.total"]:
+        assert snap["histograms"][stage]["count"] >= 1
+
+def test_recommend_cache_invalidation(engine):
+    first, _ = engine.recommend(user_id=1, n=5)
+    second, _ = engine.recommend(user_id=1, n=5)
+    assert first == second
+    assert engine.cache_stats()["hits"] == 1
+
+    # Different params are a different entry
+    engine.recommend(user_id=1, n=5, diversity=0.5)
+    assert engine.cache_stats()["hits"] == 1
+
+    version = engine.model_version
+    engine.train_models()
+    assert engine.model_version == version + 1
+    engine.recommend(user_id=1, n=5)
+    assert engine.cache_stats()["hits"] == 1
+
+def test_recommend_cache_skips_result_raced_by_session_event(engine):
+    compute = engine._recommend_uncached
+    liked = engine.recommend(user_id=1, n=5, diversity=0.5)[0][0]['movieId']
+
+    def racing(*args, **kwargs):
+        result = compute(*args, **kwargs)
+        engine.add_session_event(1, liked, 5.0)  # lands after scoring, before the cache set
+        return result
+
+    engine._recommend_uncached = racing
+    engine.recommend(user_id=1, n=5)
+    engine._recommend_uncached = compute
+    recs, _ = engine.recommend(user_id=1, n=5)
+    assert engine.cache_stats()["hits"] == 0
+    assert liked not in [r['movieId'] for r in recs]
+
+    # Batches key on the same generation
+    before = engine.user_generation(2)
+    engine.recommend_batch([2], n=5)
+    engine.clear_session(2)
+    assert engine.user_generation(2) != before
+    engine.recommend_batch([2], n=5)
+    assert engine.cache_stats()["hits"] == 0
+
+def test_background_retrain_swaps_model(feedback_data):
+    movies, ratings = feedback_data
+    engine = RecommenderEngine(movies=movies, ratings=ratings)
+    old_model = engine.model
+    new_user = int(ratings['userId'].max()) + 1
+    engine.add_feedback(user_id=new_user, movie_id=int(movies['movieId'].iloc[0]), rating=5.0)
+    assert engine.wait_for_training(timeout=30)
+
+    new_model = engine.model
+    assert new_model is not old_model
+    assert new_model.version == old_model.version + 1
+    assert new_user in new_model.user_item_matrix.index
+    # The previous snapshot is untouched and still usable by in-flight readers
+    assert new_user not in old_model.user_item_matrix.index
+    with pytest.raises(AttributeError):
+        new_model.user_item_matrix = None
+
+def test_synchronous_retrain(feedback_data):
+    movies, ratings = feedback_data
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+    version = engine.model_version
+    engine.add_feedback(user_id=1, movie_id=int(movies['movieId'].iloc[1]), rating=4.0)
+    assert engine.model_version == version + 1
+
+def test_session_events_rerank_without_retraining(engine):
+    version = engine.model_version
+    before, _ = engine.recommend(user_id=1, n=5)
+    liked = before[0]['movieId']
+    engine.add_session_event(1, liked, 5.0)
+    after, _ = engine.recommend(user_id=1, n=5)
+    assert engine.model_version == version
+    assert liked not in [r['movieId'] for r in after]
+
+    # A dislike demotes items similar to it
+    disliked = after[0]['movieId']
+    similar = engine.similar_items(disliked, n=1)[0]['movieId']
+    scores = {r['movieId']: r['score'] for r in engine.recommend(user_id=1, n=50)[0]}
+    engine.add_session_event(1, disliked, 1.0)
+    demoted = {r['movieId']: r['score'] for r in engine.recommend(user_id=1, n=50)[0]}
+    assert disliked not in demoted
+    assert demoted.get(similar, -np.inf) < scores.get(similar, np.inf)
+
+    # A brand-new user gets hybrid recommendations from session events alone
+    new_user = int(engine.ratings['userId'].max()) + 1
+    recs, method = engine.recommend(new_user, n=5)
+    assert "New User" in method
+    engine.add_session_event(new_user, liked, 5.0)
+    recs, method = engine.recommend(new_user, n=5)
+    assert method == "Hybrid"
+    assert any(r['reason'] == "Users like you also enjoyed this" for r in engine.recommend(new_user, n=50)[0])
+
+    engine.clear_session(1)
+    assert engine.recommend(user_id=1, n=5)[0] == before
+
+def test_content_profile_uses_recent_likes(engine):
+    history = engine.ratings.sort_values('timestamp', kind='stable')
+    user_id = int(history[history['rating'] >= 4.0]['userId'].value_counts().idxmax())
+    liked = history[(history['userId'] == user_id) & (history['rating'] >= 4.0)]['movieId'].tolist()
+    titles = {engine.catalog.title(engine.catalog.index(m)) for m in liked}
+
+    recs, _ = engine.recommend(user_id, n=20, weight_content=1.0, weight_collab=0.0)
+    reasons = {r['reason'] for r in recs}
+    assert reasons <= {f"Because you liked {t}" for t in titles}
+
+    # With a cap of one like, every content explanation points at the most recent one
+    engine.CONTENT_HISTORY_CAP = 1
+    latest = engine.catalog.title(engine.catalog.index(liked[-1]))
+    recs, _ = engine.recommend(user_id, n=5, weight_content=1.0, weight_collab=0.0)
+    assert {r['reason'] for r in recs} == {f"Because you liked {latest}"}
+
+def test_float32_precision():
+    from src.evaluator import Evaluator
+    engine = RecommenderEngine(background_training=False, precision="float32")
+    model = engine.model
+    for arr in (model.content_sim_matrix, model.collab_user_factors, model.collab_item_factors,
+                model.history.ratings, model.popular_scores):
+        assert arr.dtype == np.float32
+    assert model.dtype == np.float32
+
+    user_id = int(engine.ratings['userId'].iloc[0])
+    engine.add_session_event(user_id, int(engine.catalog.ids[0]), 1.0)
+    recs, _ = engine.recommend(user_id, n=10, diversity=0.3)
+    assert len(recs) == 10 and all(type(r['score']) is float for r in recs)
+    engine.clear_session(user_id)
+
+    agreement = Evaluator(engine).verify_precision(n=10, n_users=20)
+    assert agreement["users"] == 20
+    assert agreement["overlap"] >= 0.9
+    assert agreement["max_score_diff"] < 1e-4
+
+    with pytest.raises(ValueError):
+        RecommenderEngine(background_training=False, precision="float16")
+
+class FakeVectorStore:
+    def __init__(self, ids, fail=False):
+        self.ids, self.fail = ids, fail
+
+    def search_similar_movies(self, query, n_results=10, filter_dict=None):
+        if self.fail:
+            raise ConnectionError("vector store down")
+        ids = self.ids[:n_results]
+        return ids, [0.1 * (i + 1) for i in range(len(ids))], [{} for _ in ids]
+
+def test_hybrid_search_fuses_lexical_and_semantic(engine):
+    lexical = engine.search_items("Action", n=50, mode="lexical")
+    assert lexical and all(0 < r["score"] <= 1 for r in lexical)
+    non_matching = [int(m) for m in engine.movies.index if m not in {r["movieId"] for r in lexical}]
+
+    engine.vector_store = FakeVectorStore([lexical[0]["movieId"], non_matching[0]])
+    results = engine.search_items("Action", n=5)
+    assert results[0]["movieId"] == lexical[0]["movieId"]
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert results[0]["reason"].startswith("Matched and semantically similar")
+    assert non_matching[0] in [r["movieId"] for r in results]
+
+    semantic = engine.search_items("Action", n=2, mode="semantic")
+    assert [r["movieId"] for r in semantic] == [lexical[0]["movieId"], non_matching[0]]
+    assert semantic[0]["score"] == pytest.approx(0.9)
+
+    engine.vector_store = FakeVectorStore([], fail=True)
+    assert engine.search_items("Action", n=5) == engine.search_items("Action", n=5, mode="lexical")
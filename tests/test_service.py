@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+from src.data_loader import generate_synthetic_data
+from src.recommender import RecommenderEngine
+from src.service import RecommendationService, InProcessClient
+
+@pytest.fixture(scope="module")
+def engine():
+    movies, ratings = generate_synthetic_data(n_users=40, n_movies=80, n_ratings=800, seed=5)
+    return RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+
+def test_endpoints(engine, tmp_path):
+    engine.ratings_file = str(tmp_path / "ratings.csv")
+    service = RecommendationService(engine, max_workers=2)
+    client = InProcessClient(service)
+
+    async def scenario():
+        status, body = await client.get("/recommend?user_id=1&n=5")
+        assert status == 200 and len(body["items"]) == 5
+        expected, _ = engine.recommend(1, n=5)
+        assert [i["movieId"] for i in body["items"]] == [r["movieId"] for r in expected]
+
+        status, body = await client.post("/recommend/batch", {"user_ids": [1, 2, 10**6], "n": 3})
+        assert status == 200 and [r["user_id"] for r in body["results"]] == [1, 2, 10**6]
+        assert "New User" in body["results"][2]["method"]
+
+        assert (await client.get("/popular?n=4"))[0] == 200
+        status, body = await client.get("/search?q=Action&n=3")
+        assert status == 200 and len(body["items"]) <= 3
+        status, body = await client.get("/similar?movie_id=1&n=3")
+        assert status == 200 and 1 not in [i["movieId"] for i in body["items"]]
+
+        assert (await client.get("/similar?movie_id=999999"))[0] == 404
+        assert (await client.get("/recommend"))[0] == 400
+        assert (await client.get("/recommend?user_id=abc"))[0] == 400
+        assert (await client.get("/popular?n=0"))[0] == 400
+        assert (await client.get("/similar?movie_id=1&n=101"))[0] == 400
+        assert (await client.get("/recommend?user_id=1&weight_content=nan"))[0] == 400
+        assert (await client.get("/recommend?user_id=1&weight_collab=inf"))[0] == 400
+        assert (await client.get("/recommend?user_id=1&diversity=1.5"))[0] == 400
+        assert (await client.get("/recommend?user_id=1&diversity=-0.1"))[0] == 400
+        assert (await client.post("/feedback", {"user_id": 1, "movie_id": 2, "rating": 9}))[0] == 400
+        assert (await client.get("/nope"))[0] == 404
+        assert (await client.post("/popular", {}))[0] == 405
+
+        status, body = await client.post("/feedback", {"user_id": 1, "movie_id": 2, "rating": 4.0})
+        assert status == 200 and body["status"] == "accepted"
+        status, text = await client.get("/metrics")
+        assert status == 200 and isinstance(text, str)
+
+    asyncio.run(scenario())
+
+def test_internal_errors_are_not_leaked(engine, monkeypatch):
+    def fail(n=10):
+        raise RuntimeError("secret internals")
+    monkeypatch.setattr(engine, "get_popular_items", fail)
+    status, body = asyncio.run(InProcessClient(RecommendationService(engine)).get("/popular"))
+    assert status == 500 and body == {"error": "internal server error"}
+
+def test_concurrent_recommends_are_batched(engine):
+    service = RecommendationService(engine, batch_window_ms=20, max_batch_size=64)
+    client = InProcessClient(service)
+    user_ids = [int(u) for u in engine.ratings['userId'].unique()[:12]]
+
+    async def scenario():
+        return await asyncio.gather(*(client.get(f"/recommend?user_id={u}&n=4&diversity=0.1") for u in user_ids))
+
+    responses = asyncio.run(scenario())
+    assert all(status == 200 for status, _ in responses)
+    assert service.batcher.batches == 1
+    assert service.batcher.batched_requests == len(user_ids)
+    for uid, (_, body) in zip(user_ids, responses):
+        assert body["user_id"] == uid
+
+def test_backpressure_rejects_with_503(engine):
+    service = RecommendationService(engine, max_in_flight=2, batch_window_ms=20)
+    client = InProcessClient(service)
+
+    async def scenario():
+        return await asyncio.gather(*(client.get(f"/recommend?user_id={u}") for u in range(1, 6)))
+
+    statuses = sorted(status for status, _ in asyncio.run(scenario()))
+    assert statuses == [200, 200, 503, 503, 503]
+    assert service.rejected == 3
+
+def test_http_round_trip(engine):
+    service = RecommendationService(engine)
+
+    async def scenario():
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        bodies = []
+        for target in ("/health", "/popular?n=2"):
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            assert b"200" in status_line
+            headers = {}
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode().partition(":")
+                headers[name.lower()] = value.strip()
+            bodies.append(json.loads(await reader.readexactly(int(headers["content-length"]))))
+        writer.close()
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /feedback HTTP/1.1\r\nContent-Length: lots\r\n\r\n")
+        await writer.drain()
+        assert b"400" in await reader.readline()
+        writer.close()
+        await service.close()
+        return bodies
+
+    health, popular = asyncio.run(scenario())
+    assert health["status"] == "ok"
+    assert len(popular["items"]) == 2
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+from src.data_loader import generate_synthetic_data
+from src.memory import LADDER
+from src.recommender import RecommenderEngine
+from src.sharding import ShardedEngine, partition_rows, publish_shards
+
+def summary(recs):
+    # Float32 collab scores can round differently when computed per shard
+    return [(r['movieId'], r['reason'], round(r['score'], 5)) for r in recs]
+
+@pytest.fixture(scope="module")
+def engine():
+    movies, ratings = generate_synthetic_data(n_users=80, n_movies=200, n_ratings=3000, seed=12)
+    return RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+
+def test_partitions_cover_catalog():
+    ids = np.array([40, 10, 30, 20, 50, 60, 70])
+    for partition in ("range", "hash"):
+        shards = partition_rows(ids, 3, partition)
+        assert sorted(np.concatenate(shards).tolist()) == list(range(len(ids)))
+    assert [ids[rows].tolist() for rows in partition_rows(ids, 3, "range")] == [[10, 30, 20], [40, 50], [60, 70]]
+    with pytest.raises(ValueError):
+        partition_rows(ids, 3, "random")
+
+@pytest.mark.parametrize("partition", ["range", "hash"])
+def test_sharded_engine_matches_single_process(engine, tmp_path, partition):
+    publish_shards(engine, str(tmp_path / "shards"), n_shards=3, partition=partition)
+    with ShardedEngine.open(str(tmp_path / "shards")) as sharded:
+        assert sharded.n_shards == 3
+        for uid in engine.ratings['userId'].unique()[:10]:
+            for diversity in (0.0, 0.5):
+                expected = engine.recommend(int(uid), n=8, diversity=diversity)
+                recs, method = sharded.recommend(int(uid), n=8, diversity=diversity)
+                assert method == expected[1]
+                assert summary(recs) == summary(expected[0])
+        assert summary(sharded.recommend(10**6, n=5)[0]) == summary(engine.recommend(10**6, n=5)[0])
+
+        movie_id = int(engine.catalog.ids[0])
+        assert ([round(r['score'], 6) for r in sharded.similar_items(movie_id, n=5)]
+                == [round(r['score'], 6) for r in engine.similar_items(movie_id, n=5)])
+
+        # Session events are folded in across shards
+        uid = int(engine.ratings['userId'].iloc[0])
+        liked = int(engine.catalog.ids[5])
+        for target in (engine, sharded):
+            target.add_session_event(uid, liked, 5.0)
+        assert summary(sharded.recommend(uid, n=8)[0]) == summary(engine.recommend(uid, n=8)[0])
+        engine.clear_session(uid)
+
+def test_batch_and_sparse_similarities(tmp_path):
+    movies, ratings = generate_synthetic_data(n_users=60, n_movies=150, n_ratings=2000, seed=13)
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+    engine.representation = LADDER[-1]
+    engine.train_models()
+    publish_shards(engine, str(tmp_path / "shards"), n_shards=2)
+    # Top-K similarities are published as CSR columns, not densified
+    assert not os.path.exists(tmp_path / "shards" / "shard_0" / "sim.npy")
+
+    users = [int(u) for u in ratings['userId'].unique()[:6]] + [10**6]
+    with ShardedEngine.open(str(tmp_path / "shards"), cache_size=0) as sharded:
+        for diversity in (0.0, 0.5):
+            batch = sharded.recommend_batch(users, n=6, diversity=diversity)
+            expected = [engine.recommend(uid, n=6, diversity=diversity) for uid in users]
+            assert [m for _, m in batch] == [m for _, m in expected]
+            assert [summary(r) for r, _ in batch] == [summary(r) for r, _ in expected]
+
+def test_batch_larger_than_pending_limit(engine, tmp_path):
+    from src.sharding import Shard
+    users = [int(u) for u in engine.ratings['userId'].unique()] * 4
+    assert len(users) > Shard.MAX_PENDING
+    publish_shards(engine, str(tmp_path / "shards"), n_shards=2)
+    with ShardedEngine.open(str(tmp_path / "shards"), cache_size=0) as sharded:
+        batch = sharded.recommend_batch(users, n=4)
+    assert len(batch) == len(users)
+    first = users.index(users[-1])
+    assert summary(batch[-1][0]) == summary(batch[first][0]) == summary(engine.recommend(users[-1], n=4)[0])
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from src.data_loader import generate_synthetic_data
+from src.recommender import RecommenderEngine
+from src.shared_model import publish_model, attach_engine, SharedModelPool
+
+def summary(recs):
+    # Float32 factors can round differently between in-memory and mmap array layouts
+    return [(r['movieId'], r['reason'], round(r['score'], 5)) for r in recs]
+
+@pytest.fixture(scope="module")
+def engine():
+    movies, ratings = generate_synthetic_data(n_users=60, n_movies=120, n_ratings=1500, seed=11)
+    return RecommenderEngine(movies=movies, ratings=ratings, background_training=False)
+
+def test_attached_engine_matches_loader(engine, tmp_path):
+    publish_model(engine, str(tmp_path))
+    attached = attach_engine(str(tmp_path))
+
+    assert attached.model_version == engine.model_version
+    assert isinstance(attached.content_sim_matrix, np.memmap)
+    assert not attached.content_sim_matrix.flags.writeable
+
+    for uid in engine.ratings['userId'].unique()[:10]:
+        assert summary(attached.recommend(int(uid), n=5)[0]) == summary(engine.recommend(int(uid), n=5)[0])
+    assert summary(attached.recommend(10**6, n=5)[0]) == summary(engine.recommend(10**6, n=5)[0])
+    assert attached.search_items("Action") == engine.search_items("Action")
+
+    with pytest.raises(RuntimeError):
+        attached.add_feedback(1, 1, 5.0)
+
+def test_republish_keeps_bounded_versions(engine, tmp_path):
+    for _ in range(3):
+        engine.train_models()
+        publish_model(engine, str(tmp_path), keep=2)
+    versions = [p for p in tmp_path.iterdir() if p.is_dir()]
+    assert len(versions) == 2
+    assert attach_engine(str(tmp_path)).model_version == engine.model_version
+
+    # A fresh engine restarts at version 1; pruning goes by publish time, not by name
+    oldest = min(versions, key=lambda p: p.name)
+    fresh = RecommenderEngine(movies=engine.movies.reset_index(), ratings=engine.ratings, background_training=False)
+    publish_model(fresh, str(tmp_path), keep=2)
+    versions = [p for p in tmp_path.iterdir() if p.is_dir()]
+    assert len(versions) == 2 and not oldest.exists()
+    assert attach_engine(str(tmp_path)).model_version == fresh.model_version
+
+def test_worker_pool(engine, tmp_path):
+    publish_model(engine, str(tmp_path))
+    users = [int(u) for u in engine.ratings['userId'].unique()[:8]]
+    with SharedModelPool(str(tmp_path), processes=2) as pool:
+        results = pool.recommend_many(users, chunk_size=3, n=5)
+        assert [summary(r[0]) for r in results] == [summary(engine.recommend(u, n=5)[0]) for u in users]
+        assert pool.get_popular_items(3) == engine.get_popular_items(3)
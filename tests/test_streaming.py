@@ -0,0 +1,63 @@
+import numpy as np
+from src.data_loader import generate_synthetic_data
+from src.recommender import RecommenderEngine
+from src.streaming import DAY, RatingStream
+
+def test_incremental_updates_match_batch_build():
+    _, ratings = generate_synthetic_data(n_users=50, n_movies=100, n_ratings=3000, seed=4)
+    ratings = ratings.sort_values('timestamp', kind='stable')
+    head, tail = ratings.iloc[:-300], ratings.iloc[-300:]
+
+    stream = RatingStream(head, half_life=30 * DAY, window=90 * DAY)
+    for row in tail.itertuples(index=False):
+        stream.add(row.userId, row.movieId, row.rating, row.timestamp)
+    batch = RatingStream(ratings, half_life=30 * DAY, window=90 * DAY)
+
+    frame, expected = stream.frame(), batch.frame()
+    assert len(stream) == len(batch) == len(frame)
+    assert frame['timestamp'].min() >= stream.now - 90 * DAY
+    assert np.allclose(frame['weight'], expected['weight'])
+
+    ids, counts, means = stream.item_stats()
+    b_ids, b_counts, b_means = batch.item_stats()
+    order, b_order = np.argsort(ids), np.argsort(b_ids)
+    assert list(ids[order]) == list(b_ids[b_order])
+    assert np.allclose(counts[order], b_counts[b_order])
+    assert np.allclose(means[order], b_means[b_order])
+
+    user = int(tail['userId'].iloc[-1])
+    assert np.allclose(stream.user_stats(user), batch.user_stats(user))
+    assert stream.user_stats(-1)[0] == 0.0
+
+def test_engine_trains_on_window():
+    movies, ratings = generate_synthetic_data(n_users=80, n_movies=150, n_ratings=3000, seed=5)
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False,
+                               half_life_days=14, window_days=60)
+    newest = ratings['timestamp'].max()
+    in_window = ratings[ratings['timestamp'] >= newest - 60 * DAY]
+    assert set(engine.user_item_matrix.index) == set(in_window['userId'])
+    # Only the window is held: the frame, the seen-item history and the model's rating count
+    assert len(engine.ratings) == len(in_window) and engine.n_ratings == len(ratings)
+    assert len(engine.model.history.movie_ids) == len(in_window)
+    # Decay weights how much a rating counts, not its value
+    matrix = engine.user_item_matrix
+    assert set(np.unique(matrix.to_numpy()[matrix.to_numpy() > 0])) <= set(in_window['rating'])
+    popular = [r['movieId'] for r in engine.get_popular_items(n=len(movies))]
+    window_items = set(in_window['movieId'])
+    assert set(popular[:len(window_items)]) == window_items and len(popular) == ratings['movieId'].nunique()
+
+    # Feedback on this 2021 dataset lands just after its newest rating, so the window survives
+    new_user = int(ratings['userId'].max()) + 1
+    engine.add_feedback(new_user, int(movies['movieId'].iloc[0]), 5.0)
+    assert new_user in engine.user_item_matrix.index
+    assert len(engine.user_item_matrix.index) == len(set(in_window['userId'])) + 1
+    assert newest <= engine.ratings['timestamp'].max() < newest + DAY
+    assert np.allclose(engine.stream.user_stats(new_user), (1.0, 5.0))
+    assert engine.model.n_ratings == engine.n_ratings == len(ratings) + 1
+
+def test_thin_window_falls_back_to_all_time_popularity():
+    movies, ratings = generate_synthetic_data(n_users=40, n_movies=80, n_ratings=1000, seed=6)
+    engine = RecommenderEngine(movies=movies, ratings=ratings, background_training=False, window_days=1e-6)
+    assert len(engine.stream) < 5
+    recs, method = engine.recommend(-1, n=10)
+    assert "New User" in method and len(recs) == 10